@@ -0,0 +1,104 @@
+"""Throughput of crew output post-processing (parse, normalize, dedup) by pool size.
+
+Builds synthetic analyzer outputs, fenced JSON and markdown tables with
+repeated schools, and processes them inline and with 1..N pool processes.
+Also compares the packed columnar payload with pickling the records.
+
+Run from the ``crew`` directory:
+
+    python -m benchmarks.bench_postprocess --outputs 2000 --schools 50
+    python -m benchmarks.bench_postprocess --workers 0 1 2 4 8 --output benchmarks/results/postprocess.json
+"""
+import argparse
+import json
+import os
+import pickle
+import random
+import time
+from pathlib import Path
+
+from src.crew.postprocess import Postprocessor, pack, process_schools
+
+CITIES = ["Bangalore", "Mumbai", "Pune", "Chennai", "Kolkata", "Hyderabad", "Delhi"]
+CURRICULA = ["CBSE", "ICSE", "IB", "State Board", "IGCSE"]
+
+
+def synthetic_output(schools, rng):
+    """One analyzer answer with ``schools`` rows, about a tenth of them repeated"""
+    city = rng.choice(CITIES)
+    rows = []
+    for i in range(schools):
+        number = rng.randrange(schools) if rows and rng.random() < 0.1 else i
+        rows.append({
+            "School Name": f"  {city} Public School No. {number} ",
+            "Grade": "5th Grade",
+            "Curriculum": rng.choice(CURRICULA),
+            "Location": f"{rng.randrange(1, 200)} Main Road, Ward {rng.randrange(1, 50)}, {city}",
+            "City": city,
+            "Fees": rng.choice(["N/A", "na", f"INR {rng.randrange(40, 400)},000 per annum"]),
+            "Rating": rng.choice(["", f"{rng.uniform(3, 5):.1f}/5"]),
+            "Remarks": "Spacious campus with labs and a library. " * rng.randrange(2, 6),
+        })
+    if rng.random() < 0.5:
+        return "Here are the schools:\n```json\n" + json.dumps(rows, indent=2) + "\n```"
+    header = "| " + " | ".join(rows[0]) + " |"
+    lines = [header, "|" + "---|" * len(rows[0])] + ["| " + " | ".join(row.values()) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def measure(texts, workers):
+    postprocessor = Postprocessor(workers, inline_chars=0)
+    try:
+        if workers:
+            # Start the processes before timing: spawn and imports are a one-off cost
+            postprocessor.map(texts[:workers * 2], chunksize=1)
+        started = time.perf_counter()
+        results = postprocessor.map(texts)
+        elapsed = time.perf_counter() - started
+    finally:
+        postprocessor.shutdown()
+    return {
+        "workers": workers,
+        "seconds": elapsed,
+        "outputs_per_s": len(texts) / elapsed,
+        "schools_per_s": sum(len(schools) for schools in results) / elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--outputs", type=int, default=1000, help="Crew outputs per measurement")
+    parser.add_argument("--schools", type=int, default=50, help="Schools per output")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({0, 1, 2, os.cpu_count() or 1}), help="Pool sizes to measure (0: inline)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    texts = [synthetic_output(args.schools, rng) for _ in range(args.outputs)]
+    schools = process_schools(texts[0])
+    results = {
+        "cpu_count": os.cpu_count(),
+        "outputs": args.outputs,
+        "schools_per_output": args.schools,
+        "payload_bytes": {"text": len(texts[0].encode()), "packed": len(pack(schools)),
+                          "pickled_records": len(pickle.dumps(schools))},
+        "runs": [],
+    }
+    for workers in args.workers:
+        run = measure(texts, workers)
+        results["runs"].append(run)
+        print(f"workers={workers:<3} {run['outputs_per_s']:>9.1f} outputs/s {run['schools_per_s']:>11.0f} schools/s")
+
+    baseline = results["runs"][0]["outputs_per_s"]
+    for run in results["runs"]:
+        run["speedup"] = run["outputs_per_s"] / baseline
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
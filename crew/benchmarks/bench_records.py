@@ -0,0 +1,109 @@
+"""Memory per cached school: dicts and pandas rows versus slotted records and the columnar store.
+
+Builds synthetic analyzer records and measures the bytes each representation
+holds per school with tracemalloc (pandas with memory_usage(deep=True)), then
+projects the size of a million cached schools.
+
+Run from the ``crew`` directory:
+
+    python -m benchmarks.bench_records --schools 100000
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+from src.crew.postprocess import COLUMNS
+from src.crew.records import INTERNED_COLUMNS, SchoolColumns
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+CITIES = ["Bangalore", "Mumbai", "Pune", "Chennai", "Kolkata", "Hyderabad", "Delhi", "Ahmedabad", "Jaipur", "Lucknow"]
+CURRICULA = ["CBSE", "ICSE", "IB", "State Board", "IGCSE", "Cambridge", "CBSE, IGCSE"]
+GRADES = ["Nursery-12", "1-12", "LKG-10", "1-10", "6-12", "Pre-KG to 5"]
+REMARKS = ["Spacious campus with labs and a library.", "Strong board results.", "Transport available.",
+           "Good sports facilities.", "Parents mention large class sizes.", "Active arts programme."]
+
+
+def synthetic_schools(count, seed=0):
+    """Schools the way parse_schools() returns them: fresh str objects for every field"""
+    rng = random.Random(seed)
+    for i in range(count):
+        city = rng.choice(CITIES)
+        yield {
+            "schoolName": f"{city} International School {i}",
+            "Grade": "".join(rng.choice(GRADES)),
+            "Curriculum": "".join(rng.choice(CURRICULA)),
+            "Location": f"{rng.randrange(1, 500)} Main Road, Sector {rng.randrange(1, 80)}, {city}",
+            "City": "".join(city),
+            "Fees": f"INR {rng.randrange(30, 400)},000 per annum",
+            "Rating": f"{rng.uniform(3, 5):.1f}",
+            "Remarks": " ".join(rng.sample(REMARKS, 2)),
+        }
+
+
+class SlottedSchool:
+    """One school with fixed fields and no per-instance dict, for comparison"""
+    __slots__ = COLUMNS
+
+    def __init__(self, school):
+        for column in COLUMNS:
+            value = school[column]
+            setattr(self, column, sys.intern(value) if column in INTERNED_COLUMNS else value)
+
+
+def traced(build):
+    """Bytes still allocated by the object build() returns"""
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schools", type=int, default=100_000)
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    count = args.schools
+    results = {"schools": count, "bytes_per_school": {}}
+    measurements = [
+        ("dicts", lambda: list(synthetic_schools(count))),
+        ("slots_records", lambda: [SlottedSchool(school) for school in synthetic_schools(count)]),
+        ("columns", lambda: SchoolColumns.from_dicts(synthetic_schools(count))),
+    ]
+    for name, build in measurements:
+        value, size = traced(build)
+        results["bytes_per_school"][name] = size / count
+        if name == "columns":
+            results["serialized_bytes_per_school"] = len(value.to_bytes()) / count
+        del value
+    if PANDAS_AVAILABLE:
+        frame = pd.DataFrame(list(synthetic_schools(count)))
+        results["bytes_per_school"]["pandas"] = frame.memory_usage(deep=True).sum() / count
+        del frame
+
+    results["million_schools_mb"] = {name: size * 1_000_000 / 2 ** 20
+                                     for name, size in results["bytes_per_school"].items()}
+    baseline = results["bytes_per_school"]["dicts"]
+    for name, size in results["bytes_per_school"].items():
+        print(f"{name:<14} {size:>8.1f} bytes/school  {size * 1e6 / 2 ** 20:>8.1f} MB per million  "
+              f"({baseline / size:.1f}x smaller than dicts)")
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
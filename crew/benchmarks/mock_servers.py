@@ -0,0 +1,375 @@
+"""Local stand-ins for the external services used by the school crew.
+
+Serves Serper search, an LLM endpoint (OpenAI-compatible chat completions,
+which litellm can target with an ``openai/`` model, plus Gemini's native
+``generateContent``) and the two IP-geolocation endpoints used by
+LocationTool. Every service has a configurable latency and counts its
+calls and tokens so benchmarks can report them.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CITY, REGION, COUNTRY = "Bengaluru", "Karnataka", "India"
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class Latency:
+    """Fixed delay with optional uniform jitter, in seconds"""
+
+    def __init__(self, base=0.0, jitter=0.0):
+        self.base = base
+        self.jitter = jitter
+
+    def sleep(self):
+        delay = self.base + (random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class MockStats:
+    """Thread-safe call and token counters shared by all mock services"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = {
+                "serper_calls": 0,
+                "llm_calls": 0,
+                "geo_calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+            }
+
+    def add(self, **values):
+        with self.lock:
+            for key, value in values.items():
+                self.counts[key] += value
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+# --- Canned responses -------------------------------------------------------
+
+def serper_response(query, num=10):
+    """Organic results shaped like google.serper.dev/search"""
+    organic = []
+    for position in range(1, num + 1):
+        name = f"Mock Public School {position}"
+        organic.append({
+            "title": f"{name} - {query[:40]}",
+            "link": f"https://schools.example.com/{position}?q={abs(hash(query)) % 10000}",
+            "snippet": (
+                f"{name}, {position} Main Road, {CITY}. CBSE curriculum, grades 1-12. "
+                f"Annual fees around INR {60 + position * 10},000. Rated {3 + position % 3}.{position % 10}/5 by parents."
+            ),
+            "position": position,
+        })
+    return {
+        "searchParameters": {"q": query, "type": "search", "engine": "google"},
+        "organic": organic,
+        "credits": 1,
+    }
+
+
+def _tool_call(prompt, tools, tool_turns):
+    """Pick the next tool call as (name, arguments), or None when the agent should answer"""
+    task = re.search(r"Search for schools in (.*?) that offer", prompt)
+    wants_location = bool(task and "current location" in task.group(1).lower())
+    location_tool = next((name for name in tools if "location" in name.lower()), None)
+    if location_tool and wants_location and tool_turns == 0:
+        return location_tool, {tools[location_tool]: "current location"}
+
+    search_tool = next((name for name in tools if "search" in name.lower()), None)
+    if not search_tool:
+        return None
+    budget = re.search(r"at most (\d+) (?:targeted|additional) searches", prompt)
+    budget = int(budget.group(1)) if budget else 1
+    searches_done = tool_turns - (1 if location_tool and wants_location else 0)
+    if searches_done >= budget:
+        return None
+
+    query = f"schools {task.group(1) if task else CITY} result {searches_done + 1}"
+    if tools[search_tool] == "queries":
+        return search_tool, {"queries": [query, query + " fees"]}
+    return search_tool, {tools[search_tool]: query}
+
+
+def _final_answer(prompt):
+    count = re.search(r"(?:up to|at most) (\d+) schools", prompt)
+    count = int(count.group(1)) if count else 10
+    columns = re.search(r"\[(schoolName[^\]]*)\]", prompt)
+    if not columns or "Final json" not in prompt:
+        lines = [f"{i}. Mock Public School {i}, {i} Main Road, {CITY} - CBSE" for i in range(1, count + 1)]
+        return "\n".join(lines)
+
+    rows = []
+    for i in range(1, count + 1):
+        values = {
+            "schoolName": f"Mock Public School {i}",
+            "Grade": "1-12",
+            "Curriculum": "CBSE",
+            "Location": f"{i} Main Road, Locality {i % 7}",
+            "City": CITY,
+            "Fees": f"INR {60 + i * 10},000 per annum",
+            "Rating": f"{3 + i % 3}.{i % 10}",
+            "Remarks": "Well-equipped campus with good board results. Transport available.",
+        }
+        rows.append({column.strip(): values.get(column.strip(), "N/A") for column in columns.group(1).split(",")})
+    return "```json\n" + json.dumps(rows, indent=2) + "\n```"
+
+
+def _react_tools(prompt):
+    """Tool names and first argument names from a ReAct-style system prompt"""
+    names = re.search(r"only one name of \[(.*?)\]", prompt)
+    tools = {}
+    for name in (names.group(1).split(",") if names else []):
+        name = name.strip()
+        argument = re.search(rf"Tool Name: {re.escape(name)}\s*Tool Arguments: \{{'(\w+)'", prompt)
+        tools[name] = argument.group(1) if argument else "query"
+    return tools
+
+
+def scripted_reply(messages, function_tools=None):
+    """Deterministic agent turn for the given chat messages.
+
+    With ``function_tools`` (name -> first argument) the reply is a native
+    tool call; otherwise tools are read from the ReAct prompt and the reply
+    is ReAct text. Returns (text, tool_call) where one of them is None.
+    """
+    prompt = "\n".join(message["text"] for message in messages)
+    if function_tools is not None:
+        tools = function_tools
+        tool_turns = sum(1 for message in messages if message["role"] == "tool")
+    else:
+        tools = _react_tools(prompt)
+        tool_turns = sum(1 for message in messages if message["role"] in ("assistant", "model"))
+
+    call = _tool_call(prompt, tools, tool_turns)
+    if call and function_tools is not None:
+        return None, call
+    if call:
+        name, arguments = call
+        return f"Thought: I need more information.\nAction: {name}\nAction Input: {json.dumps(arguments)}", None
+    return "Thought: I now know the final answer\nFinal Answer: " + _final_answer(prompt), None
+
+
+# --- HTTP plumbing ----------------------------------------------------------
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None  # set on the per-server subclass
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.service.handle_get(self)
+
+    def do_POST(self):
+        self.service.handle_post(self)
+
+
+class SerperService:
+    def __init__(self, stats, latency):
+        self.stats = stats
+        self.latency = latency
+
+    def handle_post(self, handler):
+        body = handler._body()
+        self.latency.sleep()
+        self.stats.add(serper_calls=1)
+        handler._send(serper_response(body.get("q", ""), int(body.get("num", 10))))
+
+    def handle_get(self, handler):
+        handler._send({"error": "not found"}, 404)
+
+
+class GeoService:
+    def __init__(self, stats, latency):
+        self.stats = stats
+        self.latency = latency
+
+    def handle_get(self, handler):
+        self.latency.sleep()
+        self.stats.add(geo_calls=1)
+        if handler.path.startswith("/ip-api"):
+            handler._send({"status": "success", "city": CITY, "regionName": REGION, "country": COUNTRY})
+        else:
+            handler._send({"city": CITY, "region": REGION, "country_name": COUNTRY})
+
+    def handle_post(self, handler):
+        handler._send({"error": "not found"}, 404)
+
+
+class LLMService:
+    def __init__(self, stats, latency):
+        self.stats = stats
+        self.latency = latency
+
+    def handle_get(self, handler):
+        handler._send({"data": [{"id": "gemini-2.0-flash", "object": "model"}]})
+
+    def handle_post(self, handler):
+        body = handler._body()
+        if ":generateContent" in handler.path:
+            messages = [{"role": "system", "text": part.get("text", "")}
+                        for part in body.get("system_instruction", {}).get("parts", [])]
+            messages += [{"role": content.get("role", "user"), "text": "".join(p.get("text", "") for p in content.get("parts", []))}
+                         for content in body.get("contents", [])]
+        else:
+            messages = [{"role": message.get("role", "user"), "text": _content_text(message.get("content"))}
+                        for message in body.get("messages", [])]
+
+        function_tools = None
+        if body.get("tools"):
+            function_tools = {}
+            for tool in body["tools"]:
+                function = tool.get("function", {})
+                arguments = list(function.get("parameters", {}).get("properties", {})) or ["query"]
+                function_tools[function.get("name", "")] = arguments[0]
+
+        self.latency.sleep()
+        reply, tool_call = scripted_reply(messages, function_tools)
+        prompt_tokens = estimate_tokens("".join(message["text"] for message in messages))
+        completion_tokens = estimate_tokens(reply or json.dumps(tool_call))
+        self.stats.add(llm_calls=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        if ":generateContent" in handler.path:
+            handler._send({
+                "candidates": [{"content": {"role": "model", "parts": [{"text": reply}]}, "finishReason": "STOP", "index": 0}],
+                "usageMetadata": {
+                    "promptTokenCount": prompt_tokens,
+                    "candidatesTokenCount": completion_tokens,
+                    "totalTokenCount": prompt_tokens + completion_tokens,
+                },
+            })
+            return
+
+        if tool_call:
+            name, arguments = tool_call
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{random.randint(0, 1 << 30)}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }]}
+            finish_reason = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": reply}
+            finish_reason = "stop"
+        handler._send({
+            "id": f"chatcmpl-mock-{random.randint(0, 1 << 30)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage,
+        })
+
+
+def _content_text(content):
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _serve(service):
+    handler = type("Handler", (MockHandler,), {"service": service})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class MockServers:
+    """All mock services running on ephemeral local ports"""
+
+    def __init__(self, llm_latency=None, serper_latency=None, geo_latency=None):
+        self.stats = MockStats()
+        self.servers = {
+            "serper": _serve(SerperService(self.stats, serper_latency or Latency())),
+            "llm": _serve(LLMService(self.stats, llm_latency or Latency())),
+            "geo": _serve(GeoService(self.stats, geo_latency or Latency())),
+        }
+
+    def url(self, name):
+        host, port = self.servers[name].server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self, llm_protocol="openai"):
+        """Environment variables that point the crew at these mocks"""
+        env = {
+            "SERPER_API_KEY": "mock-serper-key",
+            "GEMINI_API_KEY": "mock-gemini-key",
+            "OPENAI_API_KEY": "mock-openai-key",
+            "SERPER_BASE_URL": self.url("serper"),
+            "LOCATION_PRIMARY_URL": self.url("geo") + "/ipapi/json/",
+            "LOCATION_FALLBACK_URL": self.url("geo") + "/ip-api/json/",
+            "CREW_VERBOSE": "false",
+            # The mocks have no quota; run_benchmarks.py can re-enable the client-side limiter
+            "GEMINI_RPM": "0",
+            "SERPER_RPM": "0",
+            # Measure crew runs, not cache hits; run_benchmarks.py --cache keeps them
+            "RESULT_CACHE_HARD_TTL": "0",
+            "SNAPSHOTS": "false",
+            "SHARED_CACHE": "false",
+        }
+        if llm_protocol == "gemini":
+            env["LLM_MODEL"] = "gemini/gemini-2.0-flash"
+            env["LLM_BASE_URL"] = self.url("llm") + "/v1beta"
+        else:
+            env["LLM_MODEL"] = "openai/gemini-2.0-flash"
+            env["LLM_BASE_URL"] = self.url("llm") + "/v1"
+        return env
+
+    def shutdown(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the mock Serper, LLM and geolocation servers")
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--serper-latency", type=float, default=0.0)
+    parser.add_argument("--geo-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    mocks = MockServers(Latency(args.llm_latency), Latency(args.serper_latency), Latency(args.geo_latency))
+    for key, value in mocks.environment().items():
+        print(f"{key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        mocks.shutdown()
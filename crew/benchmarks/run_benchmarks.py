@@ -0,0 +1,231 @@
+"""Offline end-to-end benchmarks for the school crew.
+
+Runs the crew against the local mocks in benchmarks/mock_servers.py, so no
+API quota is spent, and measures latency, external call counts, tokens and
+memory for the CLI, FastAPI and batch paths.
+
+Run from the ``crew`` directory:
+
+    python -m benchmarks.run_benchmarks --runs 5 --llm-latency 0.3 --output benchmarks/results/head.json
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/base.json --output benchmarks/results/head.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.mock_servers import Latency, MockServers
+
+QUERIES = [
+    ("Whitefield, Bangalore", "5th Grade", "CBSE"),
+    ("Andheri, Mumbai", "1st Grade", "ICSE"),
+    ("use my current location", "8th Grade", "IB"),
+    ("Salt Lake, Kolkata", "10th Grade", "State Board"),
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Aggregate per-run samples into comparable numbers"""
+    latencies = [sample["latency_s"] for sample in samples]
+    summary = {
+        "runs": len(samples),
+        "latency_s": {
+            "mean": statistics.fmean(latencies),
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "max": max(latencies),
+        },
+    }
+    for key in ("llm_calls", "serper_calls", "geo_calls", "prompt_tokens", "completion_tokens", "peak_memory_mb"):
+        summary[key] = statistics.fmean(sample[key] for sample in samples)
+    errors = [sample["error"] for sample in samples if sample.get("error")]
+    summary["errors"] = len(errors)
+    if errors:
+        summary["first_error"] = errors[0]
+    return summary
+
+
+def measure(mocks, trace_memory, function):
+    """Run one end-to-end search and collect its costs"""
+    mocks.stats.reset()
+    if trace_memory:
+        tracemalloc.reset_peak()
+    error = None
+    started = time.perf_counter()
+    try:
+        function()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    latency = time.perf_counter() - started
+    sample = dict(mocks.stats.snapshot(), latency_s=latency, error=error)
+    if trace_memory:
+        sample["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    else:
+        # The batch path's crews run in worker processes; count the largest of them too
+        sample["peak_memory_mb"] = max(resource.getrusage(who).ru_maxrss
+                                       for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)) / 1024
+    return sample
+
+
+def run_cli(query, options):
+    """Same code path as src/crew/main.py, without the input() prompts"""
+    from src.crew.school_crew import schoolcrew
+
+    location, grade, curriculum = query
+    crew_instance = schoolcrew(**options)
+    return crew_instance.crew().kickoff(inputs=crew_instance.inputs(location, grade, curriculum))
+
+
+def make_api_client():
+    from fastapi.testclient import TestClient
+    import main
+
+    return TestClient(main.app)
+
+
+def run_api(client, query, options):
+    location, grade, curriculum = query
+    response = client.post("/search-schools", json=dict(location=location, grade=grade, curriculum=curriculum, **options))
+    response.raise_for_status()
+    return response.json()
+
+
+def run_batch(queries, options, workers):
+    """Same code path as the batch CLI (src/crew/batch.py): worker processes appending to a fresh JSONL file"""
+    from src.crew import batch
+
+    rows = [dict(location=location, grade=grade, curriculum=curriculum, id=str(i), **options)
+            for i, (location, grade, curriculum) in enumerate(queries)]
+    with tempfile.TemporaryDirectory() as directory:
+        output = Path(directory) / "results.jsonl"
+        succeeded, failed = batch.run_batch([batch.normalize_query(row) for row in rows], output, workers, progress=False)
+    if failed:
+        raise RuntimeError(f"{failed} of {len(rows)} batch queries failed")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, baseline):
+    """Print relative changes of the headline numbers against a previous result file"""
+    print(f"\nComparison against {baseline.get('commit')} ({baseline.get('timestamp')})")
+    for path, summary in current["paths"].items():
+        previous = baseline.get("paths", {}).get(path)
+        if not previous:
+            continue
+        print(f"  [{path}]")
+        rows = [("latency p50", summary["latency_s"]["p50"], previous["latency_s"]["p50"]),
+                ("latency p95", summary["latency_s"]["p95"], previous["latency_s"]["p95"])]
+        rows += [(key, summary[key], previous[key])
+                 for key in ("llm_calls", "serper_calls", "prompt_tokens", "completion_tokens", "peak_memory_mb")]
+        for label, now, before in rows:
+            change = (now - before) / before * 100 if before else 0.0
+            print(f"    {label:<18} {before:>12.3f} -> {now:>12.3f}  ({change:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", nargs="+", default=["cli", "api", "batch"], choices=["cli", "api", "batch"])
+    parser.add_argument("--runs", type=int, default=3, help="Runs per path")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured runs before the CLI path (imports, first connections)")
+    parser.add_argument("--max-results", type=int, default=10)
+    parser.add_argument("--no-fees", action="store_true")
+    parser.add_argument("--no-ratings", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--batch-workers", type=int, default=4, help="Worker processes of the batch path")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--serper-latency", type=float, default=0.1)
+    parser.add_argument("--geo-latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform latency jitter, as a fraction of each latency")
+    parser.add_argument("--gemini-rpm", type=float, default=0, help="Client-side Gemini rate limit (0: off)")
+    parser.add_argument("--serper-rpm", type=float, default=0, help="Client-side Serper rate limit (0: off)")
+    parser.add_argument("--cache", action="store_true", help="Let the API path answer repeated queries from its caches")
+    parser.add_argument("--llm-protocol", choices=["openai", "gemini"], default="openai")
+    parser.add_argument("--trace-memory", action="store_true", help="Use tracemalloc peaks instead of max RSS (slower)")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--compare", type=Path, help="Previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    mocks = MockServers(
+        llm_latency=Latency(args.llm_latency, args.llm_latency * args.jitter),
+        serper_latency=Latency(args.serper_latency, args.serper_latency * args.jitter),
+        geo_latency=Latency(args.geo_latency, args.geo_latency * args.jitter),
+    )
+    # Must happen before the crew modules are imported: they read it at import time
+    os.environ.update(mocks.environment(args.llm_protocol))
+    os.environ.update(GEMINI_RPM=str(args.gemini_rpm), SERPER_RPM=str(args.serper_rpm))
+    if args.cache:
+        for name in ("RESULT_CACHE_HARD_TTL", "SNAPSHOTS", "SHARED_CACHE"):
+            os.environ.pop(name)
+
+    options = {
+        "max_results": args.max_results,
+        "include_fees": not args.no_fees,
+        "include_ratings": not args.no_ratings,
+    }
+    if args.trace_memory:
+        tracemalloc.start()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "paths": {},
+    }
+
+    try:
+        for i in range(args.warmup):
+            measure(mocks, args.trace_memory, lambda: run_cli(QUERIES[0], options))
+
+        if "cli" in args.paths:
+            samples = [measure(mocks, args.trace_memory, lambda i=i: run_cli(QUERIES[i % len(QUERIES)], options))
+                       for i in range(args.runs)]
+            results["paths"]["cli"] = summarize(samples)
+
+        if "api" in args.paths:
+            client = make_api_client()
+            samples = [measure(mocks, args.trace_memory, lambda i=i: run_api(client, QUERIES[i % len(QUERIES)], options))
+                       for i in range(args.runs)]
+            results["paths"]["api"] = summarize(samples)
+
+        if "batch" in args.paths:
+            queries = [QUERIES[i % len(QUERIES)] for i in range(args.batch_size)]
+            samples = [measure(mocks, args.trace_memory, lambda: run_batch(queries, options, args.batch_workers))
+                       for _ in range(args.runs)]
+            summary = summarize(samples)
+            summary["queries_per_s"] = args.batch_size / summary["latency_s"]["mean"]
+            results["paths"]["batch"] = summary
+    finally:
+        mocks.shutdown()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,45 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
+import time
 import uvicorn
-from src.crew.school_crew import schoolcrew
+from src.crew.school_crew import (
+    SearchPlan, DEFAULT_MAX_RESULTS, MIN_RESULTS, MAX_RESULTS, SUPPORTED_CURRICULA, SUPPORTED_GRADES
+)
+from src.crew.tracing import server_timing
+from src.crew import metrics
+from src.crew.admission import controller as admission, client_key
+from src.crew.resilience import BREAKER_RESET_SECONDS, ProviderUnavailable
+from src.crew.snapshots import snapshot_key, snapshot_store
+from src.crew.cache import RESULT_CACHE_HARD_TTL, RESULT_CACHE_SOFT_TTL, cache_key, result_cache, revalidator
+from src.crew.usage import cached_usage
+from src.crew.results import result_text
+from src.crew.postprocess import postprocessor
+from src.crew.ranking import rank_result
+from src.crew.fees import FEE_CURRENCY, fee_index
+from src.crew.resultsets import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SORTS, result_sets
+from src.crew.export import EXPORT_FORMATS, PYARROW_AVAILABLE, iter_export
+from src.crew.http_client import aclose_client, close_background_client
+import re
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    postprocessor.shutdown()
+    # Tools share pooled HTTP clients: the background loop's and, for direct async callers, this loop's
+    await run_in_threadpool(close_background_client)
+    await aclose_client()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="School Crew API",
     description="API for finding schools based on location, grade, and curriculum",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -21,7 +51,32 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Request rate and latency per endpoint
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template so path parameters don't explode cardinality
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        metrics.HTTP_REQUESTS.labels(request.method, endpoint, str(status)).inc()
+        metrics.HTTP_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - started)
+
 # Pydantic models for request/response
+class RankingWeights(BaseModel):
+    """Relative importance of each ranking criterion; omitted ones keep their default"""
+    locality: Optional[float] = Field(default=None, ge=0, description="School address matches the searched locality")
+    fee_fit: Optional[float] = Field(default=None, ge=0, description="Annual fee within `fee_budget`")
+    curriculum: Optional[float] = Field(default=None, ge=0, description="Offers the requested curriculum")
+    grade: Optional[float] = Field(default=None, ge=0, description="Teaches the requested grade")
+    freshness: Optional[float] = Field(default=None, ge=0, description="The school's fees or remarks are dated to a recent academic year; undated schools score neutral")
+    rating: Optional[float] = Field(default=None, ge=0, description="Parent review rating")
+
 class SchoolSearchRequest(BaseModel):
     location: str = Field(
         default="Bangalore | use my current location",
@@ -38,11 +93,191 @@ class SchoolSearchRequest(BaseModel):
         description="Preferred curriculum",
         example="ICSE"
     )
+    max_results: int = Field(
+        default=DEFAULT_MAX_RESULTS,
+        ge=MIN_RESULTS,
+        le=MAX_RESULTS,
+        description="Maximum number of schools to find",
+        example=10
+    )
+    include_fees: bool = Field(
+        default=True,
+        description="Try to find fee details for each school"
+    )
+    include_ratings: bool = Field(
+        default=True,
+        description="Include school ratings if available"
+    )
+    budget_usd: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Cost ceiling for this search; the crew searches less instead of exceeding it",
+        example=0.01
+    )
+    weights: Optional[RankingWeights] = Field(
+        default=None,
+        description="Rank the schools locally with these criterion weights; the ranked list is returned in `schools`"
+    )
+    fee_budget: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Annual fee the family aims for, in the fees' currency; used by the fee_fit ranking criterion",
+        example=150000
+    )
+    min_fee: Optional[float] = Field(
+        default=None,
+        ge=0,
+        description=f"Only schools whose annual fee reaches this amount ({FEE_CURRENCY}); returned in `schools`"
+    )
+    max_fee: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description=f"Only schools whose annual fee can be this amount or less ({FEE_CURRENCY}); returned in `schools`",
+        example=200000
+    )
+    include_unknown_fees: bool = Field(
+        default=False,
+        description="Keep schools without published fees when filtering by fee"
+    )
+
+class RankRequest(SchoolSearchRequest):
+    limit: Optional[int] = Field(default=None, ge=1, description="Return only the best this many schools")
 
 class SchoolSearchResponse(BaseModel):
     success: bool
     message: str
     data: Optional[str] = None
+    timings: Optional[dict] = Field(
+        default=None,
+        description="Time spent per task, in LLM calls and in each tool, for this search"
+    )
+    usage: Optional[dict] = Field(
+        default=None,
+        description="Tokens, tool calls, estimated cost and any budget downgrades of this search"
+    )
+    degraded: bool = Field(
+        default=False,
+        description="A provider was unavailable; data comes from the cache or is incomplete"
+    )
+    result_set_id: Optional[str] = Field(
+        default=None,
+        description="Refine, sort and page through these schools with GET /result-sets/{result_set_id}"
+    )
+    schools: Optional[list] = Field(
+        default=None,
+        description="Schools within `min_fee`/`max_fee`, ranked best first when `weights` or `fee_budget` was given"
+    )
+
+# Bulk export formats supported by the search endpoints
+ExportFormat = Literal["csv", "jsonl", "parquet"]
+
+def check_export_format(fmt):
+    """Reject an export format this server can't produce before any search runs"""
+    if fmt == "parquet" and not PYARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow to be installed")
+
+async def export_response(result, fmt, filename, headers=None):
+    """Stream the parsed school records of a crew result in the requested format"""
+    # Parsed, normalized and deduplicated in the post-processing pool for big outputs
+    records = await postprocessor.aschools(result_text(result))
+    filename = re.sub(r"[^A-Za-z0-9_-]+", "_", filename)
+    return StreamingResponse(
+        iter_export(records, fmt),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"', **(headers or {})}
+    )
+
+def select_schools(plan, result, request, limit=None, rank=False):
+    """Schools of a search result filtered by fee range and ranked locally, or None when neither was asked for.
+
+    Parsed fees and ranking features are kept per result, so re-filtering
+    or re-weighting the same result takes milliseconds.
+    """
+    text = result_text(result)
+    filtered = request.min_fee is not None or request.max_fee is not None
+    ranked = rank or request.weights is not None or request.fee_budget is not None
+    if not (filtered or ranked):
+        return None
+    index = fee_index(text)
+    if not ranked:
+        return index.filter(request.min_fee, request.max_fee, request.include_unknown_fees)[:limit]
+    subset = index.matching(request.min_fee, request.max_fee, request.include_unknown_fees) if filtered else None
+    inputs = plan.inputs
+    return rank_result(text, inputs["location"], inputs["grade"], inputs["curriculum"],
+                       request.weights.model_dump() if request.weights else None, request.fee_budget, limit, subset)
+
+async def refresh_search(plan):
+    """Re-run a search in the background; run_search stores the fresh result in the cache"""
+    async with admission.slot("background-refresh"):
+        result, trace, usage = await metrics.run_crew(plan.run, False)
+    metrics.observe_trace(trace)
+    metrics.observe_usage(usage.as_dict())
+
+async def cached_search(plan):
+    """A cached answer served without waiting on the crew: (text, cache info, age) or None.
+
+    Results past the soft TTL are still served, and one background run per
+    search refreshes them; past the hard TTL the crew has to run.
+    """
+    inputs = plan.inputs
+    # Every full search counts towards popularity, also those answered from the result cache;
+    # the precompute job refreshes the popular ones
+    if snapshot_store is not None and plan.downgrade == "full":
+        if snapshot_store.record_request(snapshot_key(inputs), inputs, plan.options, flush=False):
+            await run_in_threadpool(snapshot_store.flush)
+    key = cache_key(inputs)
+    entry = result_cache.get(key, RESULT_CACHE_HARD_TTL) if RESULT_CACHE_HARD_TTL > 0 else None
+    if entry is not None:
+        stale = entry.age > RESULT_CACHE_SOFT_TTL
+        if stale:
+            revalidator.schedule(key, lambda: refresh_search(plan))
+        info = {"source": "result", "age_s": round(entry.age), "ttl_s": round(RESULT_CACHE_SOFT_TTL - entry.age),
+                "stale": stale, "revalidating": key in revalidator.inflight}
+        return entry.text, info, entry.age
+    if snapshot_store is None:
+        return None
+    # SQLite reads stay off the event loop
+    return await run_in_threadpool(snapshot_search, plan)
+
+def snapshot_search(plan):
+    """A precomputed answer for the search"""
+    inputs = plan.inputs
+    snapshot = snapshot_store.lookup(inputs)
+    if snapshot is None and plan.downgrade == "catalog_only":
+        # Budget too small for web searches: any stored answer for the place beats the model's memory
+        snapshot = snapshot_store.lookup_place(inputs["location"], inputs["grade"], inputs["curriculum"])
+    if snapshot is not None:
+        return snapshot.text, snapshot.cache_info(), snapshot.age
+    return None
+
+async def execute_search(plan, http_request):
+    """Answer a search from the result cache or a precomputed snapshot, or else by running the crew.
+
+    Returns (result, timings, usage, headers); timings is None for cached answers.
+    """
+    cached = await cached_search(plan)
+    if cached is not None:
+        result, cache, age = cached
+        timings = None
+        usage = cached_usage(cache, plan.budget_usd, plan.downgrade)
+        headers = {"Age": str(round(age))}
+    else:
+        # Build and execute the crew off the event loop so other requests keep being served
+        async with admission.slot(client_key(http_request)):
+            result, trace, usage = await metrics.run_crew(plan.run)
+        metrics.observe_trace(trace)
+        timings = trace.timings()
+        usage = usage.as_dict()
+        headers = {"Server-Timing": server_timing(timings)}
+    metrics.observe_usage(usage)
+    cache = usage["cache"]
+    if cache:
+        # RFC 9211; a negative ttl marks a stale answer that is being refreshed
+        status = f'school-crew; hit; detail={cache["source"]}'
+        if "ttl_s" in cache:
+            status += f'; ttl={cache["ttl_s"]}'
+        headers["Cache-Status"] = status
+    return result, timings, usage, headers
 
 # Health check endpoint
 @app.get("/")
@@ -53,72 +288,214 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "school-crew-api"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus metrics, aggregated across gunicorn workers"""
+    data, content_type = metrics.render()
+    return Response(content=data, media_type=content_type)
+
 # Main endpoint for school search
 @app.post("/search-schools", response_model=SchoolSearchResponse)
-async def search_schools(request: SchoolSearchRequest):
+async def search_schools(
+    request: SchoolSearchRequest,
+    http_request: Request,
+    response: Response,
+    format: Optional[ExportFormat] = Query(None, description="Stream the results as csv, jsonl or parquet")
+):
     """
     Search for schools based on location, grade, and curriculum preferences.
     
     - **location**: The city or area where you want to find schools
     - **grade**: The grade level (e.g., "1st Grade", "10th Grade") 
     - **curriculum**: The curriculum type (e.g., "CBSE", "ICSE", "IB")
+    - **max_results**: Number of schools to find (5-50)
+    - **include_fees** / **include_ratings**: Optional details to research
+    - **budget_usd**: Optional cost ceiling; fewer searches and a shorter analysis are used to stay within it
+    - **format**: Optional query parameter to stream results as `csv`, `jsonl` or `parquet`
+    
+    Repeated and popular searches are answered instantly from the result
+    cache (stale entries are refreshed in the background) or from precomputed
+    snapshots. Other runs are admitted fairly per `X-API-Key`; when the
+    service is saturated the request fails fast with 429 or 503 and a
+    `Retry-After` header.
     """
     try:
-        # Initialize school crew
-        crew_instance = schoolcrew()
+        check_export_format(format)
+        # Size the search to the requested options and budget
+        plan = SearchPlan(
+            request.location,
+            request.grade,
+            request.curriculum,
+            max_results=request.max_results,
+            include_fees=request.include_fees,
+            include_ratings=request.include_ratings,
+            budget_usd=request.budget_usd
+        )
         
-        # Prepare inputs
-        inputs = {
-            "location": request.location,
-            "grade": request.grade, 
-            "curriculum": request.curriculum
-        }
+        # Served from the cache or a snapshot, or the crew runs off the event loop
+        result, timings, usage, headers = await execute_search(plan, http_request)
         
-        # Execute the crew
-        result = crew_instance.crew().kickoff(inputs=inputs)
+        if format:
+            return await export_response(result, format, f"schools_{request.location}_{request.grade}", headers)
         
+        response.headers.update(headers)
+        degraded = bool(usage["degraded"])
+        age = (usage["cache"] or {}).get("age_s", 0)
+        # Fee parsing, ranking and the result set are CPU work: keep them off the event loop
+        schools = await run_in_threadpool(select_schools, plan, result, request)
+        result_set_id = await run_in_threadpool(result_sets.add, result_text(result), plan.inputs, age)
         return SchoolSearchResponse(
             success=True,
-            message="School search completed successfully",
-            data=str(result)
+            message="School search completed with reduced data" if degraded else "School search completed successfully",
+            data=str(result),
+            timings=timings,
+            usage=usage,
+            degraded=degraded,
+            result_set_id=result_set_id,
+            schools=schools
         )
         
+    except HTTPException:
+        raise
+    except ProviderUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"School search temporarily unavailable: {e}",
+            headers={"Retry-After": str(int(BREAKER_RESET_SECONDS))}
+        )
     except Exception as e:
+        metrics.record_error("/search-schools", e)
         raise HTTPException(
             status_code=500, 
             detail=f"Error processing school search: {str(e)}"
         )
 
+# Re-rank an answered search without running the crew again
+@app.post("/rank-schools")
+async def rank_schools_endpoint(request: RankRequest, response: Response):
+    """
+    Rank the schools of a search that was already answered, with new weights,
+    a new fee budget or a fee range (`min_fee`/`max_fee`). Only cached results and precomputed snapshots are
+    used; the crew never runs, so the answer comes back in milliseconds.
+    Returns 404 when the search has not been answered yet.
+    """
+    plan = SearchPlan(
+        request.location,
+        request.grade,
+        request.curriculum,
+        max_results=request.max_results,
+        include_fees=request.include_fees,
+        include_ratings=request.include_ratings,
+        budget_usd=request.budget_usd
+    )
+    cached = await cached_search(plan)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="No result for this search yet; run /search-schools first")
+    result, cache, age = cached
+    started = time.perf_counter()
+    schools = await run_in_threadpool(select_schools, plan, result, request, request.limit, True)
+    response.headers["Age"] = str(round(age))
+    return {
+        "success": True,
+        "schools": schools,
+        "cache": cache,
+        "ranking_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+
+# Facets, sorting and pagination over a search's schools without running the crew again
+@app.get("/result-sets/{result_set_id}")
+async def get_result_set(
+    result_set_id: str,
+    curriculum: List[str] = Query([], description="Keep schools offering any of these curricula"),
+    city: List[str] = Query([]),
+    locality: List[str] = Query([]),
+    fee_band: List[str] = Query([], description="Annual fee bands, as listed in the facet counts"),
+    rating_band: List[str] = Query([]),
+    min_fee: Optional[float] = Query(None, ge=0),
+    max_fee: Optional[float] = Query(None, gt=0),
+    include_unknown_fees: bool = False,
+    sort: Literal[SORTS] = "relevance",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page")
+):
+    """
+    One page of a search's schools, filtered by facets (any value within a
+    facet, all facets together) and fee range, with the count of every facet
+    value under the other filters. IDs come from the search endpoints and
+    expire after a few hours.
+    """
+    # Built on first use after a restart or in another worker
+    result_set = await run_in_threadpool(result_sets.get, result_set_id)
+    if result_set is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired result set; run the search again")
+    filters = {"curriculum": curriculum, "city": city, "locality": locality, "fee_band": fee_band,
+               "rating_band": rating_band}
+    try:
+        return await run_in_threadpool(result_set.page, filters, sort, limit, cursor, min_fee, max_fee,
+                                       include_unknown_fees)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Alternative GET endpoint for simple queries
 @app.get("/search-schools/{location}")
 async def search_schools_simple(
     location: str,
+    http_request: Request,
+    response: Response,
     grade: str = "1st Grade",
-    curriculum: str = "CBSE"
+    curriculum: str = "CBSE",
+    max_results: int = Query(DEFAULT_MAX_RESULTS, ge=MIN_RESULTS, le=MAX_RESULTS),
+    include_fees: bool = True,
+    include_ratings: bool = True,
+    budget_usd: Optional[float] = Query(None, gt=0),
+    format: Optional[ExportFormat] = None
 ):
     """
     Simple GET endpoint for school search with path parameter.
     """
     try:
-        crew_instance = schoolcrew()
+        check_export_format(format)
+        plan = SearchPlan(
+            location,
+            grade,
+            curriculum,
+            max_results=max_results,
+            include_fees=include_fees,
+            include_ratings=include_ratings,
+            budget_usd=budget_usd
+        )
         
-        inputs = {
-            "location": location,
-            "grade": grade,
-            "curriculum": curriculum
-        }
+        result, timings, usage, headers = await execute_search(plan, http_request)
         
-        result = crew_instance.crew().kickoff(inputs=inputs)
+        if format:
+            return await export_response(result, format, f"schools_{location}_{grade}", headers)
         
+        response.headers.update(headers)
+        result_set_id = await run_in_threadpool(
+            result_sets.add, result_text(result), plan.inputs, (usage["cache"] or {}).get("age_s", 0)
+        )
         return {
             "success": True,
             "location": location,
             "grade": grade,
             "curriculum": curriculum,
-            "results": str(result)
+            "results": str(result),
+            "timings": timings,
+            "usage": usage,
+            "degraded": bool(usage["degraded"]),
+            "result_set_id": result_set_id
         }
         
+    except HTTPException:
+        raise
+    except ProviderUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"School search temporarily unavailable: {e}",
+            headers={"Retry-After": str(int(BREAKER_RESET_SECONDS))}
+        )
     except Exception as e:
+        metrics.record_error("/search-schools/{location}", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing school search: {str(e)}"
@@ -128,42 +505,13 @@ async def search_schools_simple(
 @app.get("/curricula")
 async def get_supported_curricula():
     """Get list of supported curricula"""
-    return {
-        "supported_curricula": [
-            "CBSE",
-            "ICSE", 
-            "IB",
-            "State Board",
-            "IGCSE",
-            "Cambridge",
-            "Montessori"
-        ]
-    }
+    return {"supported_curricula": SUPPORTED_CURRICULA}
 
 # Endpoint to get supported grades
 @app.get("/grades")
 async def get_supported_grades():
     """Get list of supported grade levels"""
-    return {
-        "supported_grades": [
-            "Nursery",
-            "Pre-KG", 
-            "LKG",
-            "UKG",
-            "1st Grade",
-            "2nd Grade",
-            "3rd Grade",
-            "4th Grade", 
-            "5th Grade",
-            "6th Grade",
-            "7th Grade",
-            "8th Grade",
-            "9th Grade",
-            "10th Grade",
-            "11th Grade",
-            "12th Grade"
-        ]
-    }
+    return {"supported_grades": SUPPORTED_GRADES}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -6,11 +6,13 @@ import streamlit as st
 import sys
 import os
 import pandas as pd
-import json
-import re
 from pathlib import Path
 
 from src.crew.school_crew import schoolcrew
+from src.crew.results import result_text as get_result_text
+from src.crew.postprocess import postprocessor
+from src.crew.export import EXPORT_FORMATS, PYARROW_AVAILABLE, export_bytes
+from src.crew.fees import parse_fee
 
 def check_api_keys():
     """Check if API keys are set and valid"""
@@ -19,6 +21,22 @@ def check_api_keys():
     
     return bool(serper_key and gemini_key)
 
+def show_download_buttons(records, file_stem):
+    """Offer the results as CSV, plus Parquet/Arrow when pyarrow is installed"""
+    formats = [("csv", "CSV")]
+    if PYARROW_AVAILABLE:
+        formats += [("parquet", "Parquet"), ("arrow", "Arrow")]
+    
+    columns = st.columns(len(formats))
+    for column, (fmt, label) in zip(columns, formats):
+        with column:
+            st.download_button(
+                label=f"📥 Download Results as {label}",
+                data=export_bytes(records, fmt),
+                file_name=f"{file_stem}.{fmt}",
+                mime=EXPORT_FORMATS[fmt]
+            )
+
 def setup_api_keys():
     """Setup API keys interface"""
     st.markdown("### 🔑 API Keys Setup")
@@ -202,19 +220,21 @@ def main():
                     progress_bar.progress(20)
                     status_text.text("🤖 Initializing AI agents...")
                     
-                    # Create crew instance
-                    crew_instance = schoolcrew()
+                    # Create crew instance sized to the advanced options
+                    crew_instance = schoolcrew(
+                        max_results=max_results,
+                        include_fees=include_fees,
+                        include_ratings=include_ratings
+                    )
                     
                     # Update progress
                     progress_bar.progress(40)
                     status_text.text("🔍 Searching for schools...")
                     
                     # Run the crew with inputs
-                    result = crew_instance.crew().kickoff(inputs={
-                        'location': final_location,
-                        'grade': grade,
-                        'curriculum': curriculum
-                    })
+                    result = crew_instance.crew().kickoff(
+                        inputs=crew_instance.inputs(final_location, grade, curriculum)
+                    )
                     
                     # Update progress
                     progress_bar.progress(80)
@@ -230,36 +250,23 @@ def main():
                     st.subheader("🏫 Search Results")
                     
                     # Try to parse the result as a structured format
-                    if hasattr(result, 'raw'):
-                        result_text = result.raw
-                    else:
-                        result_text = str(result)
+                    result_text = get_result_text(result)
                     
-                    # Try to extract and parse JSON data first
-                    json_data = None
                     try:
-                        # Look for JSON data in the result
-                        json_match = re.search(r'```json\s*(\[.*?\])\s*```', result_text, re.DOTALL)
-                        if json_match:
-                            json_str = json_match.group(1)
-                            json_data = json.loads(json_str)
-                            
-                            # Create DataFrame from JSON
-                            df = pd.DataFrame(json_data)
+                        # Parsed, normalized and deduplicated the same way as the API
+                        records = postprocessor.schools(result_text)
+                        
+                        if records:
+                            # Create DataFrame from parsed records
+                            df = pd.DataFrame(records)
                             
                             # Display structured results
                             st.subheader("📊 School Search Results")
                             st.dataframe(df, use_container_width=True)
                             
-                            # Download button
-                            csv = df.to_csv(index=False)
+                            # Download buttons
                             location_for_filename = "current_location" if st.session_state.use_current_location else final_location.replace(" ", "_")
-                            st.download_button(
-                                label="📥 Download Results as CSV",
-                                data=csv,
-                                file_name=f"school_search_{location_for_filename}_{grade}_{curriculum}.csv",
-                                mime="text/csv"
-                            )
+                            show_download_buttons(records, f"school_search_{location_for_filename}_{grade}_{curriculum}")
                             
                             # Show summary stats
                             st.subheader("📈 Summary")
@@ -267,44 +274,15 @@ def main():
                             with col1:
                                 st.metric("Total Schools Found", len(df))
                             with col2:
-                                schools_with_fees = df[df['Fees'] != 'N/A']['Fees'].count() if 'Fees' in df.columns else 0
+                                # Free-text fees: count the ones with an actual amount, not just not "N/A"
+                                schools_with_fees = int(df['Fees'].map(parse_fee).notna().sum()) if 'Fees' in df.columns else 0
                                 st.metric("Schools with Fee Info", schools_with_fees)
                             with col3:
                                 unique_locations = df['Location'].nunique() if 'Location' in df.columns else 0
                                 st.metric("Different Locations", unique_locations)
-                        
                         else:
-                            # Fallback: try to parse table-like data
-                            lines = result_text.split('\n')
-                            table_data = []
-                            
-                            for line in lines:
-                                if '|' in line and len(line.split('|')) >= 4:
-                                    row_data = [cell.strip() for cell in line.split('|')]
-                                    if row_data and row_data[0] and not row_data[0].startswith('-'):
-                                        table_data.append(row_data)
-                            
-                            if table_data and len(table_data) > 1:
-                                # Create DataFrame
-                                df = pd.DataFrame(table_data[1:], columns=table_data[0])
-                                st.subheader("📊 Structured Results")
-                                st.dataframe(df, use_container_width=True)
-                                
-                                # Download button
-                                csv = df.to_csv(index=False)
-                                location_for_filename = "current_location" if st.session_state.use_current_location else final_location.replace(" ", "_")
-                                st.download_button(
-                                    label="📥 Download Results as CSV",
-                                    data=csv,
-                                    file_name=f"school_search_{location_for_filename}_{grade}_{curriculum}.csv",
-                                    mime="text/csv"
-                                )
-                            else:
-                                st.info("Could not parse structured data from results")
+                            st.info("Could not parse structured data from results")
                                 
-                    except json.JSONDecodeError as e:
-                        st.warning(f"Could not parse JSON data: {str(e)}")
-                        st.info("Showing raw results instead")
                     except Exception as e:
                         st.warning(f"Error parsing results: {str(e)}")
                     
@@ -364,7 +342,7 @@ def main():
         - 🌍 Auto location detection
         - 📚 Multiple curriculum support
         - 📊 Detailed school analysis
-        - 📥 Export results to CSV
+        - 📥 Export results to CSV, Parquet or Arrow
         - 🔑 Secure API key management
         """)
         
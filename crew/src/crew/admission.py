@@ -0,0 +1,131 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from src.crew import metrics
+
+# Limits apply per worker process; with gunicorn the service admits workers x MAX_CONCURRENT_RUNS
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", "4"))
+MAX_QUEUED_RUNS = int(os.getenv("MAX_QUEUED_RUNS", "16"))
+MAX_QUEUED_PER_KEY = int(os.getenv("MAX_QUEUED_PER_KEY", "4"))
+# Longest a request may wait for a slot before it is turned away
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", "60"))
+# Starting guess for a run's duration, refined as runs finish
+EXPECTED_RUN_SECONDS = float(os.getenv("EXPECTED_RUN_SECONDS", "30"))
+
+
+class AdmissionRejected(HTTPException):
+    """Request turned away without starting a crew run"""
+
+    def __init__(self, status_code, detail, retry_after, reason):
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+        self.reason = reason
+        metrics.ADMISSION_REJECTIONS.labels(reason).inc()
+
+
+class AdmissionController:
+    """Bounded admission queue for crew runs with round-robin fairness across API keys.
+
+    At most ``max_concurrent`` runs execute at once. Waiting requests are
+    queued per key, and a freed slot goes to the next key in turn, so a
+    partner sending a burst only delays its own requests.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_RUNS, max_queued=MAX_QUEUED_RUNS,
+                 max_queued_per_key=MAX_QUEUED_PER_KEY, queue_timeout=QUEUE_TIMEOUT_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_queued_per_key = max_queued_per_key
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.queued = 0
+        self.queues = OrderedDict()
+        self.run_seconds = EXPECTED_RUN_SECONDS
+
+    def estimated_wait(self, position):
+        """Seconds until the request at ``position`` in the queue starts"""
+        return self.run_seconds * (position // self.max_concurrent + 1)
+
+    def retry_after(self):
+        return max(1, math.ceil(self.estimated_wait(self.queued)))
+
+    async def acquire(self, key):
+        if self.running < self.max_concurrent and not self.queued:
+            self.running += 1
+            return
+        if self.queued >= self.max_queued:
+            raise AdmissionRejected(503, "Server busy, try again later", self.retry_after(), "queue_full")
+        if len(self.queues.get(key, ())) >= self.max_queued_per_key:
+            raise AdmissionRejected(429, "Too many queued searches for this API key", self.retry_after(), "key_limit")
+        # Fail fast rather than after the timeout when the wait is already too long
+        if self.estimated_wait(self.queued) > self.queue_timeout:
+            raise AdmissionRejected(503, "Server busy, try again later", self.retry_after(), "wait_too_long")
+
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(key, deque()).append(future)
+        self.queued += 1
+        metrics.ADMISSION_QUEUED.inc()
+        queued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the request gave up
+                self.release()
+            else:
+                self._remove(key, future)
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected(503, "Timed out waiting for a free slot", self.retry_after(), "timeout") from None
+            raise
+        finally:
+            metrics.ADMISSION_WAIT.observe(time.monotonic() - queued_at)
+
+    def _remove(self, key, future):
+        queue = self.queues.get(key)
+        if queue and future in queue:
+            queue.remove(future)
+            self.queued -= 1
+            metrics.ADMISSION_QUEUED.dec()
+            if not queue:
+                del self.queues[key]
+
+    def release(self, run_seconds=None):
+        """Free a slot, handing it to the next key in round-robin order"""
+        if run_seconds is not None:
+            self.run_seconds = 0.8 * self.run_seconds + 0.2 * run_seconds
+        while self.queues:
+            key, queue = next(iter(self.queues.items()))
+            future = queue.popleft()
+            self.queued -= 1
+            metrics.ADMISSION_QUEUED.dec()
+            if queue:
+                self.queues.move_to_end(key)
+            else:
+                del self.queues[key]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.running -= 1
+
+    @asynccontextmanager
+    async def slot(self, key):
+        """Hold one crew run slot for the duration of the block"""
+        await self.acquire(key)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+
+def client_key(request):
+    """Fairness key: the caller's API key, else its address"""
+    return request.headers.get("X-API-Key") or (request.client.host if request.client else "anonymous")
+
+
+controller = AdmissionController()
@@ -0,0 +1,246 @@
+"""Run many school searches offline, from a CSV, JSONL or JSON array file of queries.
+
+Each query has location, grade and curriculum, and optionally id,
+max_results, include_fees, include_ratings and budget_usd. Results are
+appended to a JSONL file as they finish; rerunning the same command skips
+the queries already answered there, so an interrupted run resumes.
+
+Run from the ``crew`` directory:
+
+    python -m src.crew.batch queries.csv --output results.jsonl --workers 4 --gemini-rpm 60
+    python -m src.crew.batch queries.jsonl --output results.jsonl --dry-run
+"""
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+def _flag(value, default=True):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def normalize_query(row):
+    """Query dict with typed options and a stable id"""
+    query = {
+        "location": str(row["location"]).strip(),
+        "grade": str(row.get("grade") or "1st Grade").strip(),
+        "curriculum": str(row.get("curriculum") or "CBSE").strip(),
+        "max_results": int(row.get("max_results") or 20),
+        "include_fees": _flag(row.get("include_fees")),
+        "include_ratings": _flag(row.get("include_ratings")),
+        "budget_usd": float(row["budget_usd"]) if row.get("budget_usd") not in (None, "") else None,
+    }
+    if row.get("id") not in (None, ""):
+        query["id"] = str(row["id"])
+    else:
+        # Same query, same id: resuming works even if the input file is re-sorted
+        canonical = json.dumps({key: str(value).lower() for key, value in query.items()}, sort_keys=True)
+        query["id"] = hashlib.sha1(canonical.encode()).hexdigest()[:16]
+    return query
+
+
+def read_queries(path):
+    """Queries from a CSV (with a header row), JSONL or JSON array file, in file order, without duplicate ids.
+
+    Invalid rows are reported and skipped; the rest of the file still runs.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    with open(path, encoding="utf-8", newline="") as file:
+        if suffix == ".json":
+            rows = json.load(file)
+            if not isinstance(rows, list):
+                raise ValueError(f"{path} must hold a JSON array of queries")
+        elif suffix in (".jsonl", ".ndjson"):
+            # Decoded one by one below, so a bad line only loses itself
+            rows = file
+        else:
+            rows = csv.DictReader(file)
+        queries = {}
+        for number, row in enumerate(rows, 1):
+            try:
+                if isinstance(row, str):
+                    if not row.strip():
+                        continue
+                    row = json.loads(row)
+                if not isinstance(row, dict):
+                    raise ValueError(f"expected an object, got {type(row).__name__}")
+                query = normalize_query(row)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Skipping invalid query {number} in {path}: {e}", file=sys.stderr)
+                continue
+            queries.setdefault(query["id"], query)
+    return list(queries.values())
+
+
+def completed_ids(output):
+    """Ids already answered successfully in an existing output file"""
+    done = set()
+    if not Path(output).exists():
+        return done
+    with open(output, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by the interruption; that query runs again
+                continue
+            if record.get("success"):
+                done.add(record["id"])
+    return done
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
+
+
+def estimate(queries):
+    """Expected external calls and cost of running the queries"""
+    from src.crew.school_crew import SearchPlan
+    from src.crew.usage import estimate_cost
+
+    totals = {"queries": len(queries), "serper_calls": 0, "llm_calls": 0, "geolocation_calls": 0, "cost_usd": 0.0}
+    for query in queries:
+        plan = SearchPlan(query["location"], query["grade"], query["curriculum"], query["max_results"],
+                          query["include_fees"], query["include_ratings"], query["budget_usd"])
+        searches = plan.options["finder_searches"] + plan.options["analyzer_searches"]
+        totals["serper_calls"] += searches
+        # One LLM turn per tool call, plus each agent's final answer
+        geolocation = int("current location" in query["location"].lower())
+        totals["llm_calls"] += searches + geolocation + 2
+        totals["geolocation_calls"] += geolocation
+        totals["cost_usd"] += estimate_cost(plan.options)
+    totals["cost_usd"] = round(totals["cost_usd"], 4)
+    return totals
+
+
+def run_query(query):
+    """Run one search in a worker process; never raises"""
+    from src.crew.school_crew import SearchPlan
+    from src.crew.postprocess import process_schools
+    from src.crew.results import result_text
+
+    started = time.monotonic()
+    record = {"id": query["id"], "query": {key: value for key, value in query.items() if key != "id"}}
+    try:
+        plan = SearchPlan(query["location"], query["grade"], query["curriculum"], query["max_results"],
+                          query["include_fees"], query["include_ratings"], query["budget_usd"])
+        result, trace, usage = plan.run()
+        text = result_text(result)
+        # Already in a worker process: no point in the post-processing pool here
+        record.update(success=True, result=text, schools=process_schools(text), usage=usage.as_dict())
+    except Exception as e:
+        record.update(success=False, error=f"{type(e).__name__}: {e}")
+    record["duration_s"] = round(time.monotonic() - started, 2)
+    return record
+
+
+def run_batch(queries, output, workers=DEFAULT_WORKERS, progress=True):
+    """Run the queries not yet answered in ``output`` through a process pool, appending results.
+
+    Returns (succeeded, failed) counts for this run.
+    """
+    done = completed_ids(output)
+    pending = [query for query in queries if query["id"] not in done]
+    if progress and done:
+        print(f"Resuming: {len(queries) - len(pending)} of {len(queries)} queries already done", file=sys.stderr)
+    succeeded = failed = 0
+    if not pending:
+        return succeeded, failed
+
+    # Fresh interpreters: the parent may hold threads (crewai's event bus) that don't survive fork
+    context = multiprocessing.get_context("spawn")
+    with open(output, "a", encoding="utf-8") as file, ProcessPoolExecutor(workers, mp_context=context) as pool:
+        if file.tell() and not _ends_with_newline(output):
+            # Don't glue the first new record onto a line cut short by the interruption
+            file.write("\n")
+        queue = iter(pending)
+        running = {}
+        try:
+            while True:
+                # Keep a bounded number of queries in flight rather than submitting 10k futures
+                for query in queue:
+                    running[pool.submit(run_query, query)] = query
+                    if len(running) >= workers * 2:
+                        break
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    running.pop(future)
+                    record = future.result()
+                    file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    file.flush()
+                    os.fsync(file.fileno())
+                    if record["success"]:
+                        succeeded += 1
+                    else:
+                        failed += 1
+                    if progress:
+                        print(f"[{succeeded + failed}/{len(pending)}] {record['query']['location']} / "
+                              f"{record['query']['grade']} / {record['query']['curriculum']}: "
+                              f"{'ok' if record['success'] else record['error']} ({record['duration_s']}s)",
+                              file=sys.stderr)
+        except KeyboardInterrupt:
+            for future in running:
+                future.cancel()
+            print("Interrupted; rerun the same command to resume", file=sys.stderr)
+            raise
+    return succeeded, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", type=Path, help="CSV or JSONL file of queries")
+    parser.add_argument("--output", type=Path, help="JSONL results file (default: <input>.results.jsonl)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parallel crew runs (processes)")
+    parser.add_argument("--gemini-rpm", type=float, help="Gemini requests per minute across all workers")
+    parser.add_argument("--serper-rpm", type=float, help="Serper requests per minute across all workers")
+    parser.add_argument("--dry-run", action="store_true", help="Report expected API calls without running anything")
+    args = parser.parse_args(argv)
+    output = args.output or args.input.with_suffix(".results.jsonl")
+
+    # Before any crew module is imported, here or in the workers: they read these at import time
+    if args.gemini_rpm is not None:
+        os.environ["GEMINI_RPM"] = str(args.gemini_rpm)
+    if args.serper_rpm is not None:
+        os.environ["SERPER_RPM"] = str(args.serper_rpm)
+    # One set of token buckets for all worker processes
+    os.environ.setdefault("RATE_LIMIT_DB", str(output.with_suffix(".ratelimit.db")))
+
+    queries = read_queries(args.input)
+    done = completed_ids(output)
+    remaining = [query for query in queries if query["id"] not in done]
+
+    if args.dry_run:
+        totals = estimate(remaining)
+        totals["already_done"] = len(queries) - len(remaining)
+        print(json.dumps(totals, indent=2))
+        return
+
+    started = time.monotonic()
+    succeeded, failed = run_batch(queries, output, args.workers)
+    print(f"Done in {time.monotonic() - started:.1f}s: {succeeded} succeeded, {failed} failed, results in {output}",
+          file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from src.crew import metrics
+from src.crew.shm_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+# Results younger than the soft TTL are fresh; up to the hard TTL they are
+# still served at once while a background run refreshes them (0 disables serving)
+RESULT_CACHE_SOFT_TTL = float(os.getenv("RESULT_CACHE_SOFT_TTL", str(6 * 3600)))
+RESULT_CACHE_HARD_TTL = float(os.getenv("RESULT_CACHE_HARD_TTL", str(72 * 3600)))
+# Oldest result still worth serving when the providers are down
+RESULT_CACHE_MAX_AGE = float(os.getenv("RESULT_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
+
+def normalize(value):
+    return " ".join(str(value).lower().split())
+
+
+def cache_key(inputs):
+    """Key of a search: same place, grade and curriculum, same result size and columns"""
+    return (
+        normalize(inputs["location"]),
+        normalize(inputs["grade"]),
+        normalize(inputs["curriculum"]),
+        inputs.get("max_results"),
+        inputs.get("output_columns"),
+    )
+
+
+class CachedResult:
+    __slots__ = ("text", "created")
+
+    def __init__(self, text, created=None):
+        self.text = text
+        self.created = created or time.time()
+
+    @property
+    def age(self):
+        return time.time() - self.created
+
+
+class ResultCache:
+    """Thread-safe LRU of finished search results, keyed by cache_key().
+
+    Backed by the host-wide shared cache when it is available, so a result
+    computed by one gunicorn worker is a hit in all of them.
+    """
+
+    def __init__(self, size=RESULT_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, max_age=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (max_age is None or entry.age <= max_age):
+                self.entries.move_to_end(key)
+            else:
+                entry = None
+        if entry is None and shared_cache is not None:
+            # Answered by another worker on this host
+            found = shared_cache.get_text(json.dumps(key), max_age)
+            if found is not None:
+                entry = self._store(key, CachedResult(*found))
+        metrics.CACHE_REQUESTS.labels("result", "hit" if entry else "miss").inc()
+        return entry
+
+    def put(self, key, text):
+        entry = self._store(key, CachedResult(text))
+        if shared_cache is not None:
+            shared_cache.put_text(json.dumps(key), text, entry.created)
+
+    def _store(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return entry
+
+
+result_cache = ResultCache()
+
+
+class Revalidator:
+    """Runs at most one background refresh per key at a time"""
+
+    def __init__(self):
+        self.inflight = set()
+        self.tasks = set()
+
+    def schedule(self, key, refresh):
+        """Start ``refresh()`` (a coroutine function) unless one is already running for ``key``"""
+        if key in self.inflight:
+            metrics.CACHE_REVALIDATIONS.labels("joined").inc()
+            return False
+        self.inflight.add(key)
+        task = asyncio.get_running_loop().create_task(self._run(key, refresh))
+        # The event loop only keeps weak references to tasks
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        metrics.CACHE_REVALIDATIONS.labels("started").inc()
+        return True
+
+    async def _run(self, key, refresh):
+        try:
+            await refresh()
+            metrics.CACHE_REVALIDATIONS.labels("refreshed").inc()
+        except Exception as e:
+            metrics.CACHE_REVALIDATIONS.labels("failed").inc()
+            logger.warning("Background refresh of %s failed: %s", key, e)
+        finally:
+            self.inflight.discard(key)
+
+
+revalidator = Revalidator()
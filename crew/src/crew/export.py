@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+
+# Try to import the optional columnar dependency
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+# Rows per streamed chunk / Parquet row group
+CHUNK_ROWS = 1000
+
+
+def columns_for(records):
+    """Union of record keys, in first-seen order"""
+    columns = {}
+    for record in records:
+        for key in record:
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+def _chunks(records, size):
+    for start in range(0, len(records), size):
+        yield records[start:start + size]
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose buffered bytes can be taken out between writes"""
+
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_csv(records, chunk_rows=CHUNK_ROWS):
+    """Yield the records as CSV, one encoded chunk at a time"""
+    columns = columns_for(records)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for chunk in _chunks(records, chunk_rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_jsonl(records, chunk_rows=CHUNK_ROWS):
+    """Yield the records as JSON lines"""
+    for chunk in _chunks(records, chunk_rows):
+        yield "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in chunk).encode("utf-8")
+
+
+def arrow_table(records, columns=None):
+    """Build an Arrow table of string columns from the records"""
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is required for Parquet/Arrow export")
+    columns = columns or columns_for(records)
+    data = {
+        column: [None if record.get(column) is None else str(record.get(column)) for record in records]
+        for column in columns
+    }
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    return pa.Table.from_pydict(data, schema=schema)
+
+
+def iter_parquet(records, chunk_rows=CHUNK_ROWS):
+    """Yield a Parquet file, one row group at a time"""
+    columns = columns_for(records)
+    sink = _DrainableSink()
+    writer = None
+    for chunk in _chunks(records, chunk_rows):
+        table = arrow_table(chunk, columns)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is None:
+        writer = pq.ParquetWriter(sink, arrow_table([], columns).schema)
+    writer.close()
+    yield sink.drain()
+
+
+def iter_arrow(records, chunk_rows=CHUNK_ROWS):
+    """Yield an Arrow IPC file, one record batch at a time"""
+    columns = columns_for(records)
+    sink = _DrainableSink()
+    schema = arrow_table([], columns).schema
+    with pa.ipc.new_file(sink, schema) as writer:
+        for chunk in _chunks(records, chunk_rows):
+            writer.write_table(arrow_table(chunk, columns))
+            yield sink.drain()
+    yield sink.drain()
+
+
+EXPORTERS = {
+    "csv": iter_csv,
+    "jsonl": iter_jsonl,
+    "parquet": iter_parquet,
+    "arrow": iter_arrow,
+}
+
+
+def iter_export(records, fmt):
+    """Stream the records in the given export format"""
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    return EXPORTERS[fmt](records)
+
+
+def export_bytes(records, fmt):
+    """Serialize the records in the given export format"""
+    return b"".join(iter_export(records, fmt))
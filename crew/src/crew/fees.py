@@ -0,0 +1,199 @@
+import json
+import math
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from src.crew.postprocess import MISSING, process_schools
+
+# Fees are compared in this currency; others are converted at the rough rates below
+FEE_CURRENCY = os.getenv("FEE_CURRENCY", "INR")
+# Units of FEE_CURRENCY per unit of each currency, e.g. FEE_FX_RATES='{"USD": 84}'
+FX_RATES = {"INR": 1.0, "USD": 84.0, "EUR": 91.0, "GBP": 107.0, "AED": 22.9, "SGD": 62.0}
+FX_RATES.update(json.loads(os.getenv("FEE_FX_RATES", "{}")))
+# Most Indian schools bill three terms a year
+TERMS_PER_YEAR = int(os.getenv("FEE_TERMS_PER_YEAR", "3"))
+
+CURRENCY_MARKERS = (
+    ("INR", re.compile(r"₹|\binr\b|\brs\.?|\brupees?\b", re.IGNORECASE)),
+    ("USD", re.compile(r"\$|\busd\b|\bdollars?\b", re.IGNORECASE)),
+    ("EUR", re.compile(r"€|\beur\b|\beuros?\b", re.IGNORECASE)),
+    ("GBP", re.compile(r"£|\bgbp\b|\bpounds?\b", re.IGNORECASE)),
+    ("AED", re.compile(r"\baed\b|\bdirhams?\b", re.IGNORECASE)),
+    ("SGD", re.compile(r"\bsgd\b|\bs\$", re.IGNORECASE)),
+)
+# Payments per year for each billing period; annual when none is mentioned
+PERIODS = (
+    ("monthly", 12, re.compile(r"month|\bp\.?\s?m\b|/\s*m(?:o|th)?\b|\bmthly\b", re.IGNORECASE)),
+    ("quarterly", 4, re.compile(r"quarter", re.IGNORECASE)),
+    ("termly", TERMS_PER_YEAR, re.compile(r"\bterms?\b|termly", re.IGNORECASE)),
+    ("half-yearly", 2, re.compile(r"half[\s-]?year|semester|bi-?annual", re.IGNORECASE)),
+    ("annual", 1, re.compile(r"annum|annual|year|\bp\.?\s?a\b|yearly", re.IGNORECASE)),
+)
+_AMOUNT = re.compile(
+    r"(\d[\d,]*(?:\.\d+)?)\s*(lakhs?|lacs?|crores?|cr\b|l\b|k\b|thousand)?"
+    r"(?:\s*(?:-|–|to)\s*(?:₹|rs\.?|inr|\$)?\s*(\d[\d,]*(?:\.\d+)?)\s*(lakhs?|lacs?|crores?|cr\b|l\b|k\b|thousand)?)?",
+    re.IGNORECASE
+)
+MULTIPLIERS = {"l": 1e5, "c": 1e7, "k": 1e3, "t": 1e3}
+# Smaller numbers are grades, years or ratings ("Grades 1-5: Rs 40,000"), not fees
+MIN_FEE_AMOUNT = 100
+# Characters next to an amount searched for its billing period
+PERIOD_CONTEXT_CHARS = 30
+_DIGIT = re.compile(r"\d")
+# Academic sessions ("2024-25", "2024/2025") and bare years date a fee, they are not amounts
+_YEAR_RANGE = re.compile(r"\b(?:19|20)\d\d\s*[-–/]\s*\d{2,4}\b")
+_YEAR = re.compile(r"(?:19|20)\d\d")
+_CURRENCY_BEFORE = re.compile(r"(?:₹|\brs\.?|\binr|\$|€|£|\baed|\bsgd)\s*$", re.IGNORECASE)
+
+
+class FeeRange:
+    """Annual fee range of a school, in FEE_CURRENCY"""
+    __slots__ = ("min", "max", "currency", "period")
+
+    def __init__(self, min, max, currency, period):
+        self.min = min
+        self.max = max
+        self.currency = currency
+        self.period = period
+
+    @property
+    def mid(self):
+        return (self.min + self.max) / 2
+
+    def as_dict(self):
+        return {"annual_min": round(self.min), "annual_max": round(self.max), "currency": FEE_CURRENCY,
+                "source_currency": self.currency, "period": self.period}
+
+
+def _multiplier(unit):
+    return MULTIPLIERS.get((unit or "").lower()[:1], 1)
+
+
+def _bare(number):
+    """A short number without separators ("1.2"), which takes its unit from the other end of a range"""
+    return "," not in number and float(number) < 1000
+
+
+def _periods(text):
+    return [(name, count) for name, count, marker in PERIODS if marker.search(text)]
+
+
+def _following_end(text, match):
+    """End of the words after an amount that can name its period: up to the next number"""
+    end = min(len(text), match.end() + PERIOD_CONTEXT_CHARS)
+    next_number = _DIGIT.search(text, match.end(), end)
+    return next_number.start() if next_number else end
+
+
+def _gaps(text, match):
+    """Spans of the text outside the words following the other amounts"""
+    start = 0
+    for other in _AMOUNT.finditer(text):
+        if other.start() != match.start():
+            yield start, other.end()
+            start = _following_end(text, other)
+    yield start, len(text)
+
+
+def _period(text, match):
+    """Billing period of the matched amount.
+
+    Taken from the words right after the amount, else right before it; only
+    when neither names one does the rest of the text count, the annual
+    period first ("1,20,000 (annual), transport 2000/month" is annual).
+    """
+    following = text[match.end():_following_end(text, match)]
+    preceding = text[max(0, match.start() - PERIOD_CONTEXT_CHARS):match.start()]
+    preceding = re.split(r"\d", preceding)[-1]
+    for context in (following, preceding):
+        periods = _periods(context)
+        if periods:
+            return periods[0]
+    # Periods right after other amounts belong to them ("1,20,000 ... transport 2000/month")
+    rest = "".join(text[start:end] for start, end in _gaps(text, match))
+    periods = _periods(rest)
+    return next((period for period in periods if period[0] == "annual"), periods[0] if periods else ("annual", 1))
+
+
+def _is_year(text, match):
+    """A bare year ("fees for 2025"), unless a currency or billing period marks it as an amount"""
+    low, low_unit, high, _ = match.groups()
+    if high or low_unit or not _YEAR.fullmatch(low):
+        return False
+    following = re.split(r"[,.;:()]", text[match.end():_following_end(text, match)])[0]
+    return not _CURRENCY_BEFORE.search(text[:match.start()]) and not _periods(following)
+
+
+def parse_fee(text):
+    """Normalize a free-text fee ("₹1.2L per annum", "INR 8,000/month", "1-1.5 lakh") to a FeeRange.
+
+    Returns None for N/A and for text without an amount.
+    """
+    if text is None or text == MISSING:
+        return None
+    text = str(text)
+    # Blanked rather than removed, so the periods around each amount stay where they were
+    amounts = _YEAR_RANGE.sub(lambda year: " " * len(year.group()), text)
+    for match in _AMOUNT.finditer(amounts):
+        if _is_year(amounts, match):
+            continue
+        low, low_unit, high, high_unit = match.groups()
+        # "1.2-1.5 L": the unit written once applies to both ends, but not to a full amount ("80,000 - 1.2 L")
+        if not low_unit and high_unit and _bare(low):
+            low_unit = high_unit
+        low = float(low.replace(",", "")) * _multiplier(low_unit)
+        high = float(high.replace(",", "")) * _multiplier(high_unit or low_unit) if high else low
+        if max(low, high) >= MIN_FEE_AMOUNT:
+            break
+    else:
+        return None
+    currency = next((code for code, marker in CURRENCY_MARKERS if marker.search(text)), FEE_CURRENCY)
+    period, per_year = _period(amounts, match)
+    rate = FX_RATES.get(currency, 1.0) / FX_RATES.get(FEE_CURRENCY, 1.0)
+    low, high = sorted((low * per_year * rate, high * per_year * rate))
+    return FeeRange(low, high, currency, period)
+
+
+class FeeIndex:
+    """Schools sorted by annual minimum fee, for range filters in O(log n + matches)"""
+
+    def __init__(self, schools):
+        self.schools = schools
+        ranges = [parse_fee(school.get("Fees", MISSING)) for school in schools]
+        self.known = np.array([i for i, fee in enumerate(ranges) if fee is not None], dtype=np.int64)
+        self.unknown = np.array([i for i, fee in enumerate(ranges) if fee is None], dtype=np.int64)
+        mins = np.array([ranges[i].min for i in self.known], dtype=float)
+        maxes = np.array([ranges[i].max for i in self.known], dtype=float)
+        order = np.argsort(mins, kind="stable")
+        self.mins, self.maxes, self.ids = mins[order], maxes[order], self.known[order]
+        self.ranges = ranges
+
+    def matching(self, min_fee=None, max_fee=None, include_unknown=False):
+        """Positions of schools whose fee range overlaps [min_fee, max_fee], in the original order"""
+        end = len(self.mins) if max_fee is None else int(np.searchsorted(self.mins, max_fee, side="right"))
+        ids = self.ids[:end]
+        if min_fee is not None:
+            ids = ids[self.maxes[:end] >= min_fee]
+        if include_unknown:
+            ids = np.concatenate([ids, self.unknown])
+        return np.sort(ids)
+
+    def filter(self, min_fee=None, max_fee=None, include_unknown=False):
+        """Schools whose fees fit the range, each with its normalized annual fee"""
+        return [dict(self.schools[i], fee=self.ranges[i].as_dict() if self.ranges[i] else None)
+                for i in self.matching(min_fee, max_fee, include_unknown)]
+
+
+@lru_cache(maxsize=int(os.getenv("FEE_INDEX_CACHE_SIZE", "256")))
+def fee_index(text):
+    """FeeIndex of a crew output, kept so repeated filters on a cached result skip parsing"""
+    return FeeIndex(process_schools(text))
+
+
+def annual_fee(text):
+    """Midpoint of the normalized annual fee range, NaN when unknown"""
+    fee = parse_fee(text)
+    return fee.mid if fee else math.nan
@@ -0,0 +1,91 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import weakref
+
+import httpx
+
+# Try to import the HTTP/2 support httpx needs for http2=True
+try:
+    import h2  # noqa: F401
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Connections kept per worker across all async tool calls; requests beyond it wait for a free one
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "50"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+# One HTTP/2 connection carries many concurrent requests to the same host
+HTTP2_ENABLED = os.getenv("HTTP2", "true").lower() == "true" and H2_AVAILABLE
+
+# httpx clients belong to the event loop they were first used on
+_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_background_loop = None
+
+
+def async_client():
+    """Shared connection-pooled client of the running event loop.
+
+    Timeouts are left to the callers, which pass call_timeout() per request.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            client = _clients[loop] = httpx.AsyncClient(
+                http2=HTTP2_ENABLED,
+                limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                                    keepalive_expiry=HTTP_KEEPALIVE_SECONDS),
+                follow_redirects=True,
+            )
+            logger.debug("Opened shared HTTP client (http2=%s)", HTTP2_ENABLED)
+        return client
+
+
+async def aclose_client():
+    """Close the running loop's client, e.g. at application shutdown"""
+    with _lock:
+        client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def close_background_client():
+    """Close the client that run_async() callers share, e.g. at application shutdown"""
+    with _lock:
+        loop = _background_loop
+    if loop is not None:
+        asyncio.run_coroutine_threadsafe(aclose_client(), loop).result()
+
+
+def background_loop():
+    """Event loop on a daemon thread, shared by sync callers of run_async()"""
+    global _background_loop
+    with _lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="http-client-loop", daemon=True).start()
+        return _background_loop
+
+
+def run_async(function, *args, **kwargs):
+    """Run ``function(*args, **kwargs)`` on the background loop and wait for its result.
+
+    crewai calls tools from worker threads; this lets them await the shared
+    client, and each other, instead of opening a loop and a pool per call.
+    The coroutine sees the caller's context (deadline, usage, trace).
+    """
+    context = contextvars.copy_context()
+    loop = background_loop()
+
+    async def in_context():
+        return await loop.create_task(function(*args, **kwargs), context=context)
+
+    return asyncio.run_coroutine_threadsafe(in_context(), loop).result()
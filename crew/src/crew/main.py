@@ -1,12 +1,18 @@
 from school_crew import schoolcrew
 
-crew_instance = schoolcrew()
+location = input("Enter the location you are looking for schools : ") or "Bangalore | use my current location"
+grade = input("Enter the grade you are interested in (e.g., 1st Grade): ") or "1st Grade"
+curriculum = input("Enter the curriculum you prefer (e.g., CBSE, ICSE): ") or "CBSE"
+while True:
+    answer = input("Maximum number of schools (5-50, default 20): ").strip() or "20"
+    try:
+        max_results = int(answer)
+        break
+    except ValueError:
+        print(f"Please enter a number, not {answer!r}.")
 
-inputs = {
-    "location": input("Enter the location you are looking for schools : ") or "Bangalore | use my current location",
-    "grade": input("Enter the grade you are interested in (e.g., 1st Grade): ") or "1st Grade",
-    "curriculum": input("Enter the curriculum you prefer (e.g., CBSE, ICSE): ") or "CBSE"
-}
+crew_instance = schoolcrew(max_results=max_results)
+inputs = crew_instance.inputs(location, grade, curriculum)
 
 result = crew_instance.crew().kickoff(inputs=inputs)
 
@@ -0,0 +1,177 @@
+import os
+
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py), every worker writes
+# its samples there and /metrics aggregates all of them
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Crew runs take tens of seconds, external calls milliseconds to seconds
+REQUEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180, 300)
+CALL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+TOKEN_BUCKETS = (500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+COST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+HTTP_REQUESTS = Counter(
+    "school_crew_http_requests_total", "HTTP requests by endpoint and status",
+    ["method", "endpoint", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "school_crew_http_request_duration_seconds", "HTTP request latency by endpoint",
+    ["method", "endpoint"], buckets=REQUEST_BUCKETS
+)
+CREW_RUNS_IN_FLIGHT = Gauge(
+    "school_crew_crew_runs_in_flight", "Crew runs currently executing", multiprocess_mode="livesum"
+)
+CREW_RUNS_QUEUED = Gauge(
+    "school_crew_crew_runs_queued", "Admitted crew runs waiting for a threadpool thread", multiprocess_mode="livesum"
+)
+EXTERNAL_CALLS = Counter(
+    "school_crew_external_calls_total", "Calls to external providers (serper, gemini, geolocation)",
+    ["provider", "outcome"]
+)
+EXTERNAL_LATENCY = Histogram(
+    "school_crew_external_call_duration_seconds", "External provider call latency",
+    ["provider"], buckets=CALL_BUCKETS
+)
+EXTERNAL_HEDGES = Counter(
+    "school_crew_external_hedges_total", "Hedged provider calls (fired), and whether the hedge or the original answered first",
+    ["provider", "outcome"]
+)
+CIRCUIT_STATE = Gauge(
+    "school_crew_circuit_state", "Provider circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["provider"], multiprocess_mode="max"
+)
+DEGRADED_SEARCHES = Counter(
+    "school_crew_degraded_searches_total", "Searches answered with reduced data because a provider was unavailable",
+    ["reason"]
+)
+CACHE_REQUESTS = Counter(
+    "school_crew_cache_requests_total", "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"]
+)
+CACHE_EVICTIONS = Counter(
+    "school_crew_cache_evictions_total", "Entries evicted from or refused by a cache, by reason (clock, too_large)",
+    ["cache", "reason"]
+)
+CACHE_REVALIDATIONS = Counter(
+    "school_crew_cache_revalidations_total", "Background refreshes of stale cached results (started, joined, refreshed, failed)",
+    ["outcome"]
+)
+SEMANTIC_SIMILARITY = Histogram(
+    "school_crew_semantic_cache_similarity", "Similarity of the nearest cached search on each semantic cache lookup",
+    buckets=(0.3, 0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 0.98, 1.0)
+)
+SEMANTIC_HIT_OVERLAP = Histogram(
+    "school_crew_semantic_cache_hit_overlap", "Share of schools an audited semantic cache hit has in common with a fresh run",
+    buckets=(0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+)
+TOKENS_PER_SEARCH = Histogram(
+    "school_crew_tokens_per_search", "LLM tokens consumed per search",
+    ["kind"], buckets=TOKEN_BUCKETS
+)
+ADMISSION_REJECTIONS = Counter(
+    "school_crew_admission_rejections_total", "Searches turned away by admission control",
+    ["reason"]
+)
+ADMISSION_QUEUED = Gauge(
+    "school_crew_admission_queued", "Searches waiting in the admission queue for a crew slot",
+    multiprocess_mode="livesum"
+)
+ADMISSION_WAIT = Histogram(
+    "school_crew_admission_wait_seconds", "Time searches waited in the admission queue",
+    buckets=CALL_BUCKETS
+)
+RATE_LIMIT_WAIT = Histogram(
+    "school_crew_rate_limit_wait_seconds", "Time provider calls waited for the client-side rate limiter",
+    ["provider"], buckets=(0, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+)
+COST_PER_SEARCH = Histogram(
+    "school_crew_cost_usd_per_search", "Estimated provider cost per search in USD",
+    buckets=COST_BUCKETS
+)
+DOWNGRADES = Counter(
+    "school_crew_budget_downgrades_total", "Searches switched to cheaper behaviour to stay within budget",
+    ["level"]
+)
+ERRORS = Counter(
+    "school_crew_errors_total", "Errors by endpoint and exception class",
+    ["endpoint", "exception"]
+)
+
+
+def provider_for(span):
+    """Provider label for an LLM or tool span"""
+    if span.name == "llm.call":
+        model = str(span.attributes.get("llm.model") or "llm").lower()
+        return "gemini" if "gemini" in model else model.split("/")[0]
+    tool = str(span.attributes.get("tool.name", "tool")).lower()
+    if "serper" in tool or "search" in tool:
+        return "serper"
+    if "location" in tool:
+        return "geolocation"
+    return tool
+
+
+def observe_trace(trace):
+    """Record external calls, tool cache hits and tokens of a finished crew run"""
+    for span in trace.spans:
+        if span.name not in ("llm.call", "tool.call"):
+            continue
+        cached = bool(span.attributes.get("tool.cache_hit"))
+        if span.name == "tool.call":
+            CACHE_REQUESTS.labels("tool", "hit" if cached else "miss").inc()
+        if cached:
+            continue
+        provider = provider_for(span)
+        EXTERNAL_CALLS.labels(provider, "error" if span.status == 2 else "ok").inc()
+        EXTERNAL_LATENCY.labels(provider).observe(span.duration_ms / 1000)
+
+    llm = trace.timings()["llm"]
+    TOKENS_PER_SEARCH.labels("prompt").observe(llm["prompt_tokens"])
+    TOKENS_PER_SEARCH.labels("completion").observe(llm["completion_tokens"])
+
+
+def observe_usage(usage):
+    """Record the cost, budget downgrades and degradations of a finished crew run"""
+    COST_PER_SEARCH.observe(usage["cost_usd"])
+    for level in usage["downgrades"]:
+        DOWNGRADES.labels(level).inc()
+    for reason in usage["degraded"]:
+        DEGRADED_SEARCHES.labels(reason).inc()
+
+
+def record_error(endpoint, error):
+    ERRORS.labels(endpoint, type(error).__name__).inc()
+
+
+async def run_crew(function, *args):
+    """Run a blocking crew function in the threadpool, tracking queued and running crews"""
+    started = False
+
+    def tracked():
+        nonlocal started
+        started = True
+        CREW_RUNS_QUEUED.dec()
+        with CREW_RUNS_IN_FLIGHT.track_inprogress():
+            return function(*args)
+
+    CREW_RUNS_QUEUED.inc()
+    try:
+        return await run_in_threadpool(tracked)
+    finally:
+        if not started:
+            CREW_RUNS_QUEUED.dec()
+
+
+def render():
+    """Current metrics in the Prometheus text format, aggregated across workers"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
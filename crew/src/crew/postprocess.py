@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from src.crew.results import parse_schools
+
+logger = logging.getLogger(__name__)
+
+# Processes for parsing, normalizing and deduplicating crew output (0: in the calling thread)
+POSTPROCESS_WORKERS = int(os.getenv("POSTPROCESS_WORKERS", "0"))
+# Outputs shorter than this are processed inline: shipping them to a process costs more than the work
+POSTPROCESS_INLINE_CHARS = int(os.getenv("POSTPROCESS_INLINE_CHARS", "20000"))
+
+# Output columns of analyze_schools_task, in order
+COLUMNS = ("schoolName", "Grade", "Curriculum", "Location", "City", "Fees", "Rating", "Remarks")
+# Spellings the model uses for them, by lowercased alphanumeric key
+COLUMN_ALIASES = {
+    "schoolname": "schoolName", "school": "schoolName", "name": "schoolName",
+    "grade": "Grade", "grades": "Grade",
+    "curriculum": "Curriculum", "board": "Curriculum",
+    "location": "Location", "address": "Location",
+    "city": "City",
+    "fees": "Fees", "fee": "Fees", "annualfees": "Fees",
+    "rating": "Rating", "ratings": "Rating",
+    "remarks": "Remarks", "remark": "Remarks",
+}
+MISSING = "N/A"
+MISSING_VALUES = {"", "n/a", "na", "none", "null", "-", "--", "not available", "unknown"}
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_school(record):
+    """Record with canonical column names and tidy values; missing values become N/A"""
+    school = {}
+    for key, value in record.items():
+        column = COLUMN_ALIASES.get(_NON_ALNUM.sub("", str(key).lower()), str(key).strip())
+        value = " ".join(str(value).split()) if value is not None else ""
+        school[column] = MISSING if value.lower() in MISSING_VALUES else value
+    return school
+
+
+def school_key(school):
+    """Identity of a school for dedup: its name and city, ignoring case and punctuation"""
+    name = _NON_ALNUM.sub(" ", school.get("schoolName", "").lower()).split()
+    city = _NON_ALNUM.sub(" ", school.get("City", "").lower()).split()
+    return " ".join(word for word in name if word != "the"), " ".join(city)
+
+
+def dedupe_schools(schools):
+    """Drop repeated schools, filling the first occurrence's missing values from the repeats"""
+    merged = {}
+    for school in schools:
+        key = school_key(school)
+        if not key[0]:
+            continue
+        first = merged.setdefault(key, school)
+        if first is not school:
+            for column, value in school.items():
+                if first.get(column, MISSING) == MISSING:
+                    first[column] = value
+    return list(merged.values())
+
+
+def process_schools(text):
+    """Parse, normalize and dedup the school records of a crew output"""
+    try:
+        records = parse_schools(text)
+    except ValueError:
+        records = []
+    return dedupe_schools(normalize_school(record) for record in records if isinstance(record, dict))
+
+
+def pack(schools):
+    """Columnar JSON bytes: column names once, then one row of values per school"""
+    columns = [column for column in COLUMNS if any(column in school for school in schools)]
+    columns += [column for column in dict.fromkeys(key for school in schools for key in school) if column not in columns]
+    rows = [[school.get(column) for column in columns] for school in schools]
+    return json.dumps([columns, rows], ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def unpack(payload):
+    columns, rows = json.loads(payload)
+    return [{column: value for column, value in zip(columns, row) if value is not None} for row in rows]
+
+
+def _process_packed(text):
+    # Runs in a pool process; only the text goes in and the packed rows come out
+    return pack(process_schools(text))
+
+
+class Postprocessor:
+    """Runs process_schools() inline or in a process pool, so big outputs don't hold the GIL"""
+
+    def __init__(self, workers=POSTPROCESS_WORKERS, inline_chars=POSTPROCESS_INLINE_CHARS):
+        self.workers = workers
+        self.inline_chars = inline_chars
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def _pool(self):
+        with self.lock:
+            if self.pool is None:
+                # Fresh interpreters: forking a process with running threads and an event loop is unsafe
+                self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self.pool
+
+    def _inline(self, text):
+        return self.workers <= 0 or len(text) < self.inline_chars
+
+    def schools(self, text):
+        if self._inline(text):
+            return process_schools(text)
+        return unpack(self._pool().submit(_process_packed, text).result())
+
+    async def aschools(self, text):
+        """schools() without blocking the event loop on big outputs"""
+        if self._inline(text):
+            return process_schools(text)
+        payload = await asyncio.get_running_loop().run_in_executor(self._pool(), _process_packed, text)
+        return unpack(payload)
+
+    def map(self, texts, chunksize=8):
+        """School lists of many outputs, in order, spread over the pool"""
+        texts = list(texts)
+        if self.workers <= 0:
+            return [process_schools(text) for text in texts]
+        return [unpack(payload) for payload in self._pool().map(_process_packed, texts, chunksize=chunksize)]
+
+    def shutdown(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
+
+
+postprocessor = Postprocessor()
@@ -0,0 +1,139 @@
+"""Precompute crew results for the most requested searches.
+
+Runs the crew, at a bounded rate, for every search configured in
+config/precompute.yaml and every search requested at least
+PRECOMPUTE_MIN_HITS times, whenever its snapshot is missing or older than
+its refresh age. Popular searches are refreshed more often. The API serves
+the stored snapshots without running the crew.
+
+Run from the ``crew`` directory, e.g. from cron or as a sidecar:
+
+    python -m src.crew.precompute              # one pass
+    python -m src.crew.precompute --loop       # refresh forever
+    python -m src.crew.precompute --dry-run    # list what is due
+"""
+import argparse
+import logging
+import math
+import os
+import time
+from pathlib import Path
+
+import yaml
+
+from src.crew.school_crew import SUPPORTED_CURRICULA, SUPPORTED_GRADES, run_search, schoolcrew, search_inputs, search_options
+from src.crew.results import result_text
+from src.crew.snapshots import SnapshotStore, SNAPSHOT_DB, snapshot_key
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTE_CONFIG = os.getenv("PRECOMPUTE_CONFIG", str(Path(__file__).parent / "config" / "precompute.yaml"))
+# Crew runs per minute, on top of the provider rate limits
+PRECOMPUTE_RATE_PER_MINUTE = float(os.getenv("PRECOMPUTE_RATE_PER_MINUTE", "2"))
+# Snapshots nobody asks for are refreshed after MAX_AGE, the most popular ones down to MIN_AGE
+PRECOMPUTE_MAX_AGE = float(os.getenv("PRECOMPUTE_MAX_AGE_HOURS", "72")) * 3600
+PRECOMPUTE_MIN_AGE = float(os.getenv("PRECOMPUTE_MIN_AGE_HOURS", "12")) * 3600
+# Searches outside the config are precomputed once they are this popular
+PRECOMPUTE_MIN_HITS = int(os.getenv("PRECOMPUTE_MIN_HITS", "5"))
+PRECOMPUTE_MAX_POPULAR = int(os.getenv("PRECOMPUTE_MAX_POPULAR", "200"))
+PRECOMPUTE_INTERVAL_MINUTES = float(os.getenv("PRECOMPUTE_INTERVAL_MINUTES", "30"))
+
+
+def refresh_age(hits):
+    """Age after which a snapshot with ``hits`` requests is refreshed"""
+    return max(PRECOMPUTE_MIN_AGE, PRECOMPUTE_MAX_AGE / (1 + math.log10(1 + hits)))
+
+
+def configured_searches(path=PRECOMPUTE_CONFIG):
+    """Search parameters listed in the precompute config"""
+    with open(path, encoding="utf-8") as file:
+        config = yaml.safe_load(file) or {}
+    defaults = {
+        "max_results": config.get("max_results", 20),
+        "include_fees": config.get("include_fees", True),
+        "include_ratings": config.get("include_ratings", True),
+    }
+    grades = SUPPORTED_GRADES if config.get("grades") == "all" else config.get("grades", [])
+    curricula = SUPPORTED_CURRICULA if config.get("curricula") == "all" else config.get("curricula", [])
+    searches = [dict(defaults, location=city, grade=grade, curriculum=curriculum)
+                for city in config.get("cities", []) for grade in grades for curriculum in curricula]
+    searches += [dict(defaults, **combination) for combination in config.get("combinations", [])]
+    return searches
+
+
+def _inputs(params):
+    options = search_options(params["max_results"], params["include_fees"], params["include_ratings"])
+    return search_inputs(params["location"], params["grade"], params["curriculum"], options)
+
+
+def due_searches(store, config_path=PRECOMPUTE_CONFIG):
+    """Searches whose snapshot is missing or stale: missing first, then most requested"""
+    searches = {snapshot_key(_inputs(params)): params for params in configured_searches(config_path)}
+    for key, params, _ in store.popular(PRECOMPUTE_MIN_HITS, PRECOMPUTE_MAX_POPULAR):
+        searches.setdefault(key, params)
+
+    ages, hits = store.ages(), store.hits()
+    due = []
+    for key, params in searches.items():
+        age = ages.get(key)
+        if age is None or age > refresh_age(hits.get(key, 0)):
+            due.append((age is not None, -hits.get(key, 0), -(age or 0), key, params))
+    due.sort(key=lambda item: item[:3])
+    return [(key, params, ages.get(key), hits.get(key, 0)) for *_, key, params in due]
+
+
+def precompute(store, searches, rate_per_minute=PRECOMPUTE_RATE_PER_MINUTE):
+    """Run the crew for each search and store the results as new snapshot versions"""
+    interval = 60 / rate_per_minute if rate_per_minute > 0 else 0
+    stored = 0
+    for key, params, age, hits in searches:
+        started = time.monotonic()
+        crew_instance = schoolcrew(params["max_results"], params["include_fees"], params["include_ratings"])
+        inputs = crew_instance.inputs(params["location"], params["grade"], params["curriculum"])
+        try:
+            # Never snapshot a cached answer: the point is a fresh one
+            result, trace, usage = run_search(crew_instance, inputs, use_cache=False)
+        except Exception as e:
+            logger.warning("Precompute failed for %s / %s / %s: %s", params["location"], params["grade"], params["curriculum"], e)
+        else:
+            if usage.degraded:
+                logger.warning("Not storing degraded result for %s / %s / %s: %s",
+                               params["location"], params["grade"], params["curriculum"], usage.degraded)
+            else:
+                version = store.save(inputs, result_text(result), usage.as_dict())
+                stored += 1
+                logger.info("Stored %s / %s / %s v%d (%d requests, %.1fs)", params["location"], params["grade"],
+                            params["curriculum"], version, hits, trace.root.duration_ms / 1000)
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    return stored
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=PRECOMPUTE_CONFIG)
+    parser.add_argument("--db", default=SNAPSHOT_DB)
+    parser.add_argument("--rate", type=float, default=PRECOMPUTE_RATE_PER_MINUTE, help="Crew runs per minute")
+    parser.add_argument("--limit", type=int, help="At most this many runs per pass")
+    parser.add_argument("--loop", action="store_true", help="Keep refreshing every --interval minutes")
+    parser.add_argument("--interval", type=float, default=PRECOMPUTE_INTERVAL_MINUTES)
+    parser.add_argument("--dry-run", action="store_true", help="Only list the searches that are due")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    store = SnapshotStore(args.db)
+    while True:
+        searches = due_searches(store, args.config)[:args.limit]
+        logger.info("%d searches due for precomputing", len(searches))
+        if args.dry_run:
+            for _, params, age, hits in searches:
+                state = "missing" if age is None else f"{age / 3600:.1f}h old"
+                print(f"{params['location']} / {params['grade']} / {params['curriculum']}: {state}, {hits} requests")
+            return
+        precompute(store, searches, args.rate)
+        if not args.loop:
+            return
+        time.sleep(args.interval * 60)
+
+
+if __name__ == "__main__":
+    main()
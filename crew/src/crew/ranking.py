@@ -0,0 +1,174 @@
+import math
+import os
+import re
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from src.crew.fees import annual_fee
+from src.crew.postprocess import MISSING, process_schools
+from src.crew.semantic_cache import normalize_curriculum, normalize_location
+
+# Criteria scored for every school, each between 0 and 1
+CRITERIA = ("locality", "fee_fit", "curriculum", "grade", "freshness", "rating")
+DEFAULT_WEIGHTS = {"locality": 2.0, "fee_fit": 1.5, "curriculum": 2.0, "grade": 1.5, "freshness": 0.5, "rating": 1.0}
+# Score of a criterion the crew output says nothing about (fees N/A, no rating, ...)
+UNKNOWN_SCORE = 0.5
+# Details dated this many years back have lost half their freshness score
+FRESHNESS_HALF_LIFE_YEARS = float(os.getenv("RANKING_FRESHNESS_HALF_LIFE_YEARS", "2"))
+# Schools over the fee budget lose half their fee fit per this fraction of the budget
+FEE_OVERRUN_HALF = 0.25
+
+# Grades before 1st, as numbers on the same scale
+PRE_PRIMARY_LEVELS = {"nursery": -3, "prekg": -2, "playgroup": -3, "lkg": -1, "ukg": 0, "kg": 0, "kindergarten": 0}
+_LEVEL_TOKEN = re.compile(r"pre[\s-]?kg|play\s?group|nursery|lkg|ukg|kindergarten|\bk(?:g)?\b|\d{1,2}")
+# A year is an academic session ("2024-25", "2024/2025") or follows a dating word ("as of 2024");
+# other four-digit numbers are usually amounts ("Rs 2000/month")
+_YEAR = re.compile(
+    r"(?:\b(established in|established|founded in|founded|estd\.?|since|as of|in|for|session|academic year|updated"
+    r"|revised|till|until)\s+)?"
+    r"(?<![\w,.])((?:19|20)\d{2})(?:\s*[-–/]\s*(\d{4}|\d{2})\b)?",
+    re.IGNORECASE
+)
+DATING_WORDS = {"as of", "in", "for", "session", "academic year", "updated", "revised", "till", "until"}
+
+
+def grade_levels(text):
+    """Grade numbers mentioned in a grade description, pre-primary grades as 0 and below"""
+    levels = []
+    for token in _LEVEL_TOKEN.findall(str(text).lower()):
+        token = re.sub(r"[\s-]", "", token)
+        if token.isdigit():
+            if 1 <= int(token) <= 12:
+                levels.append(int(token))
+        else:
+            levels.append(PRE_PRIMARY_LEVELS.get(token, 0))
+    return levels
+
+
+def grade_match(school_grade, grade):
+    """1 when the school teaches the grade, 0 when its grades exclude it, UNKNOWN_SCORE otherwise"""
+    wanted, offered = grade_levels(grade), grade_levels(school_grade)
+    if not wanted or not offered:
+        return UNKNOWN_SCORE
+    # "1-12", "Nursery to 10th": a range; a single grade must match exactly
+    return float(min(offered) <= wanted[0] <= max(offered))
+
+
+def curriculum_match(school_curriculum, curriculum):
+    if school_curriculum == MISSING:
+        return UNKNOWN_SCORE
+    wanted = normalize_curriculum(curriculum)
+    offered = {normalize_curriculum(part) for part in re.split(r"[,/&+]|\band\b", school_curriculum)}
+    return float(wanted in offered or any(wanted in part for part in offered))
+
+
+def rating_value(text):
+    """Rating as a fraction of 5 (or of the scale it is given out of)"""
+    match = re.search(r"(\d+(?:\.\d+)?)(?:\s*(?:/|out of)\s*(\d+))?", str(text))
+    if match is None or text == MISSING:
+        return math.nan
+    value, scale = float(match.group(1)), float(match.group(2) or 5)
+    return min(1.0, value / scale) if scale else math.nan
+
+
+def details_year(school):
+    """Latest year the school's fees or remarks are dated to ("2024-25 fees" -> 2025), or None"""
+    years = []
+    for column in ("Fees", "Remarks"):
+        for word, start, end in _YEAR.findall(str(school.get(column, ""))):
+            year = int(start)
+            if end:
+                # Academic sessions end in the following year; other ranges are amounts
+                end = int(end) if len(end) == 4 else year // 100 * 100 + int(end)
+                if end != year + 1:
+                    continue
+                years.append(end)
+            elif word.lower() in DATING_WORDS:
+                years.append(year)
+    return max(years) if years else None
+
+
+def freshness(school, current_year=None):
+    """1 for details dated this year, halving every FRESHNESS_HALF_LIFE_YEARS; UNKNOWN_SCORE when undated"""
+    year = details_year(school)
+    if year is None:
+        return UNKNOWN_SCORE
+    current_year = current_year or time.localtime().tm_year
+    return 0.5 ** (max(current_year - year, 0) / FRESHNESS_HALF_LIFE_YEARS)
+
+
+def locality_match(school, place_words):
+    """Share of the searched place's words found in the school's address and city"""
+    if not place_words:
+        return UNKNOWN_SCORE
+    address = set(normalize_location(f"{school.get('Location', '')} {school.get('City', '')}").split())
+    return len(place_words & address) / len(place_words)
+
+
+class RankingFeatures:
+    """Per-school criteria of one result set that don't depend on the weights or fee budget.
+
+    Ranking is then a matrix-vector product and a sort, so re-weighting or a
+    new fee budget costs well under a millisecond for a result set.
+    """
+
+    def __init__(self, schools, location, grade, curriculum):
+        self.schools = schools
+        place_words = set(normalize_location(location, grade, curriculum).split())
+        self.locality = np.array([locality_match(school, place_words) for school in schools], dtype=float)
+        self.curriculum = np.array([curriculum_match(school.get("Curriculum", MISSING), curriculum) for school in schools], dtype=float)
+        self.grade = np.array([grade_match(school.get("Grade", MISSING), grade) for school in schools], dtype=float)
+        self.fees = np.array([annual_fee(school.get("Fees", MISSING)) for school in schools], dtype=float)
+        self.freshness = np.array([freshness(school) for school in schools], dtype=float)
+        self.rating = np.nan_to_num(
+            np.array([rating_value(school.get("Rating", MISSING)) for school in schools], dtype=float), nan=UNKNOWN_SCORE
+        )
+
+    def fee_fit(self, fee_budget=None):
+        """1 within the budget, halving for every FEE_OVERRUN_HALF of it above; unknown fees score UNKNOWN_SCORE"""
+        if not fee_budget:
+            return np.full(len(self.schools), UNKNOWN_SCORE)
+        overrun = np.clip((self.fees - fee_budget) / fee_budget, 0, None)
+        return np.nan_to_num(np.exp2(-overrun / FEE_OVERRUN_HALF), nan=UNKNOWN_SCORE)
+
+    def matrix(self, fee_budget=None):
+        """Schools x CRITERIA scores"""
+        return np.column_stack(
+            [self.locality, self.fee_fit(fee_budget), self.curriculum, self.grade, self.freshness, self.rating]
+        ) if self.schools else np.empty((0, len(CRITERIA)))
+
+    def scores(self, weights=None, matrix=None):
+        """Weighted score of every school, between 0 and 1"""
+        weights = dict(DEFAULT_WEIGHTS, **{key: value for key, value in (weights or {}).items() if value is not None})
+        vector = np.array([max(float(weights[criterion]), 0.0) for criterion in CRITERIA])
+        matrix = self.matrix() if matrix is None else matrix
+        return matrix @ vector / (vector.sum() or 1.0)
+
+    def rank(self, weights=None, fee_budget=None, limit=None, subset=None):
+        """Schools sorted by weighted score, best first, each with its score and per-criterion scores.
+
+        ``subset`` restricts the ranking to these school positions, e.g. the matches of a fee filter.
+        """
+        matrix = self.matrix(fee_budget)
+        scores = self.scores(weights, matrix)
+        # Stable, so equal scores keep the crew's order
+        positions = np.arange(len(self.schools)) if subset is None else np.asarray(subset, dtype=np.int64)
+        order = positions[np.argsort(-scores[positions], kind="stable")][:limit]
+        return [
+            dict(self.schools[i], score=round(float(scores[i]), 4),
+                 scores={criterion: round(float(value), 3) for criterion, value in zip(CRITERIA, matrix[i])})
+            for i in order
+        ]
+
+
+@lru_cache(maxsize=int(os.getenv("RANKING_CACHE_SIZE", "256")))
+def ranking_features(text, location, grade, curriculum):
+    """RankingFeatures of a crew output, kept for repeated re-ranking of the same result"""
+    return RankingFeatures(process_schools(text), location, grade, curriculum)
+
+
+def rank_result(text, location, grade, curriculum, weights=None, fee_budget=None, limit=None, subset=None):
+    """Rank the schools of a crew output against the search and the user's weights"""
+    return ranking_features(text, location, grade, curriculum).rank(weights, fee_budget, limit, subset)
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from src.crew import metrics
+from src.crew.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Provider quotas in requests per minute (0 disables limiting); defaults are the free tiers
+RATE_LIMITS = {
+    "gemini": (float(os.getenv("GEMINI_RPM", "15")), float(os.getenv("GEMINI_BURST", "3"))),
+    "serper": (float(os.getenv("SERPER_RPM", "300")), float(os.getenv("SERPER_BURST", "5"))),
+}
+# Share the buckets between gunicorn workers through this SQLite file
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB")
+
+
+class TokenBucket:
+    """Thread-safe token bucket for one process.
+
+    Callers reserve tokens up front and the bucket may go negative, so
+    concurrent callers queue in arrival order instead of racing for refills.
+    """
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, cost=1):
+        """Take ``cost`` tokens; returns how many seconds the caller must wait for them"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate) - cost
+            self.updated = now
+            return max(0.0, -self.tokens / self.rate)
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """Token bucket whose state lives in SQLite, shared by every process using the file"""
+
+    def __init__(self, path, name, rate_per_minute, burst):
+        super().__init__(rate_per_minute, burst)
+        self.path = path
+        self.name = name
+        with closing(self._connect()) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def reserve(self, cost=1):
+        with closing(self._connect()) as conn:
+            # Take the write lock before reading so workers can't both spend the same tokens
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+            tokens -= cost
+            conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (self.name, tokens, now))
+            conn.execute("COMMIT")
+        return max(0.0, -tokens / self.rate)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket(provider):
+    """The shared bucket for a provider, or None when it isn't limited"""
+    with _buckets_lock:
+        if provider not in _buckets:
+            rate, burst = RATE_LIMITS.get(provider, (0, 0))
+            if rate <= 0:
+                _buckets[provider] = None
+            elif RATE_LIMIT_DB:
+                _buckets[provider] = SQLiteTokenBucket(RATE_LIMIT_DB, provider, rate, burst)
+            else:
+                _buckets[provider] = TokenBucket(rate, burst)
+        return _buckets[provider]
+
+
+def _reserve(provider, cost):
+    limiter = bucket(provider)
+    if limiter is None:
+        return 0.0
+    wait = limiter.reserve(cost)
+    metrics.RATE_LIMIT_WAIT.labels(provider).observe(wait)
+    if wait > 1:
+        logger.info("Waiting %.1fs for the %s rate limit", wait, provider)
+    return wait
+
+
+def throttle(provider, cost=1):
+    """Block until the provider's quota allows another call; returns the seconds waited"""
+    wait = _reserve(provider, cost)
+    if wait:
+        with span("ratelimit.wait", **{"ratelimit.provider": provider, "ratelimit.wait_ms": round(wait * 1000, 1)}):
+            time.sleep(wait)
+    return wait
+
+
+async def athrottle(provider, cost=1):
+    """throttle() for coroutines: waits without blocking the event loop"""
+    wait = _reserve(provider, cost)
+    if wait:
+        with span("ratelimit.wait", **{"ratelimit.provider": provider, "ratelimit.wait_ms": round(wait * 1000, 1)}):
+            await asyncio.sleep(wait)
+    return wait
+
+
+def rate_limited(llm, provider="gemini"):
+    """Make every call of ``llm`` wait for the provider's quota.
+
+    crewai's LLM() factory returns provider-specific classes, so the calls
+    are wrapped on the instance instead of through a subclass.
+    """
+    call, acall = llm.call, getattr(llm, "acall", None)
+
+    def limited_call(*args, **kwargs):
+        throttle(provider)
+        return call(*args, **kwargs)
+
+    async def limited_acall(*args, **kwargs):
+        await athrottle(provider)
+        return await acall(*args, **kwargs)
+
+    object.__setattr__(llm, "call", limited_call)
+    if acall is not None:
+        object.__setattr__(llm, "acall", limited_acall)
+    return llm
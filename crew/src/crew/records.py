@@ -0,0 +1,136 @@
+import json
+import struct
+import sys
+from array import array
+
+from src.crew.postprocess import COLUMNS, MISSING
+
+# Bytes per code and per offset
+ITEM_SIZE = array("I").itemsize
+
+# Few distinct values across all schools: stored as codes into a shared value table
+INTERNED_COLUMNS = ("Grade", "Curriculum", "City", "Rating")
+# Mostly unique text: stored back to back in one UTF-8 buffer per column
+TEXT_COLUMNS = tuple(column for column in COLUMNS if column not in INTERNED_COLUMNS)
+
+
+def _array(data):
+    values = array("I")
+    values.frombytes(data)
+    return values
+
+
+class SchoolColumns:
+    """Append-only columnar store of schools.
+
+    Interned columns cost one 4-byte code per school, text columns their
+    UTF-8 bytes plus a 4-byte offset, so a school takes little more than the
+    length of its text instead of a dict and eight string objects. Schools
+    come back as dicts on access, with only the stored ``columns`` (those of
+    COLUMNS the search asked for); other fields are dropped.
+    """
+
+    def __init__(self, columns=COLUMNS):
+        self.columns = tuple(column for column in COLUMNS if column in columns)
+        self.interned = tuple(column for column in INTERNED_COLUMNS if column in self.columns)
+        self.text_columns = tuple(column for column in TEXT_COLUMNS if column in self.columns)
+        self.count = 0
+        self.values = {column: [] for column in self.interned}
+        self.lookup = {column: {} for column in self.interned}
+        self.codes = {column: array("I") for column in self.interned}
+        self.text = {column: bytearray() for column in self.text_columns}
+        self.offsets = {column: array("I", [0]) for column in self.text_columns}
+
+    @classmethod
+    def from_dicts(cls, schools, columns=COLUMNS):
+        store = cls(columns)
+        store.extend(schools)
+        return store
+
+    def _code(self, column, value):
+        lookup = self.lookup[column]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(self.values[column])
+            self.values[column].append(value)
+        return code
+
+    def append(self, school):
+        for column in self.interned:
+            self.codes[column].append(self._code(column, str(school.get(column, MISSING))))
+        for column in self.text_columns:
+            self.text[column] += str(school.get(column, MISSING)).encode()
+            self.offsets[column].append(len(self.text[column]))
+        self.count += 1
+
+    def extend(self, schools):
+        for school in schools:
+            self.append(school)
+
+    def __len__(self):
+        return self.count
+
+    def get(self, index, column):
+        """One field of one school, without building the whole dict; MISSING for columns not stored"""
+        if column in self.codes:
+            return self.values[column][self.codes[column][index]]
+        if column not in self.offsets:
+            return MISSING
+        offsets = self.offsets[column]
+        return self.text[column][offsets[index]:offsets[index + 1]].decode()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return {column: self.get(index, column) for column in self.columns}
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def column(self, column):
+        """All values of one column"""
+        return [self.get(i, column) for i in range(len(self))]
+
+    def nbytes(self):
+        """Approximate memory held by the store"""
+        size = sum(codes.itemsize * len(codes) for codes in self.codes.values())
+        size += sum(len(text) for text in self.text.values())
+        size += sum(offsets.itemsize * len(offsets) for offsets in self.offsets.values())
+        size += sum(sys.getsizeof(value) for values in self.values.values() for value in values)
+        return size
+
+    def to_bytes(self):
+        """Compact binary form: a JSON header with the value tables, then the raw arrays"""
+        header = json.dumps({"count": len(self), "columns": self.columns, "values": self.values},
+                            separators=(",", ":")).encode()
+        parts = [struct.pack("<I", len(header)), header]
+        for column in self.interned:
+            parts.append(self.codes[column].tobytes())
+        for column in self.text_columns:
+            parts += [self.offsets[column].tobytes(), struct.pack("<I", len(self.text[column])), bytes(self.text[column])]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = memoryview(data)
+        (length,) = struct.unpack_from("<I", data)
+        header = json.loads(bytes(data[4:4 + length]))
+        count, position = header["count"], 4 + length
+        store = cls(header["columns"])
+        store.count = count
+        for column in store.interned:
+            store.values[column] = header["values"][column]
+            store.lookup[column] = {value: code for code, value in enumerate(store.values[column])}
+            store.codes[column] = _array(data[position:position + ITEM_SIZE * count])
+            position += ITEM_SIZE * count
+        for column in store.text_columns:
+            store.offsets[column] = _array(data[position:position + ITEM_SIZE * (count + 1)])
+            position += ITEM_SIZE * (count + 1)
+            (size,) = struct.unpack_from("<I", data, position)
+            store.text[column] = bytearray(data[position + 4:position + 4 + size])
+            position += 4 + size
+        return store
@@ -0,0 +1,333 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import httpx
+import requests
+
+from src.crew import metrics
+
+logger = logging.getLogger(__name__)
+
+# Whole-request budget; every external call gets what is left of it
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "120"))
+# Upper bound for a single call even when the deadline is far away
+CALL_TIMEOUTS = {
+    "gemini": float(os.getenv("GEMINI_CALL_TIMEOUT", "60")),
+    "serper": float(os.getenv("SERPER_CALL_TIMEOUT", "10")),
+    "geolocation": float(os.getenv("GEOLOCATION_CALL_TIMEOUT", "5")),
+}
+# Hedge delay used until a provider has enough samples for its own p95
+DEFAULT_HEDGE_DELAY = float(os.getenv("DEFAULT_HEDGE_DELAY", "2"))
+MIN_HEDGE_SAMPLES = 20
+# Consecutive failures that open a provider's circuit, and how long it stays open
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+# Leave a little time to assemble the degraded answer
+DEADLINE_MARGIN = 1.0
+# Answers that blame the provider rather than the request: timeout, rate limit, server errors
+PROVIDER_FAILURE_STATUSES = {408, 429}
+
+_deadline = contextvars.ContextVar("school_crew_deadline", default=None)
+# Threads of call_provider(); an attempt that outlives its timeout keeps its thread until the
+# underlying client gives up, so a hung provider can fill the pool and queue later calls
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("HEDGE_WORKERS", "32")), thread_name_prefix="provider-call")
+
+
+class ProviderUnavailable(Exception):
+    """An external provider failed, timed out or has its circuit open"""
+
+    def __init__(self, provider, reason):
+        super().__init__(f"{provider} unavailable: {reason}")
+        self.provider = provider
+        self.reason = reason
+
+
+class ProviderError(Exception):
+    """A provider answered, but with an error instead of a result"""
+
+
+def is_provider_failure(error):
+    """Whether ``error`` says the provider is down or overloaded, rather than that the request was bad.
+
+    Only these count against the circuit breaker; bad requests, validation
+    and context-length errors are the caller's to handle.
+    """
+    if isinstance(error, (ProviderError, TimeoutError, ConnectionError, httpx.TransportError,
+                          requests.ConnectionError, requests.Timeout)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None) \
+        or getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and (status in PROVIDER_FAILURE_STATUSES or status >= 500)
+
+
+@contextmanager
+def deadline(seconds=REQUEST_DEADLINE_SECONDS):
+    """Bound every external call in this block by an overall deadline"""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def call_timeout(provider):
+    """Timeout for the next call to ``provider``: its own cap, shortened by the request deadline"""
+    timeout = CALL_TIMEOUTS.get(provider, 30.0)
+    end = _deadline.get()
+    if end is not None:
+        timeout = min(timeout, end - time.monotonic() - DEADLINE_MARGIN)
+    if timeout <= 0:
+        raise ProviderUnavailable(provider, "request deadline exceeded")
+    return timeout
+
+
+class LatencyTracker:
+    """Recent successful call durations of one provider"""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def p95(self):
+        with self.lock:
+            if len(self.samples) < MIN_HEDGE_SAMPLES:
+                return DEFAULT_HEDGE_DELAY
+            ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+class CircuitBreaker:
+    """Stops calling a provider after repeated failures, probing again after a cool-down"""
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, provider, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.provider = provider
+        self.max_failures = failures
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            # One probe at a time while half-open
+            if state == self.HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+        metrics.CIRCUIT_STATE.labels(self.provider).set(self.CLOSED)
+
+    def release(self):
+        """End a call that says nothing about the provider, e.g. a rejected request"""
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.max_failures or self.opened_at is not None:
+                if self.opened_at is None:
+                    logger.warning("Opening circuit for %s after %d failures", self.provider, self.failures)
+                self.opened_at = time.monotonic()
+        metrics.CIRCUIT_STATE.labels(self.provider).set(self.state)
+
+
+_trackers = {}
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def latency(provider):
+    with _registry_lock:
+        return _trackers.setdefault(provider, LatencyTracker())
+
+
+def breaker(provider):
+    with _registry_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+def is_available(provider):
+    return breaker(provider).state != CircuitBreaker.OPEN
+
+
+def _timed(provider, function):
+    started = time.monotonic()
+    value = function()
+    latency(provider).record(time.monotonic() - started)
+    return value
+
+
+def call_provider(provider, primary, hedge=None):
+    """Call ``primary`` within the provider's timeout, through its circuit breaker.
+
+    If ``hedge`` is given, it is started as well once the primary is slower
+    than the provider's recent p95, or as soon as the primary fails, and the
+    first successful answer wins. Raises ProviderUnavailable when the
+    provider failed (see is_provider_failure()) or gave no answer in time;
+    any other error of an attempt is raised unchanged and not counted.
+
+    Attempts run on a shared thread pool and can't be interrupted: one that
+    outlives the timeout finishes in the background, bounded only by the
+    client's own timeout.
+    """
+    # A spent deadline says nothing about the provider, so check it before the breaker
+    timeout = call_timeout(provider)
+    circuit = breaker(provider)
+    if not circuit.allow():
+        raise ProviderUnavailable(provider, "circuit open")
+
+    started = time.monotonic()
+    end = started + timeout
+    hedge_at = started + latency(provider).p95()
+    # Each attempt runs in its own copy of the context so tracing and usage keep working
+    pending = {_executor.submit(contextvars.copy_context().run, _timed, provider, primary): "primary"}
+    error = None
+    hedged = hedge is not None
+    while pending:
+        now = time.monotonic()
+        if now >= end:
+            break
+        wait_for = end - now
+        if hedge is not None:
+            wait_for = min(wait_for, max(0.0, hedge_at - now))
+        done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            attempt = pending.pop(future)
+            try:
+                value = future.result()
+            except Exception as e:
+                if not is_provider_failure(e):
+                    circuit.release()
+                    raise
+                error = e
+                continue
+            circuit.record_success()
+            if hedge is None and hedged:
+                metrics.EXTERNAL_HEDGES.labels(provider, "won" if attempt == "hedge" else "lost").inc()
+            return value
+        # Hedge once the primary is slower than usual or has already failed
+        if hedge is not None and (not pending or time.monotonic() >= hedge_at):
+            metrics.EXTERNAL_HEDGES.labels(provider, "fired").inc()
+            pending[_executor.submit(contextvars.copy_context().run, _timed, provider, hedge)] = "hedge"
+            hedge = None
+
+    circuit.record_failure()
+    if error is not None and not pending:
+        raise ProviderUnavailable(provider, f"{type(error).__name__}: {error}") from error
+    raise ProviderUnavailable(provider, f"no answer within {timeout:.1f}s")
+
+
+async def _atimed(provider, function):
+    started = time.monotonic()
+    value = await function()
+    latency(provider).record(time.monotonic() - started)
+    return value
+
+
+async def acall_provider(provider, primary, hedge=None):
+    """call_provider() for coroutine functions.
+
+    Attempts are tasks on the running event loop rather than threads, and
+    the losing attempt is cancelled once one of them answers.
+    """
+    timeout = call_timeout(provider)
+    circuit = breaker(provider)
+    if not circuit.allow():
+        raise ProviderUnavailable(provider, "circuit open")
+
+    started = time.monotonic()
+    end = started + timeout
+    hedge_at = started + latency(provider).p95()
+    # Tasks run in a copy of the current context, like the threads of call_provider()
+    pending = {asyncio.ensure_future(_atimed(provider, primary)): "primary"}
+    error = None
+    hedged = hedge is not None
+    try:
+        while pending:
+            now = time.monotonic()
+            if now >= end:
+                break
+            wait_for = end - now
+            if hedge is not None:
+                wait_for = min(wait_for, max(0.0, hedge_at - now))
+            done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                attempt = pending.pop(task)
+                try:
+                    value = task.result()
+                except Exception as e:
+                    if not is_provider_failure(e):
+                        circuit.release()
+                        raise
+                    error = e
+                    continue
+                circuit.record_success()
+                if hedge is None and hedged:
+                    metrics.EXTERNAL_HEDGES.labels(provider, "won" if attempt == "hedge" else "lost").inc()
+                return value
+            if hedge is not None and (not pending or time.monotonic() >= hedge_at):
+                metrics.EXTERNAL_HEDGES.labels(provider, "fired").inc()
+                pending[asyncio.ensure_future(_atimed(provider, hedge))] = "hedge"
+                hedge = None
+    finally:
+        for task in pending:
+            task.cancel()
+
+    circuit.record_failure()
+    if error is not None and not pending:
+        raise ProviderUnavailable(provider, f"{type(error).__name__}: {error}") from error
+    raise ProviderUnavailable(provider, f"no answer within {timeout:.1f}s")
+
+
+def guarded(llm, provider="gemini"):
+    """Bound every call of ``llm`` by the request deadline and the provider's circuit breaker.
+
+    LLM calls are not hedged: a duplicate generation costs as much as the first.
+    """
+    call, acall = llm.call, getattr(llm, "acall", None)
+
+    def guarded_call(*args, **kwargs):
+        return call_provider(provider, lambda: call(*args, **kwargs))
+
+    async def guarded_acall(*args, **kwargs):
+        return await acall_provider(provider, lambda: acall(*args, **kwargs))
+
+    object.__setattr__(llm, "call", guarded_call)
+    if acall is not None:
+        object.__setattr__(llm, "acall", guarded_acall)
+    return llm
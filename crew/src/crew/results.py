@@ -0,0 +1,45 @@
+import json
+import re
+
+# Crew output wraps the final answer in a ```json fenced block
+JSON_BLOCK = re.compile(r'```json\s*(\[.*?\])\s*```', re.DOTALL)
+
+
+def result_text(result):
+    """Get the raw text of a crew result"""
+    if hasattr(result, 'raw'):
+        return result.raw
+    return str(result)
+
+
+def parse_schools(text):
+    """Extract the list of school records from the crew output.
+
+    Tries the fenced JSON block first, then a bare JSON array, then a
+    markdown-style table. Returns an empty list if nothing can be parsed.
+    """
+    json_match = JSON_BLOCK.search(text)
+    if json_match:
+        return json.loads(json_match.group(1))
+
+    start, end = text.find('['), text.rfind(']')
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+            if isinstance(data, list) and all(isinstance(row, dict) for row in data):
+                return data
+        except json.JSONDecodeError:
+            pass
+
+    # Fallback: try to parse table-like data
+    table_data = []
+    for line in text.split('\n'):
+        if '|' in line and len(line.split('|')) >= 4:
+            row_data = [cell.strip() for cell in line.split('|')]
+            if row_data and row_data[0] and not row_data[0].startswith('-'):
+                table_data.append(row_data)
+
+    if len(table_data) > 1:
+        header = table_data[0]
+        return [dict(zip(header, row)) for row in table_data[1:]]
+    return []
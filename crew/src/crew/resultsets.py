@@ -0,0 +1,291 @@
+import base64
+import hashlib
+import json
+import math
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from src.crew.fees import FeeIndex
+from src.crew.postprocess import COLUMNS, MISSING, process_schools
+from src.crew.ranking import RankingFeatures, rating_value
+from src.crew.records import SchoolColumns
+from src.crew.semantic_cache import normalize_curriculum
+from src.crew.shm_cache import shared_cache
+
+RESULT_SET_STORE_SIZE = int(os.getenv("RESULT_SET_STORE_SIZE", "1024"))
+# Result sets are refined for a while after the search, then dropped
+RESULT_SET_TTL = float(os.getenv("RESULT_SET_TTL", str(6 * 3600)))
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+FACETS = ("curriculum", "city", "locality", "fee_band", "rating_band")
+# Upper bounds of the annual fee bands, in FEE_CURRENCY
+FEE_BANDS = ((50_000, "under 50k"), (100_000, "50k-1L"), (200_000, "1L-2L"), (500_000, "2L-5L"), (float("inf"), "over 5L"))
+RATING_BANDS = ((0.9, "4.5+"), (0.8, "4.0+"), (0.7, "3.5+"), (0.0, "under 3.5"))
+SORTS = ("relevance", "fee", "-fee", "rating", "-rating", "name", "-name")
+
+
+def _fee_band(fee):
+    if fee is None:
+        return "unknown"
+    return next(label for bound, label in FEE_BANDS if fee.min < bound)
+
+
+def _rating_band(text):
+    value = rating_value(text)
+    if math.isnan(value):
+        return "unknown"
+    return next(label for bound, label in RATING_BANDS if value >= bound)
+
+
+def _known(value):
+    return None if math.isnan(value) else value
+
+
+def _locality(school):
+    """Address part just before the city: "12 MG Road, Indiranagar, Bangalore" -> "Indiranagar" """
+    parts = [part.strip() for part in str(school.get("Location", "")).split(",") if part.strip()]
+    city = str(school.get("City", "")).strip().lower()
+    parts = [part for part in parts if part.lower() != city and not re.fullmatch(r"[\d\s-]+", part)]
+    return parts[-1] if len(parts) > 1 else MISSING
+
+
+def facet_values(school, fee):
+    """Values of every facet for one school; a school offering several curricula has several"""
+    curricula = [part.strip() for part in re.split(r"[,/&+]|\band\b", school.get("Curriculum", MISSING)) if part.strip()]
+    return {
+        "curriculum": curricula or [MISSING],
+        "city": [school.get("City", MISSING)],
+        "locality": [_locality(school)],
+        "fee_band": [_fee_band(fee)],
+        "rating_band": [_rating_band(school.get("Rating", MISSING))],
+    }
+
+
+def _key(value):
+    # Curriculum variants ("State Board", "state-board") are one facet value
+    return normalize_curriculum(value) if value != MISSING else MISSING
+
+
+class ResultSet:
+    """The schools of one search, with a bitmap per facet value for instant refinements.
+
+    Bitmaps are Python ints, bit i set when school i has the value; filtering
+    is AND across facets and OR within one, counting is int.bit_count().
+    """
+
+    def __init__(self, id, schools, inputs, age=0.0):
+        self.id = id
+        self.inputs = inputs
+        self.created = time.time() - age
+        self.schools = schools
+        self.fees = FeeIndex(self.schools)
+        features = RankingFeatures(self.schools, inputs["location"], inputs["grade"], inputs["curriculum"])
+        self.relevance = features.scores()
+        self.all = (1 << len(self.schools)) - 1
+        self.labels = {facet: {} for facet in FACETS}
+        self.bitmaps = {facet: {} for facet in FACETS}
+        for i, (school, fee) in enumerate(zip(self.schools, self.fees.ranges)):
+            for facet, values in facet_values(school, fee).items():
+                for value in values:
+                    key = _key(value)
+                    self.labels[facet].setdefault(key, value)
+                    self.bitmaps[facet][key] = self.bitmaps[facet].get(key, 0) | (1 << i)
+
+    @property
+    def age(self):
+        return time.time() - self.created
+
+    def _facet_mask(self, facet, values):
+        if not values:
+            return self.all
+        mask = 0
+        for value in values:
+            mask |= self.bitmaps[facet].get(_key(value), 0)
+        return mask
+
+    def _fee_mask(self, min_fee, max_fee, include_unknown):
+        if min_fee is None and max_fee is None:
+            return self.all
+        mask = 0
+        for i in self.fees.matching(min_fee, max_fee, include_unknown):
+            mask |= 1 << int(i)
+        return mask
+
+    def query(self, filters=None, min_fee=None, max_fee=None, include_unknown_fees=False):
+        """Matching positions and facet counts.
+
+        Each facet is counted with every filter applied except its own, so the
+        counts show how many schools a change of that facet would give.
+        """
+        filters = {facet: values for facet, values in (filters or {}).items() if values}
+        masks = {facet: self._facet_mask(facet, filters.get(facet)) for facet in FACETS}
+        fee_mask = self._fee_mask(min_fee, max_fee, include_unknown_fees)
+        matched = fee_mask
+        for mask in masks.values():
+            matched &= mask
+        counts = {}
+        for facet in FACETS:
+            others = fee_mask
+            for other, mask in masks.items():
+                if other != facet:
+                    others &= mask
+            counts[facet] = sorted(
+                ({"value": self.labels[facet][key], "count": (bitmap & others).bit_count(), "selected": key in {
+                    _key(value) for value in filters.get(facet, ())}} for key, bitmap in self.bitmaps[facet].items()),
+                key=lambda item: (-item["count"], str(item["value"]))
+            )
+        positions = [i for i in range(len(self.schools)) if matched >> i & 1]
+        return positions, counts
+
+    def sort(self, positions, sort="relevance"):
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort {sort!r}; use one of {', '.join(SORTS)}")
+        field, descending = sort.lstrip("-"), sort.startswith("-")
+        if field == "relevance":
+            # Best first, ties in the crew's order
+            return sorted(positions, key=lambda i: -self.relevance[i])
+        if field == "fee":
+            key = lambda i: self.fees.ranges[i].min if self.fees.ranges[i] else None
+        elif field == "rating":
+            key = lambda i: _known(rating_value(self.schools.get(i, "Rating")))
+        else:
+            key = lambda i: self.schools.get(i, "schoolName").lower()
+        # Schools without the value go last either way
+        known = sorted((i for i in positions if key(i) is not None), key=key, reverse=descending)
+        return known + [i for i in positions if key(i) is None]
+
+    def page(self, filters=None, sort="relevance", limit=DEFAULT_PAGE_SIZE, cursor=None, min_fee=None, max_fee=None,
+             include_unknown_fees=False):
+        """One page of the filtered, sorted schools, with facet counts and the cursor of the next page"""
+        view = {"filters": {facet: sorted(values) for facet, values in (filters or {}).items() if values},
+                "sort": sort, "min_fee": min_fee, "max_fee": max_fee, "unknown_fees": include_unknown_fees}
+        signature = hashlib.sha1(json.dumps(view, sort_keys=True).encode()).hexdigest()[:12]
+        offset = decode_cursor(cursor, signature) if cursor else 0
+        positions, counts = self.query(filters, min_fee, max_fee, include_unknown_fees)
+        ordered = self.sort(positions, sort)
+        limit = max(1, min(MAX_PAGE_SIZE, limit))
+        page = ordered[offset:offset + limit]
+        end = offset + len(page)
+        return {
+            "result_set_id": self.id,
+            "total": len(ordered),
+            "facets": counts,
+            "schools": [dict(self.schools[i], fee=self.fees.ranges[i].as_dict() if self.fees.ranges[i] else None)
+                        for i in page],
+            "next_cursor": encode_cursor(end, signature) if end < len(ordered) else None,
+        }
+
+
+def encode_cursor(offset, signature):
+    return base64.urlsafe_b64encode(f"{offset}:{signature}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, signature):
+    """Offset of a cursor; it must come from a page with the same filters and sort"""
+    try:
+        offset, cursor_signature = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":")
+        offset = int(offset)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if cursor_signature != signature or offset < 0:
+        raise ValueError("Cursor belongs to a different filter or sort; start again without it")
+    return offset
+
+
+def school_columns(text, inputs):
+    """The schools of a crew result, columnar, with the columns the search asked for.
+
+    Columnar because many result sets stay in memory for hours.
+    """
+    columns = inputs.get("output_columns")
+    return SchoolColumns.from_dicts(process_schools(text), columns.split(",") if columns else COLUMNS)
+
+
+def pack(schools, inputs):
+    """Binary form of a result set's schools and inputs, for the shared cache"""
+    header = json.dumps(inputs).encode()
+    return zlib.compress(struct.pack("<I", len(header)) + header + schools.to_bytes())
+
+
+def unpack(data):
+    data = zlib.decompress(data)
+    (length,) = struct.unpack_from("<I", data)
+    return SchoolColumns.from_bytes(memoryview(data)[4 + length:]), json.loads(data[4:4 + length])
+
+
+class ResultSetStore:
+    """Thread-safe LRU of result sets by ID; sets are built on first use.
+
+    Schools are parsed once, when the result is added, and shared with the
+    other workers in their binary columnar form.
+    """
+
+    def __init__(self, size=RESULT_SET_STORE_SIZE, ttl=RESULT_SET_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, text, inputs, age=0.0):
+        """Register a search result; returns its ID. The same result always gets the same ID."""
+        id = hashlib.sha1(f"{json.dumps(inputs, sort_keys=True)}\n{text}".encode()).hexdigest()[:16]
+        with self.lock:
+            known = id in self.entries
+            if known:
+                self.entries.move_to_end(id)
+        if known:
+            return id
+        schools = school_columns(text, inputs)
+        with self.lock:
+            self.entries.setdefault(id, [schools, inputs, time.time() - age, None])
+            self.entries.move_to_end(id)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        if shared_cache is not None:
+            # Later pages may be requested from another gunicorn worker
+            shared_cache.put(f"resultset:{id}", pack(schools, inputs), time.time() - age)
+        return id
+
+    def get(self, id):
+        """The ResultSet, or None when unknown or expired"""
+        with self.lock:
+            entry = self.entries.get(id)
+            if entry is not None and time.time() - entry[2] > self.ttl:
+                del self.entries[id]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(id)
+        if entry is None:
+            entry = self._shared(id)
+            if entry is None:
+                return None
+        schools, inputs, created, result_set = entry
+        if result_set is None:
+            # Built outside the lock; two racing builds produce the same set
+            result_set = ResultSet(id, schools, inputs, time.time() - created)
+            with self.lock:
+                entry[3] = result_set
+        return result_set
+
+    def _shared(self, id):
+        """Entry registered by another worker, copied into this one"""
+        found = shared_cache.get(f"resultset:{id}", self.ttl) if shared_cache is not None else None
+        if found is None:
+            return None
+        stored, created = found
+        entry = [*unpack(stored), created, None]
+        with self.lock:
+            entry = self.entries.setdefault(id, entry)
+            self.entries.move_to_end(id)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return entry
+
+
+result_sets = ResultSetStore()
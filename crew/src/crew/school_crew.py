@@ -3,12 +3,238 @@ from crewai.project import CrewBase, agent, crew, task
 from dotenv import load_dotenv
 from src.crew.tools.websearch import tool as web_search_tool
 from src.crew.tools.location import tool as location_tool
+from src.crew.tools import multisearch
+from src.crew.tracing import span, trace_run
+from src.crew.ratelimit import rate_limited
+from src.crew.resilience import ProviderUnavailable, deadline, guarded, is_available
+from src.crew.cache import RESULT_CACHE_MAX_AGE, cache_key, result_cache
+from src.crew.results import result_text
+from src.crew.snapshots import snapshot_store
+from src.crew.semantic_cache import SEMANTIC_CACHE_AUDIT_RATE, audit_hit, semantic_cache
+from src.crew.usage import RunUsage, estimate_cost, track_usage, reset_usage
+import logging
+import math
+import random
 import os
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 print(os.getenv("GEMINI_API_KEY"))
-# Initialize Gemini model
-llm = LLM(model="gemini/gemini-2.0-flash")
+def make_llm():
+    """Gemini model (model and endpoint can be overridden, e.g. for local benchmarks).
+
+    Every agent gets its own instance: crewai keeps token counters on the LLM
+    object, so a shared one would mix usage across agents and requests. The
+    request rate is shared through the process-wide Gemini rate limiter, and
+    each call is bounded by the request deadline and the Gemini circuit breaker.
+    """
+    return rate_limited(guarded(LLM(
+        model=os.getenv("LLM_MODEL", "gemini/gemini-2.0-flash"),
+        base_url=os.getenv("LLM_BASE_URL") or None
+    )))
+
+# Defaults used by the UI and the API when no advanced options are given
+DEFAULT_MAX_RESULTS = 20
+MIN_RESULTS = 5
+MAX_RESULTS = 50
+
+# Values offered by the /curricula and /grades endpoints
+SUPPORTED_CURRICULA = ["CBSE", "ICSE", "IB", "State Board", "IGCSE", "Cambridge", "Montessori"]
+SUPPORTED_GRADES = [
+    "Nursery", "Pre-KG", "LKG", "UKG",
+    "1st Grade", "2nd Grade", "3rd Grade", "4th Grade", "5th Grade", "6th Grade",
+    "7th Grade", "8th Grade", "9th Grade", "10th Grade", "11th Grade", "12th Grade",
+]
+
+
+def search_options(max_results=DEFAULT_MAX_RESULTS, include_fees=True, include_ratings=True):
+    """Derive the search budget and output schema from the advanced options"""
+    max_results = max(MIN_RESULTS, min(MAX_RESULTS, int(max_results)))
+
+    # Roughly one finder search per 15 schools, and one extra analyzer search
+    # per optional detail (fees, ratings) per 25 schools
+    finder_searches = max(1, math.ceil(max_results / 15))
+    analyzer_searches = (int(include_fees) + int(include_ratings)) * math.ceil(max_results / 25)
+
+    columns = ["schoolName", "Grade", "Curriculum", "Location", "City"]
+    focus = ["Detailed location info", "Curriculum confirmation"]
+    if include_fees:
+        columns.append("Fees")
+        focus.append("Annual fees (use N/A when not published)")
+    if include_ratings:
+        columns.append("Rating")
+        focus.append("Rating out of 5 from parent reviews (use N/A when not available)")
+    columns.append("Remarks")
+
+    return {
+        "max_results": max_results,
+        "include_fees": include_fees,
+        "include_ratings": include_ratings,
+        "finder_searches": finder_searches,
+        "analyzer_searches": analyzer_searches,
+        "output_columns": ",".join(columns),
+        "analysis_focus": "\n".join(f"- {item}" for item in focus),
+        "remarks_length": "1 line" if max_results <= 10 else "2-3 lines",
+    }
+
+
+def search_inputs(location, grade, curriculum, options):
+    """Kickoff inputs for a search with the given search options"""
+    return {
+        "location": location,
+        "grade": grade,
+        "curriculum": curriculum,
+        "max_results": options["max_results"],
+        "finder_searches": options["finder_searches"],
+        "analyzer_searches": options["analyzer_searches"],
+        "output_columns": options["output_columns"],
+        "analysis_focus": options["analysis_focus"],
+        "remarks_length": options["remarks_length"],
+    }
+
+
+# Cheaper behaviours, from richest to cheapest, tried in order when a request carries a budget
+DOWNGRADE_LEVELS = ("full", "fewer_searches", "short_analysis", "catalog_only")
+
+
+def downgraded_options(options, level):
+    """Search options for one of the DOWNGRADE_LEVELS"""
+    if level == "fewer_searches":
+        return dict(options, finder_searches=1, analyzer_searches=min(1, options["analyzer_searches"]))
+    if level == "short_analysis":
+        # Ratings need extra research, fees are usually on the schools' own pages
+        options = search_options(min(options["max_results"], 10), options["include_fees"], False)
+        return dict(options, finder_searches=1, analyzer_searches=0)
+    if level == "catalog_only":
+        # No web searches at all: the finder lists schools it already knows
+        options = search_options(min(options["max_results"], 10), False, False)
+        return dict(options, finder_searches=0, analyzer_searches=0)
+    return options
+
+
+def budget_options(options, budget_usd=None):
+    """Richest downgrade level whose estimated cost fits the budget.
+
+    Returns (options, level); the cheapest level is used when nothing fits.
+    """
+    if budget_usd is None:
+        return options, "full"
+    for level in DOWNGRADE_LEVELS:
+        candidate = downgraded_options(options, level)
+        if estimate_cost(candidate) <= budget_usd:
+            return candidate, level
+    return candidate, level
+
+
+def _unavailable_provider(error):
+    """The ProviderUnavailable behind a crew failure, if any"""
+    while error is not None:
+        if isinstance(error, ProviderUnavailable):
+            return error
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def degraded_result(crew_instance, inputs, error, usage):
+    """Best answer left when a run failed: a cached result or precomputed snapshot, else the catalog-only crew.
+
+    Re-raises the provider error when neither is available.
+    """
+    unavailable = _unavailable_provider(error)
+    reason = f"{unavailable.provider}_unavailable" if unavailable else "crew_failed"
+    cached = result_cache.get(cache_key(inputs), RESULT_CACHE_MAX_AGE)
+    if cached is not None:
+        logger.warning("Search failed (%s), serving a result cached %.0fs ago", error, cached.age)
+        usage.note_degraded(reason)
+        usage.note_degraded("cached_result")
+        return cached.text
+    snapshot = snapshot_store.lookup_place(inputs["location"], inputs["grade"], inputs["curriculum"]) if snapshot_store else None
+    if snapshot is not None:
+        logger.warning("Search failed (%s), serving precomputed snapshot v%d", error, snapshot.version)
+        usage.note_degraded(reason)
+        usage.note_degraded("precomputed_result")
+        return snapshot.text
+    if crew_instance.downgrade != "catalog_only" and is_available("gemini") and (unavailable is None or unavailable.provider != "gemini"):
+        logger.warning("Search failed (%s), retrying without web searches", error)
+        usage.note_degraded(reason)
+        usage.note_downgrade("catalog_only")
+        catalog = schoolcrew(crew_instance.options["max_results"], downgrade="catalog_only")
+        return catalog.crew().kickoff(inputs=catalog.inputs(inputs["location"], inputs["grade"], inputs["curriculum"]))
+    raise unavailable or error
+
+
+def run_search(crew_instance, inputs, use_cache=True):
+    """Run the crew once, tracing tasks, agent iterations, tool and LLM calls.
+
+    A differently-worded search already answered is served from the semantic
+    cache when it is enabled and ``use_cache`` is set. All external calls
+    share the request deadline, and if the crew fails because a provider is
+    down, the answer comes from degraded_result() instead.
+
+    Returns (result, trace, usage); trace.timings() has the per-run breakdown
+    and usage.as_dict() the tokens, tool calls, cost, cache source and any
+    degradation.
+    """
+    with trace_run("search", **{f"search.{key}": inputs.get(key) for key in ("location", "grade", "curriculum", "max_results")}) as trace:
+        usage = RunUsage(trace, crew_instance.budget_usd, crew_instance.downgrade)
+        hit = None
+        if semantic_cache is not None and use_cache:
+            with span("cache.semantic"):
+                hit = semantic_cache.lookup(inputs)
+        audit = hit is not None and random.random() < SEMANTIC_CACHE_AUDIT_RATE
+        if hit is not None and not audit:
+            usage.cache = {"source": "semantic", "similarity": round(hit.similarity, 3),
+                           "matched_location": hit.matched, "age_s": round(hit.age)}
+            trace.root.attributes.update({"cache.source": "semantic", "cache.similarity": hit.similarity})
+            result = hit.text
+        else:
+            token = track_usage(usage)
+            try:
+                with deadline():
+                    try:
+                        result = crew_instance.crew().kickoff(inputs=inputs)
+                    except Exception as e:
+                        result = degraded_result(crew_instance, inputs, e, usage)
+            finally:
+                reset_usage(token)
+            # Older crewai versions don't report usage per LLM call, only per run
+            token_usage = getattr(result, "token_usage", None)
+            if token_usage is not None:
+                trace.root.attributes["llm.prompt_tokens"] = getattr(token_usage, "prompt_tokens", 0)
+                trace.root.attributes["llm.completion_tokens"] = getattr(token_usage, "completion_tokens", 0)
+    if audit:
+        audit_hit(hit, result_text(result))
+    if not usage.degraded and usage.cache is None:
+        result_cache.put(cache_key(inputs), result_text(result))
+        if semantic_cache is not None:
+            semantic_cache.put(inputs, result_text(result))
+    logger.info("Search usage for %s: %s", inputs.get("location"), usage.as_dict())
+    return result, trace, usage
+
+
+class SearchPlan:
+    """Options and kickoff inputs of one search, without building the crew.
+
+    Creating a schoolcrew loads its configs and agents, which takes a good
+    fraction of a second; cached answers only need the inputs.
+    """
+
+    def __init__(self, location, grade, curriculum, max_results=DEFAULT_MAX_RESULTS, include_fees=True,
+                 include_ratings=True, budget_usd=None):
+        self.request = (max_results, include_fees, include_ratings)
+        self.budget_usd = budget_usd
+        self.options, self.downgrade = budget_options(search_options(max_results, include_fees, include_ratings), budget_usd)
+        self.inputs = search_inputs(location, grade, curriculum, self.options)
+
+    def crew(self):
+        return schoolcrew(*self.request, budget_usd=self.budget_usd)
+
+    def run(self, use_cache=True):
+        """Build the crew and run the search; see run_search()"""
+        return run_search(self.crew(), self.inputs, use_cache)
+
+
 @CrewBase
 class schoolcrew():
     """schoolcrew crew"""
@@ -16,19 +242,45 @@ class schoolcrew():
     agents_config = 'config/agents.yaml'
     tasks_config = 'config/tasks.yaml'
 
+    def __init__(self, max_results=DEFAULT_MAX_RESULTS, include_fees=True, include_ratings=True, budget_usd=None,
+                 downgrade=None):
+        self.budget_usd = budget_usd
+        options = search_options(max_results, include_fees, include_ratings)
+        if downgrade:
+            self.options, self.downgrade = downgraded_options(options, downgrade), downgrade
+        else:
+            self.options, self.downgrade = budget_options(options, budget_usd)
+
+    def inputs(self, location, grade, curriculum):
+        """Build kickoff inputs for a search, including the budgeted options"""
+        return search_inputs(location, grade, curriculum, self.options)
+
+    def finder_tools(self):
+        searches = self.options["finder_searches"]
+        if not searches:
+            return [location_tool]
+        # Several searches fit in one multi_search turn instead of one turn each; the tool alone
+        # holds the plan's searches, so single searches can't add to them
+        return [multisearch.for_plan(searches), location_tool] if searches > 1 else [web_search_tool, location_tool]
+
     @agent
     def school_finder(self) -> Agent:
         return Agent(
             config=self.agents_config['school_finder'],
-            llm=llm,
-            tools=[web_search_tool, location_tool]
+            llm=make_llm(),
+            tools=self.finder_tools(),
+            # Each search costs one iteration at most, plus location lookup and final answer
+            max_iter=self.options["finder_searches"] + 3
         )
     @agent
     def school_analyzer(self) -> Agent:
+        # Nothing to research beyond the finder's output: skip the tools entirely
+        tools = [web_search_tool] if self.options["analyzer_searches"] else []
         return Agent(
             config=self.agents_config['school_analyzer'],
-            llm=llm,
-            tools=[web_search_tool, location_tool]
+            llm=make_llm(),
+            tools=tools,
+            max_iter=self.options["analyzer_searches"] + 2
         )
     @task
     def find_schools_task(self) -> Task:
@@ -48,5 +300,5 @@ class schoolcrew():
             agents=self.agents,
             tasks=self.tasks,
             process=Process.sequential,
-            verbose= True,
-        )
\ No newline at end of file
+            verbose=os.getenv("CREW_VERBOSE", "true").lower() == "true",
+        )
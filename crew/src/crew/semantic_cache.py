@@ -0,0 +1,236 @@
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from src.crew import metrics
+from src.crew.results import parse_schools
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+# Small CPU model; without sentence-transformers a hashed n-gram embedding is used
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Minimum cosine similarity of the locations for a hit; the n-gram embedding needs a lower bar
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv(
+    "SEMANTIC_CACHE_THRESHOLD", "0.88" if SENTENCE_TRANSFORMERS_AVAILABLE else "0.7"
+))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))
+SEMANTIC_CACHE_MAX_AGE = float(os.getenv("SEMANTIC_CACHE_MAX_AGE", str(24 * 3600)))
+# Fraction of hits that also run the crew to measure how close the cached answer was
+SEMANTIC_CACHE_AUDIT_RATE = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", "0"))
+
+HASH_DIMENSIONS = 512
+# Words that say nothing about the place itself
+FILLER_WORDS = {
+    "school", "schools", "near", "nearby", "in", "at", "around", "the", "a", "for", "best", "top", "good",
+    "grade", "class", "std", "standard", "th", "st", "nd", "rd", "me", "my", "with", "and", "of", "area",
+}
+# "grade 5", "5th class", "std V": the grade, which is matched exactly, not a place; bare numbers stay
+GRADE_PHRASE = re.compile(
+    r"\b(?:grade|class|std|standard)\s*(?:\d+|[ivx]+)\b|\b\d+\s*(?:st|nd|rd|th)?\s*(?:grade|class|std|standard)\b",
+    re.IGNORECASE
+)
+
+
+def normalize_grade(grade):
+    """'5th Grade', 'grade 5' and 'Class V' all become '5'"""
+    text = str(grade).lower()
+    number = re.search(r"\d+", text)
+    if number:
+        return str(int(number.group()))
+    roman = re.search(r"\b([ivx]+)\b", text)
+    if roman:
+        values = {"i": 1, "v": 5, "x": 10}
+        digits = [values[c] for c in roman.group(1)]
+        return str(sum(-d if d < n else d for d, n in zip(digits, digits[1:] + [0])))
+    return re.sub(r"[^a-z]", "", text)
+
+
+def normalize_curriculum(curriculum):
+    return re.sub(r"[^a-z0-9]", "", str(curriculum).lower()).removesuffix("board")
+
+
+def normalize_location(location, grade="", curriculum=""):
+    """Place words only: lowercase, no punctuation, no filler, grade phrases or curriculum words.
+
+    Numbers are only dropped as part of a grade phrase: in "Sector 5, Noida"
+    the 5 names the place, whatever the grade.
+    """
+    drop = FILLER_WORDS | {normalize_curriculum(curriculum)}
+    words = re.findall(r"[a-z0-9]+", GRADE_PHRASE.sub(" ", str(location).lower()))
+    words = [re.sub(r"^(\d+)(st|nd|rd|th)$", r"\1", word) for word in words]
+    return " ".join(word for word in words if word not in drop)
+
+
+def _numbers(location):
+    # "Sector 5" and "Sector 6" embed almost identically but are different places
+    return sorted(re.findall(r"\d+", location))
+
+
+def partition_key(inputs):
+    """Fields that must match exactly for a cached answer to be reusable"""
+    return (
+        normalize_grade(inputs["grade"]),
+        normalize_curriculum(inputs["curriculum"]),
+        inputs.get("max_results"),
+        inputs.get("output_columns"),
+    )
+
+
+class HashingEmbedder:
+    """Dependency-free embedding: hashed word and character 3-gram counts, L2-normalized"""
+
+    def __init__(self, dimensions=HASH_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def encode(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in text.split():
+            vector[zlib.crc32(word.encode()) % self.dimensions] += 2.0
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                vector[zlib.crc32(padded[i:i + 3].encode()) % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SentenceEmbedder:
+    def __init__(self, model_name=SEMANTIC_CACHE_MODEL):
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, text):
+        return self.model.encode(text, normalize_embeddings=True).astype(np.float32)
+
+
+class FlatIndex:
+    """Brute-force cosine search over normalized vectors, one per cached answer"""
+
+    def __init__(self, dimensions):
+        self.vectors = np.empty((0, dimensions), dtype=np.float32)
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, vector, entry):
+        self.vectors = np.vstack([self.vectors, vector[None, :]])
+        self.entries.append(entry)
+
+    def drop_oldest(self):
+        self.vectors = self.vectors[1:]
+        self.entries.pop(0)
+
+    def nearest(self, vector):
+        if not self.entries:
+            return 0.0, None
+        scores = self.vectors @ vector
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.entries[best]
+
+
+class SemanticEntry:
+    __slots__ = ("location", "text", "created")
+
+    def __init__(self, location, text):
+        self.location = location
+        self.text = text
+        self.created = time.time()
+
+
+class SemanticHit:
+    __slots__ = ("text", "similarity", "matched", "age")
+
+    def __init__(self, text, similarity, matched, age):
+        self.text = text
+        self.similarity = similarity
+        self.matched = matched
+        self.age = age
+
+
+class SemanticCache:
+    """Serves a cached answer for a differently-worded search of the same place.
+
+    Grade, curriculum and output options must match exactly; only the
+    location is compared by embedding similarity, within that partition.
+    """
+
+    def __init__(self, embedder=None, threshold=SEMANTIC_CACHE_THRESHOLD, size=SEMANTIC_CACHE_SIZE,
+                 max_age=SEMANTIC_CACHE_MAX_AGE):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.size = size
+        self.max_age = max_age
+        self.partitions = {}
+        self.count = 0
+        self.lock = threading.Lock()
+        self.embedder_lock = threading.Lock()
+
+    def _embed(self, inputs):
+        if self.embedder is None:
+            # Concurrent first requests load the model once
+            with self.embedder_lock:
+                if self.embedder is None:
+                    self.embedder = SentenceEmbedder() if SENTENCE_TRANSFORMERS_AVAILABLE else HashingEmbedder()
+        location = normalize_location(inputs["location"], inputs["grade"], inputs["curriculum"])
+        return location, self.embedder.encode(location)
+
+    def lookup(self, inputs):
+        location, vector = self._embed(inputs)
+        with self.lock:
+            index = self.partitions.get(partition_key(inputs))
+            similarity, entry = index.nearest(vector) if index else (0.0, None)
+        metrics.SEMANTIC_SIMILARITY.observe(similarity)
+        hit = (entry is not None and similarity >= self.threshold and _numbers(location) == _numbers(entry.location)
+               and time.time() - entry.created <= self.max_age)
+        metrics.CACHE_REQUESTS.labels("semantic", "hit" if hit else "miss").inc()
+        if entry is not None:
+            logger.info("Semantic cache %s: %r ~ %r (similarity %.3f, threshold %.2f)",
+                        "hit" if hit else "miss", location, entry.location, similarity, self.threshold)
+        if not hit:
+            return None
+        return SemanticHit(entry.text, similarity, entry.location, time.time() - entry.created)
+
+    def put(self, inputs, text):
+        location, vector = self._embed(inputs)
+        with self.lock:
+            index = self.partitions.setdefault(partition_key(inputs), FlatIndex(len(vector)))
+            index.add(vector, SemanticEntry(location, text))
+            self.count += 1
+            while self.count > self.size:
+                oldest = min((i for i in self.partitions.values() if len(i)), key=lambda i: i.entries[0].created)
+                oldest.drop_oldest()
+                self.count -= 1
+
+
+def _school_names(text):
+    names = set()
+    for school in parse_schools(text):
+        if isinstance(school, dict):
+            name = school.get("schoolName") or school.get("name") or ""
+            names.add(" ".join(str(name).lower().split()))
+    names.discard("")
+    return names
+
+
+def audit_hit(hit, fresh_text):
+    """Log and record how many schools a cached answer shares with a fresh run (Jaccard overlap)"""
+    cached, fresh = _school_names(hit.text), _school_names(fresh_text)
+    overlap = len(cached & fresh) / len(cached | fresh) if cached | fresh else 1.0
+    metrics.SEMANTIC_HIT_OVERLAP.observe(overlap)
+    logger.info("Semantic cache audit: %r served for a similarity of %.3f, %.0f%% of schools match a fresh run",
+                hit.matched, hit.similarity, overlap * 100)
+    return overlap
+
+
+semantic_cache = SemanticCache() if SEMANTIC_CACHE_ENABLED else None
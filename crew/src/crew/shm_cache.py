@@ -0,0 +1,212 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from src.crew import metrics
+
+# Try to import the POSIX file locking the writers need
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE", "true").lower() == "true"
+# tmpfs when available, so the table lives in memory and never touches disk
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "school-crew-cache"
+))
+# Docker gives containers a 64 MB /dev/shm by default; leave room for others
+SHARED_CACHE_MB = int(os.getenv("SHARED_CACHE_MB", "32"))
+# Every entry takes one slot; compressed results larger than a slot are not shared
+SHARED_CACHE_SLOT_KB = int(os.getenv("SHARED_CACHE_SLOT_KB", "32"))
+# Slots a key can live in (set-associative table); a full set evicts with CLOCK
+WAYS = 8
+# Reads retry this often when a writer keeps changing the slot, then count as a miss
+READ_RETRIES = 16
+
+MAGIC = b"SCRWSHM1"
+FILE_HEADER = struct.Struct("<8sII")  # magic, slot size, slot count
+FILE_HEADER_SIZE = 64
+# seq, ref bit, key hash, created, key length, payload length
+SLOT_HEADER = struct.Struct("<IB3xQdH2xI")
+SEQ = struct.Struct("<I")
+REF_OFFSET = 4
+
+
+def key_hash(key):
+    # Zero marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") | 1
+
+
+class SharedCache:
+    """Fixed-size hash table of byte strings in a memory-mapped file, shared by all worker processes.
+
+    Each slot has a sequence number (seqlock): writers make it odd while
+    they write and even again after, readers copy the slot without any lock
+    and retry when the number changed underneath them. Writers lock only the
+    set they write to, with a byte-range lock on the file. A full set evicts
+    the first slot not read since the clock hand last passed it.
+    """
+
+    def __init__(self, path=SHARED_CACHE_PATH, size_mb=SHARED_CACHE_MB, slot_kb=SHARED_CACHE_SLOT_KB):
+        self.slot_size = slot_kb * 1024
+        self.sets = max(1, (size_mb * 1024 * 1024) // (self.slot_size * WAYS))
+        self.slots = self.sets * WAYS
+        self.size = FILE_HEADER_SIZE + self.slots * self.slot_size
+        # fcntl locks are per process; threads of one worker also need to exclude each other
+        self.thread_lock = threading.Lock()
+        self.fd = self._open(path)
+        self.map = mmap.mmap(self.fd, self.size)
+
+    def _open(self, path):
+        """Descriptor of a table file with this layout, creating it if needed"""
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                ready = self._prepare(fd, path)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            except BaseException:
+                os.close(fd)
+                raise
+            if ready:
+                return fd
+            os.close(fd)
+
+    def _prepare(self, fd, path):
+        """Whether the locked file is a table with this layout; new files are initialized"""
+        if os.fstat(fd).st_ino != os.stat(path).st_ino:
+            # Replaced by another worker while we waited for the lock
+            return False
+        header = os.pread(fd, FILE_HEADER.size, 0)
+        if len(header) == FILE_HEADER.size and FILE_HEADER.unpack(header) == (MAGIC, self.slot_size, self.slots):
+            return True
+        if os.fstat(fd).st_size == 0:
+            os.ftruncate(fd, self.size)
+            os.pwrite(fd, FILE_HEADER.pack(MAGIC, self.slot_size, self.slots), 0)
+            return True
+        # Laid out by another configuration and maybe still mapped by old workers:
+        # shrinking it would crash them, so start a new file under the same name
+        os.unlink(path)
+        return False
+
+    def _offset(self, slot):
+        return FILE_HEADER_SIZE + slot * self.slot_size
+
+    @contextmanager
+    def _locked(self, set_index):
+        with self.thread_lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, set_index)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, set_index)
+
+    def _read(self, offset, hashed, key):
+        """Payload and creation time of the slot if it holds ``key``, read consistently"""
+        for _ in range(READ_RETRIES):
+            before = SEQ.unpack_from(self.map, offset)[0]
+            if before & 1:
+                time.sleep(0)
+                continue
+            _, _, slot_hash, created, key_length, payload_length = SLOT_HEADER.unpack_from(self.map, offset)
+            if slot_hash != hashed:
+                data = None
+            else:
+                start = offset + SLOT_HEADER.size
+                data = self.map[start:start + key_length + payload_length]
+            if SEQ.unpack_from(self.map, offset)[0] == before:
+                if data is None or data[:key_length] != key:
+                    return None
+                return data[key_length:], created
+        metrics.CACHE_REQUESTS.labels("shared", "contended").inc()
+        return None
+
+    def get(self, key, max_age=None):
+        """Bytes stored under ``key`` with their creation time, or None"""
+        key = key.encode()
+        hashed = key_hash(key)
+        set_index = hashed % self.sets
+        for way in range(WAYS):
+            offset = self._offset(set_index * WAYS + way)
+            found = self._read(offset, hashed, key)
+            if found is None:
+                continue
+            payload, created = found
+            if max_age is not None and time.time() - created > max_age:
+                break
+            # Referenced since the clock hand last passed: spared at the next eviction
+            self.map[offset + REF_OFFSET] = 1
+            metrics.CACHE_REQUESTS.labels("shared", "hit").inc()
+            return payload, created
+        metrics.CACHE_REQUESTS.labels("shared", "miss").inc()
+        return None
+
+    def _victim(self, set_index, hashed, key):
+        """Slot for a write: the key's own slot, else an empty one, else the CLOCK choice"""
+        first = set_index * WAYS
+        for way in range(WAYS):
+            offset = self._offset(first + way)
+            _, _, slot_hash, _, key_length, _ = SLOT_HEADER.unpack_from(self.map, offset)
+            start = offset + SLOT_HEADER.size
+            if slot_hash == 0 or (slot_hash == hashed and self.map[start:start + key_length] == key):
+                return offset
+        # Second chance: clear reference bits until an unreferenced slot comes up
+        for way in range(2 * WAYS):
+            offset = self._offset(first + way % WAYS)
+            if not self.map[offset + REF_OFFSET]:
+                metrics.CACHE_EVICTIONS.labels("shared", "clock").inc()
+                return offset
+            self.map[offset + REF_OFFSET] = 0
+
+    def put(self, key, payload, created=None):
+        """Store ``payload`` under ``key``; returns False when it does not fit in a slot"""
+        key = key.encode()
+        if SLOT_HEADER.size + len(key) + len(payload) > self.slot_size:
+            metrics.CACHE_EVICTIONS.labels("shared", "too_large").inc()
+            return False
+        hashed = key_hash(key)
+        set_index = hashed % self.sets
+        with self._locked(set_index):
+            offset = self._victim(set_index, hashed, key)
+            seq = (SEQ.unpack_from(self.map, offset)[0] + 1) & 0xFFFFFFFF
+            SEQ.pack_into(self.map, offset, seq)
+            SLOT_HEADER.pack_into(self.map, offset, seq, 0, hashed, created or time.time(), len(key), len(payload))
+            start = offset + SLOT_HEADER.size
+            self.map[start:start + len(key) + len(payload)] = key + payload
+            SEQ.pack_into(self.map, offset, (seq + 1) & 0xFFFFFFFF)
+        return True
+
+    def get_text(self, key, max_age=None):
+        """Text stored with put_text(), with its creation time, or None"""
+        found = self.get(key, max_age)
+        if found is None:
+            return None
+        return zlib.decompress(found[0]).decode(), found[1]
+
+    def put_text(self, key, text, created=None):
+        return self.put(key, zlib.compress(text.encode()), created)
+
+
+def open_shared_cache():
+    """The shared cache of this host, or None when disabled or unavailable"""
+    if not SHARED_CACHE_ENABLED or not FCNTL_AVAILABLE:
+        return None
+    try:
+        return SharedCache()
+    except OSError as e:
+        logger.warning("Shared result cache unavailable at %s: %s", SHARED_CACHE_PATH, e)
+        return None
+
+
+shared_cache = open_shared_cache()
@@ -0,0 +1,209 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from src.crew import metrics
+from src.crew.cache import cache_key, normalize
+
+logger = logging.getLogger(__name__)
+
+# Precomputed results, shared by all workers and the precompute job
+SNAPSHOT_DB = os.getenv("SNAPSHOT_DB", "precomputed.db")
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS", "true").lower() == "true"
+# Older snapshots are not served, the job should have refreshed them long before
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE_HOURS", "168")) * 3600
+# Versions kept per search, so a bad refresh can be rolled back
+SNAPSHOT_KEEP_VERSIONS = int(os.getenv("SNAPSHOT_KEEP_VERSIONS", "3"))
+# Request counts are summed in memory and written at most this often, in one transaction
+SNAPSHOT_HITS_FLUSH_SECONDS = float(os.getenv("SNAPSHOT_HITS_FLUSH_SECONDS", "10"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    key TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    location_key TEXT NOT NULL,
+    grade_key TEXT NOT NULL,
+    curriculum_key TEXT NOT NULL,
+    text TEXT NOT NULL,
+    usage TEXT,
+    created REAL NOT NULL,
+    PRIMARY KEY (key, version)
+);
+CREATE INDEX IF NOT EXISTS snapshots_place ON snapshots (location_key, grade_key, curriculum_key);
+CREATE TABLE IF NOT EXISTS requests (
+    key TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    first_hit REAL NOT NULL,
+    last_hit REAL NOT NULL
+);
+"""
+
+
+class Snapshot:
+    __slots__ = ("key", "version", "text", "created")
+
+    def __init__(self, key, version, text, created):
+        self.key = key
+        self.version = version
+        self.text = text
+        self.created = created
+
+    @property
+    def age(self):
+        return time.time() - self.created
+
+    def cache_info(self):
+        return {"source": "precomputed", "version": self.version, "age_s": round(self.age)}
+
+
+def snapshot_key(inputs):
+    return json.dumps(cache_key(inputs))
+
+
+class SnapshotStore:
+    """Versioned precomputed search results in SQLite, plus request counts per search"""
+
+    def __init__(self, path=SNAPSHOT_DB, flush_seconds=SNAPSHOT_HITS_FLUSH_SECONDS):
+        self.path = path
+        self.local = threading.local()
+        self.flush_seconds = flush_seconds
+        # key -> [params, hits, first_hit, last_hit] not yet written
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+        with closing(sqlite3.connect(path)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        # One connection per thread; WAL lets workers read while the job writes
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        return conn
+
+    def lookup(self, inputs, options=None, max_age=SNAPSHOT_MAX_AGE):
+        """Latest snapshot for this exact search; also counts the request for popularity"""
+        key = snapshot_key(inputs)
+        if options is not None:
+            self.record_request(key, inputs, options)
+        row = self._conn().execute(
+            "SELECT version, text, created FROM snapshots WHERE key = ? ORDER BY version DESC LIMIT 1", (key,)
+        ).fetchone()
+        snapshot = Snapshot(key, *row) if row and time.time() - row[2] <= max_age else None
+        metrics.CACHE_REQUESTS.labels("snapshot", "hit" if snapshot else "miss").inc()
+        return snapshot
+
+    def lookup_place(self, location, grade, curriculum, max_age=SNAPSHOT_MAX_AGE):
+        """Latest snapshot for the same place, grade and curriculum, whatever its options"""
+        row = self._conn().execute(
+            "SELECT key, version, text, created FROM snapshots"
+            " WHERE location_key = ? AND grade_key = ? AND curriculum_key = ? AND created >= ?"
+            " ORDER BY created DESC LIMIT 1",
+            (normalize(location), normalize(grade), normalize(curriculum), time.time() - max_age)
+        ).fetchone()
+        return Snapshot(*row) if row else None
+
+    def record_request(self, key, inputs, options, flush=True):
+        """Count a request; counts reach the database with the next flush().
+
+        With ``flush=False`` the caller flushes, e.g. off the event loop, when
+        this returns True.
+        """
+        now = time.time()
+        with self.pending_lock:
+            entry = self.pending.get(key)
+            if entry is None:
+                params = json.dumps({
+                    "location": inputs["location"], "grade": inputs["grade"], "curriculum": inputs["curriculum"],
+                    "max_results": options["max_results"], "include_fees": options["include_fees"],
+                    "include_ratings": options["include_ratings"],
+                })
+                self.pending[key] = [params, 1, now, now]
+            else:
+                entry[1] += 1
+                entry[3] = now
+            due = time.monotonic() - self.flushed_at >= self.flush_seconds
+        if due and flush:
+            self.flush()
+        return due
+
+    def flush(self):
+        """Write the buffered request counts; every worker takes the write lock once per interval, not per request"""
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+            self.flushed_at = time.monotonic()
+        if not pending:
+            return
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO requests (key, params, hits, first_hit, last_hit) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET hits = hits + excluded.hits, last_hit = excluded.last_hit",
+                    [(key, *entry) for key, entry in pending.items()]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError as e:
+            # Popularity is best effort; never fail a search over it
+            logger.debug("Could not record %d request counts: %s", len(pending), e)
+
+    def save(self, inputs, text, usage=None):
+        """Store a new version of the snapshot for this search; returns its version"""
+        key = snapshot_key(inputs)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM snapshots WHERE key = ?", (key,)).fetchone()[0]
+            conn.execute(
+                "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, version, normalize(inputs["location"]), normalize(inputs["grade"]),
+                 normalize(inputs["curriculum"]), text, json.dumps(usage) if usage else None, time.time())
+            )
+            conn.execute("DELETE FROM snapshots WHERE key = ? AND version <= ?", (key, version - SNAPSHOT_KEEP_VERSIONS))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return version
+
+    def rollback(self, inputs):
+        """Drop the latest version of a snapshot, serving the previous one again"""
+        key = snapshot_key(inputs)
+        self._conn().execute(
+            "DELETE FROM snapshots WHERE key = ? AND version = (SELECT MAX(version) FROM snapshots WHERE key = ?)",
+            (key, key)
+        )
+
+    def ages(self):
+        """Age in seconds of the latest snapshot of every stored search"""
+        now = time.time()
+        return {key: now - created for key, created in self._conn().execute(
+            "SELECT key, MAX(created) FROM snapshots GROUP BY key"
+        )}
+
+    def popular(self, min_hits, limit):
+        """Most requested searches: (key, params, hits)"""
+        self.flush()
+        return [(key, json.loads(params), hits) for key, params, hits in self._conn().execute(
+            "SELECT key, params, hits FROM requests WHERE hits >= ? ORDER BY hits DESC LIMIT ?", (min_hits, limit)
+        )]
+
+    def hits(self):
+        self.flush()
+        return dict(self._conn().execute("SELECT key, hits FROM requests"))
+
+
+snapshot_store = SnapshotStore() if SNAPSHOTS_ENABLED else None
+if snapshot_store is not None:
+    atexit.register(snapshot_store.flush)
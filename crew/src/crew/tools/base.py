@@ -0,0 +1,30 @@
+from crewai.tools import BaseTool
+from crewai.tools.structured_tool import CrewStructuredTool, ToolUsageLimitExceededError
+
+
+class AsyncStructuredTool(CrewStructuredTool):
+    """Structured tool whose async invocation awaits the tool's _arun().
+
+    crewai wraps only _run() and, in async crews, runs it on a thread pool;
+    sync crews keep calling _run() through invoke().
+    """
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        parsed_args = self._parse_args(input)
+        if self.has_reached_max_usage_count():
+            raise ToolUsageLimitExceededError(
+                f"Tool '{self.name}' has reached its maximum usage limit of {self.max_usage_count}. "
+                f"You should not use the {self.name} tool again."
+            )
+        self._increment_usage_count()
+        return await self._original_tool._arun(**parsed_args, **kwargs)
+
+
+class AsyncNativeTool(BaseTool):
+    """Base for tools with a native _arun(), so async crew runs don't park a thread per call"""
+
+    def to_structured_tool(self):
+        structured_tool = super().to_structured_tool()
+        async_tool = AsyncStructuredTool.model_construct(**dict(structured_tool))
+        async_tool._original_tool = self
+        return async_tool
@@ -1,13 +1,19 @@
-import requests
-from crewai.tools import BaseTool
+import os
+from src.crew.http_client import async_client, run_async
+from src.crew.tools.base import AsyncNativeTool
+from src.crew.resilience import ProviderError, ProviderUnavailable, acall_provider, call_timeout
 from typing import Type
 from pydantic import BaseModel, Field
 
+# IP geolocation providers (overridable, e.g. for local benchmarks)
+PRIMARY_URL = os.getenv("LOCATION_PRIMARY_URL", "https://ipapi.co/json/")
+FALLBACK_URL = os.getenv("LOCATION_FALLBACK_URL", "http://ip-api.com/json/")
+
 class LocationInput(BaseModel):
     """Input schema for LocationTool."""
     query: str = Field(..., description="Query to get location information (e.g., 'current location', 'my location')")
 
-class LocationTool(BaseTool):
+class LocationTool(AsyncNativeTool):
     name: str = "get_current_location"
     description: str = "Get current location information including city, region, and country based on IP address."
     args_schema: Type[BaseModel] = LocationInput
@@ -16,39 +22,47 @@ class LocationTool(BaseTool):
         """
         Get current location information using IP geolocation.
         
+        Asks ipapi.co first and, if it is slow or fails, ip-api.com as well;
+        whichever answers first wins. crewai calls tools from worker threads;
+        the lookup itself runs on the shared event loop and HTTP client.
+        
         Args:
             query: Query string (not used but required by schema)
             
         Returns:
             String containing location information
         """
+        return run_async(self._arun, query)
+
+    async def _arun(self, query: str) -> str:
+        """_run() for async callers, without holding a thread during the lookup"""
         try:
-            # Using ipapi.co for free IP geolocation
-            response = requests.get('https://ipapi.co/json/', timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if 'error' in data:
-                fallback_response = requests.get('http://ip-api.com/json/', timeout=10)
-                fallback_response.raise_for_status()
-                fallback_data = fallback_response.json()
-                
-                if fallback_data.get('status') == 'success':
-                    return f"Current Location: {fallback_data.get('city', 'Unknown')}, {fallback_data.get('regionName', 'Unknown')}, {fallback_data.get('country', 'Unknown')}"
-                else:
-                    return "Unable to determine current location. Please specify your location manually."
-            
-            city = data.get('city', 'Unknown')
-            region = data.get('region', 'Unknown')
-            country = data.get('country_name', 'Unknown')
-            
-            return f"Current Location: {city}, {region}, {country}"
-            
-        except requests.RequestException as e:
-            return f"Error getting location: {str(e)}. Please specify your location manually."
-        except Exception as e:
-            return f"Unexpected error: {str(e)}. Please specify your location manually."
+            return await acall_provider("geolocation", aprimary_location, hedge=afallback_location)
+        except ProviderUnavailable as e:
+            return unavailable_message(e)
+
+def unavailable_message(error):
+    return f"Unable to determine current location ({error.reason}). Please specify your location manually."
+
+def parse_primary(data):
+    if 'error' in data:
+        raise ProviderError(data.get('reason', 'lookup failed'))
+    return f"Current Location: {data.get('city', 'Unknown')}, {data.get('region', 'Unknown')}, {data.get('country_name', 'Unknown')}"
+
+def parse_fallback(data):
+    if data.get('status') != 'success':
+        raise ProviderError(data.get('message', 'lookup failed'))
+    return f"Current Location: {data.get('city', 'Unknown')}, {data.get('regionName', 'Unknown')}, {data.get('country', 'Unknown')}"
+
+async def aprimary_location():
+    response = await async_client().get(PRIMARY_URL, timeout=call_timeout("geolocation"))
+    response.raise_for_status()
+    return parse_primary(response.json())
+
+async def afallback_location():
+    response = await async_client().get(FALLBACK_URL, timeout=call_timeout("geolocation"))
+    response.raise_for_status()
+    return parse_fallback(response.json())
 
 # Create tool instance
 tool = LocationTool()
@@ -0,0 +1,163 @@
+import asyncio
+import os
+from typing import List, Type
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from src.crew.http_client import run_async
+from src.crew.ratelimit import athrottle
+from src.crew.resilience import ProviderUnavailable, acall_provider
+from src.crew.tools.base import AsyncNativeTool
+from src.crew.tools.websearch import BUDGET_EXHAUSTED, SEARCH_UNAVAILABLE, tool as web_search_tool
+from src.crew.usage import current_usage
+
+# Queries one call may run, at most; each one is a Serper search and counts against the run's budget
+MULTI_SEARCH_MAX_QUERIES = int(os.getenv("MULTI_SEARCH_MAX_QUERIES", "5"))
+# Results in the combined summary, best-ranked first
+MULTI_SEARCH_MAX_RESULTS = int(os.getenv("MULTI_SEARCH_MAX_RESULTS", "20"))
+SNIPPET_CHARS = 200
+
+
+class MultiSearchInput(BaseModel):
+    """Input schema for MultiSearchTool."""
+    queries: List[str] = Field(
+        ..., min_length=1, max_length=MULTI_SEARCH_MAX_QUERIES,
+        description="Search queries to run together, e.g. one per locality or curriculum variant"
+    )
+
+
+def url_key(url):
+    """URL identity for deduplication: no scheme, "www.", fragment or trailing slash"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{host}{parts.path.rstrip('/')}{query}"
+
+
+def merge_results(results):
+    """Organic results of all queries, deduplicated by URL.
+
+    A page found by several queries is listed once, at its best position, and
+    ranks ahead of pages found by fewer queries at the same position.
+    """
+    merged = {}
+    for number, result in enumerate(results, 1):
+        if not isinstance(result, dict):
+            continue
+        for rank, item in enumerate(result.get("organic", []), 1):
+            key = url_key(item.get("link", ""))
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = entry = {"title": item.get("title", ""), "link": item.get("link", ""),
+                                       "snippet": item.get("snippet", ""), "position": rank, "queries": []}
+            elif len(item.get("snippet", "")) > len(entry["snippet"]):
+                entry["snippet"] = item["snippet"]
+            entry["position"] = min(entry["position"], item.get("position") or rank)
+            entry["queries"].append(number)
+    return sorted(merged.values(), key=lambda entry: (entry["position"], -len(entry["queries"])))
+
+
+def summarize(queries, results, limit=MULTI_SEARCH_MAX_RESULTS):
+    """Compact text of the merged results, with the query numbers that found each page"""
+    merged = merge_results(results)
+    lines = [f"Searched {len(queries)} queries, {len(merged)} unique pages:"]
+    for number, (query, result) in enumerate(zip(queries, results), 1):
+        status = f"unavailable ({result.reason})" if isinstance(result, ProviderUnavailable) else \
+            f"{len(result.get('organic', []))} results"
+        lines.append(f"  Q{number}: {query} - {status}")
+    for index, entry in enumerate(merged[:limit], 1):
+        snippet = " ".join(entry["snippet"].split())
+        if len(snippet) > SNIPPET_CHARS:
+            snippet = snippet[:SNIPPET_CHARS].rsplit(" ", 1)[0] + "..."
+        found_by = ",".join(f"Q{number}" for number in entry["queries"])
+        lines.append(f"{index}. {entry['title']} [{found_by}]\n   {entry['link']}\n   {snippet}")
+    if len(merged) > limit:
+        lines.append(f"({len(merged) - limit} more pages omitted)")
+    return "\n".join(lines)
+
+
+def unique_queries(queries):
+    """Non-blank queries in order, without repeats"""
+    return list(dict.fromkeys(query.strip() for query in queries if isinstance(query, str) and query.strip()))
+
+
+def describe(max_queries):
+    return (
+        "Run several web searches at once, e.g. one per locality or curriculum variant, and get their "
+        f"results merged and deduplicated by URL. Takes up to {max_queries} queries in total; "
+        "each counts as one search."
+    )
+
+
+class MultiSearchTool(AsyncNativeTool):
+    name: str = "multi_search"
+    description: str = describe(MULTI_SEARCH_MAX_QUERIES)
+    args_schema: Type[BaseModel] = MultiSearchInput
+    # Queries left to this tool across all its calls; a crew gets its own tool with its search plan
+    max_queries: int = MULTI_SEARCH_MAX_QUERIES
+    _queries_run: int = PrivateAttr(default=0)
+
+    def _run(self, queries: List[str]) -> str:
+        """
+        Run the queries concurrently and summarize the combined results.
+
+        crewai calls tools from worker threads; the searches themselves run
+        on the shared event loop, through the same rate limit, hedging and
+        circuit breaker as single searches.
+
+        Args:
+            queries: Search queries
+
+        Returns:
+            Combined results, best-ranked first, or a note when searching is not possible
+        """
+        return run_async(self._arun, queries)
+
+    async def _arun(self, queries: List[str]) -> str:
+        queries = unique_queries(queries)
+        if not queries:
+            return "No search queries given."
+        left = min(self.max_queries - self._queries_run, MULTI_SEARCH_MAX_QUERIES)
+        if left <= 0:
+            return "Search limit reached: answer from the results you already have."
+        skipped = queries[left:]
+        queries = queries[:left]
+        usage = current_usage()
+        if usage is not None:
+            # The run's usage counts the queries searched, not the ones asked for
+            usage.record_searches(self.name, 0)
+            if not usage.can_afford_search(len(queries)):
+                usage.note_downgrade("search_budget_exhausted")
+                return BUDGET_EXHAUSTED
+            usage.record_searches(self.name, len(queries))
+        self._queries_run += len(queries)
+        results = await asyncio.gather(*(self._search(query) for query in queries))
+        failed = [result for result in results if isinstance(result, ProviderUnavailable)]
+        if failed and usage is not None:
+            usage.note_degraded("serper_unavailable")
+        if len(failed) == len(results):
+            return f"{SEARCH_UNAVAILABLE} ({failed[0].reason})"
+        summary = summarize(queries, results)
+        if skipped:
+            summary += f"\nNot searched, over the search limit: {'; '.join(skipped)}"
+        return summary
+
+    async def _search(self, query):
+        """Results of one query, or the ProviderUnavailable that stopped it"""
+        await athrottle("serper")
+        search = lambda: web_search_tool.asearch(query)
+        try:
+            return await acall_provider("serper", search, hedge=search)
+        except ProviderUnavailable as e:
+            return e
+
+
+def for_plan(searches):
+    """Multi-search tool of one crew run, limited to the searches its plan allows"""
+    max_queries = min(searches, MULTI_SEARCH_MAX_QUERIES)
+    return MultiSearchTool(max_queries=max_queries, description=describe(max_queries))
+
+
+# Create tool instance
+tool = MultiSearchTool()
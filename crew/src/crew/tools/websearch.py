@@ -1,3 +1,74 @@
+import os
 from crewai_tools import SerperDevTool
+from src.crew.http_client import async_client, run_async
+from src.crew.ratelimit import athrottle
+from src.crew.resilience import ProviderError, ProviderUnavailable, acall_provider, call_timeout
+from src.crew.tools.base import AsyncNativeTool
+from src.crew.usage import current_usage
 
-tool = SerperDevTool()
\ No newline at end of file
+BUDGET_EXHAUSTED = (
+    "Search budget for this request is exhausted. Do not search again; "
+    "answer with the information already gathered."
+)
+SEARCH_UNAVAILABLE = (
+    "The search service is unavailable right now. Do not search again; "
+    "answer with the information already gathered."
+)
+
+
+class BudgetedSerperDevTool(SerperDevTool, AsyncNativeTool):
+    """Serper search that respects the shared rate limit and stops once the run's budget is spent.
+
+    Slow searches are hedged with a second request, and an unavailable
+    Serper yields a note to the agent instead of an error. Requests go
+    through the shared HTTP client on one event loop, also when crewai
+    calls the tool from a worker thread.
+    """
+
+    def _run(self, **kwargs):
+        return run_async(self._arun, **kwargs)
+
+    async def _arun(self, **kwargs):
+        usage = current_usage()
+        if usage is not None and not usage.can_afford_search():
+            usage.note_downgrade("search_budget_exhausted")
+            return BUDGET_EXHAUSTED
+        await athrottle("serper")
+        search = lambda: self.asearch(kwargs.get("search_query") or kwargs.get("query"),
+                                      kwargs.get("search_type", self.search_type))
+        try:
+            return await acall_provider("serper", search, hedge=search)
+        except ProviderUnavailable as e:
+            return self._unavailable(usage, e)
+
+    async def asearch(self, search_query, search_type="search"):
+        """One Serper request, formatted like SerperDevTool._run() formats it"""
+        if not search_query:
+            raise ValueError("search_query is required")
+        payload = {"q": search_query, "num": self.n_results}
+        for field, value in (("gl", self.country), ("location", self.location), ("hl", self.locale)):
+            if value:
+                payload[field] = value
+        response = await async_client().post(
+            self._get_search_url(search_type),
+            headers={"X-API-KEY": os.environ["SERPER_API_KEY"], "content-type": "application/json"},
+            json=payload,
+            timeout=call_timeout("serper"),
+        )
+        response.raise_for_status()
+        results = response.json()
+        if not results:
+            raise ProviderError("Empty response from Serper API")
+        formatted = {"searchParameters": {"q": search_query, "type": search_type, **results.get("searchParameters", {})}}
+        formatted.update(self._process_search_results(results, search_type))
+        formatted["credits"] = results.get("credits", 1)
+        return formatted
+
+    @staticmethod
+    def _unavailable(usage, error):
+        if usage is not None:
+            usage.note_degraded("serper_unavailable")
+        return f"{SEARCH_UNAVAILABLE} ({error.reason})"
+
+
+tool = BudgetedSerperDevTool(base_url=os.getenv("SERPER_BASE_URL", "https://google.serper.dev"))
@@ -0,0 +1,397 @@
+import contextvars
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+# crewai moved its event bus out of crewai.utilities in 1.x
+try:
+    from crewai.events import (
+        crewai_event_bus, TaskStartedEvent, TaskCompletedEvent, TaskFailedEvent,
+        AgentExecutionStartedEvent, AgentExecutionCompletedEvent, AgentExecutionErrorEvent,
+        ToolUsageStartedEvent, ToolUsageFinishedEvent, ToolUsageErrorEvent,
+        LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent,
+    )
+except ImportError:
+    from crewai.utilities.events import (
+        crewai_event_bus, TaskStartedEvent, TaskCompletedEvent, TaskFailedEvent,
+        AgentExecutionStartedEvent, AgentExecutionCompletedEvent, AgentExecutionErrorEvent,
+        ToolUsageStartedEvent, ToolUsageFinishedEvent, ToolUsageErrorEvent,
+        LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent,
+    )
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "school-crew")
+# Append each finished trace as one OTLP/JSON line to this file
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE")
+# Local OpenTelemetry collector (OTLP/HTTP JSON), e.g. http://localhost:4318
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_trace = contextvars.ContextVar("school_crew_trace", default=None)
+
+
+def _event_ns(event):
+    """Event timestamp in Unix nanoseconds (crewai stamps events with naive local time)"""
+    timestamp = getattr(event, "timestamp", None)
+    return int(timestamp.timestamp() * 1e9) if timestamp else time.time_ns()
+
+
+class Span:
+    """One timed operation inside a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status", "message")
+
+    def __init__(self, trace_id, name, parent_id=None, start_ns=None, attributes=None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_OK
+        self.message = ""
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def end(self, end_ns=None, error=None):
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+        if error is not None:
+            self.status = STATUS_ERROR
+            self.message = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            "status": {"code": self.status, "message": self.message},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Trace:
+    """All spans of one crew run.
+
+    The crew runs its tasks sequentially, so the trace keeps track of the
+    current task, agent and iteration span and nests new spans under them.
+    """
+
+    def __init__(self, name, **attributes):
+        self.trace_id = secrets.token_hex(16)
+        self.lock = threading.Lock()
+        self.root = Span(self.trace_id, name, attributes=attributes)
+        self.spans = [self.root]
+        self.task = None
+        self.agent = None
+        self.iteration = None
+        self.iterations = 0
+        self.llm_calls = []
+        self.tools = {}
+
+    def start_span(self, name, parent=None, start_ns=None, **attributes):
+        with self.lock:
+            parent = parent or self.iteration or self.agent or self.task or self.root
+            span = Span(self.trace_id, name, parent.span_id, start_ns, attributes)
+            self.spans.append(span)
+            return span
+
+    def finish(self, error=None):
+        end_ns = time.time_ns()
+        for span in self.spans[1:]:
+            span.end(end_ns)
+        self.root.end(end_ns, error)
+
+    def timings(self):
+        """Per-run breakdown of where the time went"""
+        llm = [span for span in self.spans if span.name == "llm.call"]
+        tools = {}
+        for span in self.spans:
+            if span.name != "tool.call":
+                continue
+            name = span.attributes.get("tool.name", "tool")
+            entry = tools.setdefault(name, {"calls": 0, "cache_hits": 0, "ms": 0.0})
+            entry["calls"] += 1
+            entry["cache_hits"] += int(bool(span.attributes.get("tool.cache_hit")))
+            entry["ms"] = round(entry["ms"] + span.duration_ms, 1)
+        return {
+            "total_ms": round(self.root.duration_ms, 1),
+            "tasks": {span.attributes.get("task.name", "task"): round(span.duration_ms, 1)
+                      for span in self.spans if span.name == "task"},
+            "llm": {
+                "calls": len(llm),
+                "ms": round(sum(span.duration_ms for span in llm), 1),
+                "prompt_tokens": sum(span.attributes.get("llm.prompt_tokens") or 0 for span in llm)
+                                 or self.root.attributes.get("llm.prompt_tokens", 0),
+                "completion_tokens": sum(span.attributes.get("llm.completion_tokens") or 0 for span in llm)
+                                     or self.root.attributes.get("llm.completion_tokens", 0),
+            },
+            "tools": tools,
+            "rate_limit_ms": {
+                provider: round(sum(span.attributes["ratelimit.wait_ms"] for span in waits), 1)
+                for provider, waits in _group(self.spans, "ratelimit.wait", "ratelimit.provider").items()
+            },
+            "agent_iterations": self.iterations,
+        }
+
+    def to_otlp(self):
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "school-crew"}, "spans": [span.to_otlp() for span in self.spans]}],
+        }]}
+
+
+def _group(spans, name, attribute):
+    groups = {}
+    for span in spans:
+        if span.name == name:
+            groups.setdefault(span.attributes.get(attribute), []).append(span)
+    return groups
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block as a child of the innermost open span of the current run"""
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+    child = trace.start_span(name, **attributes)
+    try:
+        yield child
+    except BaseException as e:
+        child.end(error=e)
+        raise
+    child.end()
+
+
+@contextmanager
+def trace_run(name, **attributes):
+    """Collect spans for everything the crew does inside this block"""
+    trace = Trace(name, **attributes)
+    token = _current_trace.set(trace)
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        # Newer crewai versions dispatch event handlers on a thread pool
+        flush = getattr(crewai_event_bus, "flush", None)
+        if flush:
+            flush(timeout=5)
+        trace.finish(error)
+        _current_trace.reset(token)
+        export(trace)
+
+
+def server_timing(timings):
+    """Render a timings breakdown as a Server-Timing header value"""
+    parts = [
+        f'total;dur={timings["total_ms"]}',
+        f'llm;dur={timings["llm"]["ms"]};desc="{timings["llm"]["calls"]} calls"',
+    ]
+    for name, tool in timings["tools"].items():
+        slug = "".join(c if c.isalnum() else "-" for c in name.lower()).strip("-")
+        parts.append(f'tool-{slug};dur={tool["ms"]};desc="{tool["calls"]} calls, {tool["cache_hits"]} cached"')
+    for provider, ms in timings.get("rate_limit_ms", {}).items():
+        parts.append(f'ratelimit-{provider};dur={ms}')
+    return ", ".join(parts)
+
+
+# --- Export -----------------------------------------------------------------
+
+_file_lock = threading.Lock()
+
+
+def export(trace):
+    if not (TRACE_EXPORT_FILE or OTLP_ENDPOINT):
+        return
+    payload = trace.to_otlp()
+    if TRACE_EXPORT_FILE:
+        try:
+            with _file_lock, open(TRACE_EXPORT_FILE, "a", encoding="utf-8") as file:
+                file.write(json.dumps(payload) + "\n")
+        except OSError as e:
+            logger.warning("Could not write trace to %s: %s", TRACE_EXPORT_FILE, e)
+    if OTLP_ENDPOINT:
+        # Never make the request wait on the collector
+        threading.Thread(target=_post_otlp, args=(payload,), daemon=True).start()
+
+
+def _post_otlp(payload):
+    try:
+        requests.post(f"{OTLP_ENDPOINT.rstrip('/')}/v1/traces", json=payload, timeout=5).raise_for_status()
+    except requests.RequestException as e:
+        logger.warning("Could not export trace to %s: %s", OTLP_ENDPOINT, e)
+
+
+# --- crewai event handlers --------------------------------------------------
+
+def _with_trace(handler):
+    def wrapper(source, event):
+        trace = current_trace()
+        if trace is None:
+            return
+        try:
+            handler(trace, event)
+        except Exception as e:
+            logger.debug("Tracing handler failed: %s", e)
+    return wrapper
+
+
+@_with_trace
+def _task_started(trace, event):
+    task = getattr(event, "task", None)
+    name = getattr(task, "name", None) or getattr(event, "task_name", None) or "task"
+    trace.task = trace.start_span("task", parent=trace.root, start_ns=_event_ns(event), **{"task.name": name})
+
+
+@_with_trace
+def _task_finished(trace, event):
+    if trace.task:
+        trace.task.end(_event_ns(event), getattr(event, "error", None))
+        trace.task = None
+
+
+@_with_trace
+def _agent_started(trace, event):
+    agent = getattr(event, "agent", None)
+    role = getattr(agent, "role", None) or getattr(event, "agent_role", None) or "agent"
+    trace.agent = trace.start_span("agent", parent=trace.task or trace.root, start_ns=_event_ns(event), **{"agent.role": role.strip()})
+
+
+@_with_trace
+def _agent_finished(trace, event):
+    end_ns = _event_ns(event)
+    if trace.iteration:
+        trace.iteration.end(end_ns)
+        trace.iteration = None
+    if trace.agent:
+        trace.agent.end(end_ns, getattr(event, "error", None))
+        trace.agent = None
+
+
+@_with_trace
+def _llm_started(trace, event):
+    start_ns = _event_ns(event)
+    # Every LLM turn starts a new agent iteration; its tool calls nest under it
+    if trace.agent:
+        if trace.iteration:
+            trace.iteration.end(start_ns)
+        trace.iterations += 1
+        trace.iteration = trace.start_span("agent.iteration", parent=trace.agent, start_ns=start_ns,
+                                           **{"agent.iteration": trace.iterations})
+    # Text sizes let budget checks estimate tokens when the provider reports none mid-run
+    trace.llm_calls.append(trace.start_span("llm.call", start_ns=start_ns, **{
+        "llm.model": getattr(event, "model", None),
+        "llm.prompt_chars": len(str(getattr(event, "messages", None) or "")),
+    }))
+
+
+@_with_trace
+def _llm_finished(trace, event):
+    if not trace.llm_calls:
+        return
+    llm_span = trace.llm_calls.pop(0)
+    usage = getattr(event, "usage", None) or {}
+    llm_span.attributes["llm.prompt_tokens"] = usage.get("prompt_tokens")
+    llm_span.attributes["llm.completion_tokens"] = usage.get("completion_tokens")
+    llm_span.attributes["llm.completion_chars"] = len(str(getattr(event, "response", None) or ""))
+    llm_span.end(_event_ns(event), getattr(event, "error", None))
+
+
+def _tool_attributes(event):
+    attributes = {"tool.name": event.tool_name, "tool.query": str(event.tool_args)[:500]}
+    # A multi-query search is one tool call but several searches
+    queries = event.tool_args.get("queries") if isinstance(event.tool_args, dict) else None
+    if isinstance(queries, list):
+        attributes["tool.queries"] = len(queries)
+    return attributes
+
+
+@_with_trace
+def _tool_started(trace, event):
+    key = (event.tool_name, str(event.tool_args))
+    trace.tools.setdefault(key, []).append(trace.start_span(
+        "tool.call", start_ns=_event_ns(event), **_tool_attributes(event)
+    ))
+
+
+@_with_trace
+def _tool_finished(trace, event):
+    pending = trace.tools.get((event.tool_name, str(event.tool_args)))
+    if pending:
+        tool_span = pending.pop(0)
+    else:
+        # Cache hits may finish without a matching start event
+        tool_span = trace.start_span("tool.call", **_tool_attributes(event))
+        started_at = getattr(event, "started_at", None)
+        if started_at:
+            tool_span.start_ns = int(started_at.timestamp() * 1e9)
+    tool_span.attributes["tool.cache_hit"] = bool(getattr(event, "from_cache", False))
+    finished_at = getattr(event, "finished_at", None)
+    tool_span.end(int(finished_at.timestamp() * 1e9) if finished_at else _event_ns(event), getattr(event, "error", None))
+
+
+_registered = False
+
+
+def register_event_handlers():
+    """Subscribe the span builders to the crewai event bus (idempotent)"""
+    global _registered
+    if _registered:
+        return
+    _registered = True
+    for event_type, handler in [
+        (TaskStartedEvent, _task_started),
+        (TaskCompletedEvent, _task_finished),
+        (TaskFailedEvent, _task_finished),
+        (AgentExecutionStartedEvent, _agent_started),
+        (AgentExecutionCompletedEvent, _agent_finished),
+        (AgentExecutionErrorEvent, _agent_finished),
+        (LLMCallStartedEvent, _llm_started),
+        (LLMCallCompletedEvent, _llm_finished),
+        (LLMCallFailedEvent, _llm_finished),
+        (ToolUsageStartedEvent, _tool_started),
+        (ToolUsageFinishedEvent, _tool_finished),
+        (ToolUsageErrorEvent, _tool_finished),
+    ]:
+        crewai_event_bus.on(event_type)(handler)
+
+
+register_event_handlers()
@@ -0,0 +1,151 @@
+import contextvars
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Provider prices (USD); defaults are Gemini 2.0 Flash and Serper's pay-as-you-go tier
+LLM_INPUT_USD_PER_1M = float(os.getenv("LLM_INPUT_USD_PER_1M", "0.10"))
+LLM_OUTPUT_USD_PER_1M = float(os.getenv("LLM_OUTPUT_USD_PER_1M", "0.40"))
+SERPER_USD_PER_QUERY = float(os.getenv("SERPER_USD_PER_QUERY", "0.001"))
+
+# Planning estimates: an agent turn re-sends the task prompt plus everything gathered so far
+EST_PROMPT_TOKENS_PER_CALL = int(os.getenv("EST_PROMPT_TOKENS_PER_CALL", "2500"))
+EST_COMPLETION_TOKENS_PER_CALL = int(os.getenv("EST_COMPLETION_TOKENS_PER_CALL", "150"))
+EST_COMPLETION_TOKENS_PER_SCHOOL = int(os.getenv("EST_COMPLETION_TOKENS_PER_SCHOOL", "60"))
+CHARS_PER_TOKEN = 4
+
+_current_usage = contextvars.ContextVar("school_crew_usage", default=None)
+
+
+def llm_cost(prompt_tokens, completion_tokens):
+    return (prompt_tokens * LLM_INPUT_USD_PER_1M + completion_tokens * LLM_OUTPUT_USD_PER_1M) / 1e6
+
+
+def estimate_cost(options):
+    """Expected cost of a crew run with the given search options"""
+    searches = options["finder_searches"] + options["analyzer_searches"]
+    # One LLM turn per search, plus location lookup and one final answer per agent
+    llm_calls = searches + 3
+    prompt_tokens = llm_calls * EST_PROMPT_TOKENS_PER_CALL
+    completion_tokens = llm_calls * EST_COMPLETION_TOKENS_PER_CALL + 2 * options["max_results"] * EST_COMPLETION_TOKENS_PER_SCHOOL
+    return llm_cost(prompt_tokens, completion_tokens) + searches * SERPER_USD_PER_QUERY
+
+
+def _tokens(span, kind):
+    """Reported token count of an LLM span, or an estimate from its text length"""
+    tokens = span.attributes.get(f"llm.{kind}_tokens")
+    if tokens is None:
+        tokens = (span.attributes.get(f"llm.{kind}_chars") or 0) // CHARS_PER_TOKEN
+    return tokens
+
+
+class RunUsage:
+    """Token, tool-call and cost accounting for one crew run"""
+
+    def __init__(self, trace, budget_usd=None, downgrade="full"):
+        self.trace = trace
+        self.budget_usd = budget_usd
+        self.downgrades = [downgrade]
+        self.degraded = []
+        # Where the answer came from when no crew ran, e.g. {"source": "semantic", ...}
+        self.cache = None
+        # Searches run by tools that count their own (multi_search), by tool name
+        self.tool_searches = {}
+        self.lock = threading.Lock()
+
+    def note_downgrade(self, level):
+        if level not in self.downgrades:
+            self.downgrades.append(level)
+
+    def note_degraded(self, reason):
+        """Record that part of the answer is missing because a provider was unavailable"""
+        if reason not in self.degraded:
+            self.degraded.append(reason)
+
+    def record_searches(self, tool_name, count):
+        """Count searches a tool actually ran; its traced calls then don't count towards search_queries"""
+        with self.lock:
+            self.tool_searches[tool_name] = self.tool_searches.get(tool_name, 0) + count
+
+    def counts(self):
+        prompt_tokens = completion_tokens = llm_calls = 0
+        tool_calls = {}
+        search_calls = 0
+        for span in self.trace.spans:
+            if span.name == "llm.call":
+                llm_calls += 1
+                prompt_tokens += _tokens(span, "prompt")
+                completion_tokens += _tokens(span, "completion")
+            elif span.name == "tool.call":
+                name = span.attributes.get("tool.name", "tool")
+                tool_calls[name] = tool_calls.get(name, 0) + 1
+                if name in self.tool_searches:
+                    continue
+                if ("serper" in name.lower() or "search" in name.lower()) and not span.attributes.get("tool.cache_hit"):
+                    search_calls += span.attributes.get("tool.queries", 1)
+        with self.lock:
+            search_calls += sum(self.tool_searches.values())
+        return prompt_tokens, completion_tokens, llm_calls, tool_calls, search_calls
+
+    def spent_usd(self):
+        prompt_tokens, completion_tokens, _, _, search_calls = self.counts()
+        return llm_cost(prompt_tokens, completion_tokens) + search_calls * SERPER_USD_PER_QUERY
+
+    def can_afford_search(self, queries=1):
+        """Whether another search still leaves room for the agents' final answers"""
+        if self.budget_usd is None:
+            return True
+        reserve = llm_cost(2 * EST_PROMPT_TOKENS_PER_CALL, 2 * EST_COMPLETION_TOKENS_PER_CALL)
+        return self.spent_usd() + queries * SERPER_USD_PER_QUERY + reserve <= self.budget_usd
+
+    def as_dict(self):
+        prompt_tokens, completion_tokens, llm_calls, tool_calls, search_calls = self.counts()
+        # Prefer the crew's own per-run totals when it reports them
+        prompt_tokens = self.trace.root.attributes.get("llm.prompt_tokens") or prompt_tokens
+        completion_tokens = self.trace.root.attributes.get("llm.completion_tokens") or completion_tokens
+        cost = llm_cost(prompt_tokens, completion_tokens) + search_calls * SERPER_USD_PER_QUERY
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "llm_calls": llm_calls,
+            "tool_calls": tool_calls,
+            "search_queries": search_calls,
+            "cost_usd": round(cost, 6),
+            "budget_usd": self.budget_usd,
+            "downgrades": [level for level in self.downgrades if level != "full"],
+            "degraded": list(self.degraded),
+            "cache": self.cache,
+        }
+
+
+def cached_usage(cache, budget_usd=None, downgrade="full"):
+    """Usage of a search answered without running the crew, in RunUsage.as_dict() form"""
+    return {
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+        "llm_calls": 0,
+        "tool_calls": {},
+        "search_queries": 0,
+        "cost_usd": 0.0,
+        "budget_usd": budget_usd,
+        "downgrades": [] if downgrade == "full" else [downgrade],
+        "degraded": [],
+        "cache": cache,
+    }
+
+
+def current_usage():
+    return _current_usage.get()
+
+
+def track_usage(usage):
+    """Make ``usage`` the current run's accounting; returns a token for reset_usage"""
+    return _current_usage.set(usage)
+
+
+def reset_usage(token):
+    _current_usage.reset(token)
@@ -9,6 +9,12 @@ from pathlib import Path
 import sys
 import os
 from datetime import datetime
+import fnmatch
+import threading
+import time
+from collections import OrderedDict
+import io
+import re
 
 
 # Add src to path for imports
@@ -23,6 +29,13 @@ except ImportError:
     PLOTLY_AVAILABLE = False
     st.warning("Plotly not installed. Some visualizations will not be available.")
 
+# Optional incremental JSON parser for large uploads
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
 # Try to import GitCrew
 try:
     from src.crew.gitcrew import GitCrew
@@ -88,21 +101,167 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def load_analysis_report(file_path):
-    """Load analysis report from JSON file, handling markdown code blocks"""
-    try:
+# Report discovery settings
+REPORT_PATTERN = "github_analysis_report_*.json"
+REPORT_ROOTS = [root for root in os.environ.get("REPORT_ROOTS", ".").split(os.pathsep) if root]
+REPORT_RESCAN_SECONDS = float(os.environ.get("REPORT_RESCAN_SECONDS", "5"))
+SKIP_DIRS = {".git", ".venv", "venv", "node_modules", "__pycache__", ".mypy_cache", ".pytest_cache"}
+
+class ReportIndex:
+    """Incremental index of report files under the configured roots.
+
+    Each directory is listed once and only listed again when its mtime
+    changes, so a rescan of an unchanged tree costs one stat per directory.
+    One index is shared by all sessions; scans hold the lock, and callers
+    get a files mapping that is replaced, never changed, by later scans.
+    """
+
+    def __init__(self, roots, pattern=REPORT_PATTERN):
+        self.roots = [Path(root) for root in roots]
+        self.pattern = pattern
+        self.dirs = {}  # directory -> (mtime_ns, report files, subdirectories)
+        self.files = {}  # file name -> path
+        self.last_scan = 0.0
+        self.lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """Rescan directories whose mtime changed since the last scan"""
+        with self.lock:
+            return self._refresh(force)
+
+    def _refresh(self, force):
+        now = time.monotonic()
+        if not force and self.dirs and now - self.last_scan < REPORT_RESCAN_SECONDS:
+            return self.files
+        
+        seen = set()
+        changed = False
+        for root in self.roots:
+            changed |= self._scan(root, seen)
+        
+        # Drop directories that disappeared
+        for directory in set(self.dirs) - seen:
+            del self.dirs[directory]
+            changed = True
+        
+        if changed:
+            files = {}
+            for directory in sorted(self.dirs):
+                for path in self.dirs[directory][1]:
+                    files.setdefault(path.name, path)
+            self.files = files
+        
+        self.last_scan = now
+        return self.files
+
+    def _scan(self, directory, seen):
+        try:
+            mtime = directory.stat().st_mtime_ns
+        except OSError:
+            return False
+        seen.add(directory)
+        
+        cached = self.dirs.get(directory)
+        changed = cached is None or cached[0] != mtime
+        if changed:
+            reports, subdirs = [], []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIP_DIRS:
+                                subdirs.append(Path(entry.path))
+                        elif fnmatch.fnmatch(entry.name, self.pattern):
+                            reports.append(Path(entry.path))
+            except OSError:
+                return False
+            self.dirs[directory] = (mtime, sorted(reports), sorted(subdirs))
+        
+        for subdir in self.dirs[directory][2]:
+            changed |= self._scan(subdir, seen)
+        return changed
+
+@st.cache_resource
+def get_report_index():
+    """Report index shared across reruns and sessions"""
+    return ReportIndex(REPORT_ROOTS)
+
+# Parsed reports are kept up to this many (estimated) megabytes
+REPORT_CACHE_MB = float(os.environ.get("REPORT_CACHE_MB", "256"))
+# Rough in-memory size of parsed JSON relative to the file size
+PARSED_SIZE_FACTOR = 4
+
+class ParsedReport:
+    """Outcome of reading one version of a report file"""
+
+    __slots__ = ("data", "error", "raw_preview", "parsed_preview", "cost")
+
+    def __init__(self, data=None, error=None, raw_preview="", parsed_preview="", cost=0):
+        self.data = data
+        self.error = error
+        self.raw_preview = raw_preview
+        self.parsed_preview = parsed_preview
+        self.cost = cost
+
+class ReportCache:
+    """LRU cache of parsed reports keyed by (path, mtime, size) with a memory budget"""
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()
+        self.used_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, file_path):
+        stat = os.stat(file_path)
+        key = (str(file_path), stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+        
+        entry = self._read(file_path, stat.st_size)
+        with self.lock:
+            # Older versions of the same file are never read again
+            for stale in [k for k in self.entries if k[0] == key[0]]:
+                self.used_bytes -= self.entries.pop(stale).cost
+            if entry.cost <= self.budget_bytes:
+                self.entries[key] = entry
+                self.used_bytes += entry.cost
+                while self.used_bytes > self.budget_bytes:
+                    self.used_bytes -= self.entries.popitem(last=False)[1].cost
+        return entry
+
+    def _read(self, file_path, size):
         with open(file_path, 'r', encoding='utf-8') as file:
             content = file.read()
         
-        # Parse markdown-wrapped JSON
         clean_content = parse_markdown_json(content)
+        try:
+            return ParsedReport(data=json.loads(clean_content), cost=size * PARSED_SIZE_FACTOR)
+        except json.JSONDecodeError as e:
+            # Keep only the previews needed by the debug expander
+            return ParsedReport(
+                error=e,
+                raw_preview=content[:1000] + ("..." if len(content) > 1000 else ""),
+                parsed_preview=clean_content[:500] + ("..." if len(clean_content) > 500 else ""),
+                cost=1500
+            )
+
+@st.cache_resource
+def get_report_cache():
+    """Parsed report cache shared across reruns and sessions"""
+    return ReportCache(int(REPORT_CACHE_MB * 1024 * 1024))
+
+def load_analysis_report(file_path):
+    """Load analysis report from JSON file, handling markdown code blocks"""
+    try:
+        report = get_report_cache().get(file_path)
+        if report.error is None:
+            return report.data
         
-        # Parse the JSON content
-        data = json.loads(clean_content)
-        
-        return data
-        
-    except json.JSONDecodeError as e:
+        e = report.error
         st.error(f"Error parsing JSON: {e}")
         
         # Show debugging information
@@ -111,18 +270,12 @@ def load_analysis_report(file_path):
             st.write("**File path:**", str(file_path))
             
             # Show raw content preview
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    raw_content = file.read()
-                    st.write("**Raw content preview (first 1000 chars):**")
-                    st.code(raw_content[:1000] + ("..." if len(raw_content) > 1000 else ""))
-                    
-                    # Show after markdown parsing
-                    parsed_content = parse_markdown_json(raw_content)
-                    st.write("**After markdown parsing (first 500 chars):**")
-                    st.code(parsed_content[:500] + ("..." if len(parsed_content) > 500 else ""))
-            except Exception as debug_e:
-                st.write(f"Could not read file for debugging: {debug_e}")
+            st.write("**Raw content preview (first 1000 chars):**")
+            st.code(report.raw_preview)
+            
+            # Show after markdown parsing
+            st.write("**After markdown parsing (first 500 chars):**")
+            st.code(report.parsed_preview)
         
         return None
         
@@ -130,6 +283,18 @@ def load_analysis_report(file_path):
         st.error(f"Error loading report: {e}")
         return None
 
+# Uploads larger than this are parsed incrementally (requires ijson)
+STREAMING_UPLOAD_MB = float(os.environ.get("STREAMING_UPLOAD_MB", "20"))
+STREAM_CHUNK_BYTES = 1024 * 1024
+FENCE_PROBE_BYTES = 64
+# Same fences as parse_markdown_json, as bytes
+FENCE_PATTERNS = [
+    (b'```json\n', b'\n```'),
+    (b'```\n', b'\n```'),
+    (b'````json\n', b'\n````'),
+    (b'````\n', b'\n````'),
+]
+
 def parse_markdown_json(content):
     """Parse JSON content that might be wrapped in markdown code blocks"""
     content = content.strip()
@@ -154,9 +319,14 @@ def create_language_pie_chart(languages_data):
     if not PLOTLY_AVAILABLE or not languages_data:
         return None
     
+    # Figures are cached across reruns and sessions; the items keep the report's slice order
+    return _language_pie_chart(tuple(languages_data.items()))
+
+@st.cache_resource(max_entries=64)
+def _language_pie_chart(languages_items):
     fig = px.pie(
-        values=list(languages_data.values()),
-        names=list(languages_data.keys()),
+        values=[value for _, value in languages_items],
+        names=[name for name, _ in languages_items],
         title="Programming Languages Distribution",
         color_discrete_sequence=px.colors.qualitative.Set3
     )
@@ -168,12 +338,17 @@ def create_metrics_bar_chart(metrics_data):
     if not PLOTLY_AVAILABLE:
         return None
     
-    metrics = ['Documentation Rate', 'License Usage Rate', 'Activity Rate']
-    values = [
+    values = (
         metrics_data.get('documentation_rate', 0),
         metrics_data.get('license_usage_rate', 0),
         metrics_data.get('activity_rate', 0)
-    ]
+    )
+    return _metrics_bar_chart(values)
+
+@st.cache_resource(max_entries=64)
+def _metrics_bar_chart(values):
+    metrics = ['Documentation Rate', 'License Usage Rate', 'Activity Rate']
+    values = list(values)
     
     colors = ['green' if v >= 70 else 'orange' if v >= 40 else 'red' for v in values]
     
@@ -1311,6 +1486,115 @@ def display_specialization_areas(report_data):
     except Exception as e:
         st.error(f"Error displaying specialization areas: {e}")
 
+# Report sections in display order; only the selected one is rendered
+REPORT_SECTIONS = {
+    "📋 Summary": ('executive_summary', display_executive_summary),
+    "👤 Profile": ('developer_profile_overview', display_developer_profile),
+    "⚡ Skills": ('technical_skills_analysis', display_technical_skills),
+    "📁 Repositories": ('repository_portfolio_review', display_repository_analysis),
+    "📊 Activity": ('activity_and_engagement_assessment', display_activity_engagement),
+    "💪 Strengths": ('strengths_and_development_areas', display_strengths_development),
+    "🎯 Hiring Fit": ('hiring_and_project_fit_recommendations', display_hiring_recommendations),
+    "⚠️ Risks": ('risk_analysis_and_considerations', display_risk_analysis),
+    "🚀 Next Steps": ('actionable_next_steps', display_action_steps),
+}
+
+def display_report_sections(report_data, key):
+    """Render the report one section at a time, building charts only when viewed"""
+    selected = st.radio(
+        "Report section",
+        list(REPORT_SECTIONS),
+        horizontal=True,
+        key=key,
+        label_visibility="collapsed"
+    )
+    _, display_function = REPORT_SECTIONS[selected]
+    display_function(report_data)
+
+def fenced_json_range(file):
+    """Find the byte range of the JSON payload inside optional markdown fences.
+
+    Mirrors parse_markdown_json, but only looks at the head and tail of the
+    file instead of copying its content.
+    """
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    
+    file.seek(0)
+    head = file.read(FENCE_PROBE_BYTES)
+    file.seek(max(0, size - FENCE_PROBE_BYTES))
+    tail = file.read()
+    
+    start = len(head) - len(head.lstrip())
+    end = size - (len(tail) - len(tail.rstrip()))
+    head, tail = head.lstrip(), tail.rstrip()
+    
+    for start_pattern, end_pattern in FENCE_PATTERNS:
+        if (head.startswith(start_pattern) and tail.endswith(end_pattern)
+                and end - start >= len(start_pattern) + len(end_pattern)):
+            return start + len(start_pattern), end - len(end_pattern)
+    return start, end
+
+class RangeReader(io.RawIOBase):
+    """Read-only view of a byte range of a seekable file, without copying it"""
+
+    def __init__(self, file, start, end):
+        self.file = file
+        self.pos = start
+        self.end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        remaining = self.end - self.pos
+        if remaining <= 0:
+            return 0
+        self.file.seek(self.pos)
+        count = self.file.readinto(memoryview(buffer)[:min(len(buffer), remaining)])
+        self.pos += count
+        return count
+
+def iter_report_sections(file):
+    """Decode a (possibly fenced) report one top-level section at a time.
+
+    Yields (wrapper_key, section_key, section) tuples; only the section
+    currently being decoded is held in memory.
+    """
+    start, end = fenced_json_range(file)
+    
+    # The wrapper key (skill_assessment_report, report, ...) opens the document
+    file.seek(start)
+    match = re.match(rb'\s*\{\s*"((?:[^"\\]|\\.)*)"\s*:\s*\{', file.read(min(4096, end - start)))
+    if not match:
+        raise ValueError("Report does not start with a report object")
+    wrapper_key = match.group(1).decode('utf-8')
+    
+    reader = io.BufferedReader(RangeReader(file, start, end), buffer_size=STREAM_CHUNK_BYTES)
+    for section_key, section in ijson.kvitems(reader, wrapper_key, use_float=True):
+        yield wrapper_key, section_key, section
+
+def display_streamed_report(uploaded_file, key):
+    """Render the selected section of a large upload while streaming through it"""
+    selected = st.radio(
+        "Report section",
+        list(REPORT_SECTIONS),
+        horizontal=True,
+        key=key,
+        label_visibility="collapsed"
+    )
+    section_name, display_function = REPORT_SECTIONS[selected]
+    
+    with st.spinner("Decoding report..."):
+        for wrapper_key, section_key, section in iter_report_sections(uploaded_file):
+            _, report_type = get_report_data({wrapper_key: None})
+            if section_key == map_section_name(section_name, report_type):
+                # Stop decoding as soon as the selected section is available
+                display_function({wrapper_key: {section_key: section}})
+                return
+    
+    st.info("This section is not available in the uploaded report")
+
 def run_new_analysis():
     """Run new GitHub analysis"""
     st.markdown('<div class="section-header">🔍 Run New Analysis</div>', unsafe_allow_html=True)
@@ -1359,14 +1643,29 @@ def upload_and_view_report():
     )
     
     if uploaded_file is not None:
+        # Show file info
+        st.write(f"**File name:** {uploaded_file.name}")
+        st.write(f"**File size:** {uploaded_file.size / (1024 * 1024):.1f} MB")
+        
+        if IJSON_AVAILABLE and uploaded_file.size > STREAMING_UPLOAD_MB * 1024 * 1024:
+            # Large uploads are decoded section by section instead of all at once
+            try:
+                st.markdown("---")
+                display_streamed_report(uploaded_file, key="uploaded_report_section")
+            except (ijson.JSONError, ValueError) as e:
+                st.error(f"❌ Error parsing JSON: {e}")
+                
+                with st.expander("🔍 Debug Information"):
+                    uploaded_file.seek(0)
+                    st.code(uploaded_file.read(1000).decode('utf-8', errors='replace') + "...")
+            except Exception as e:
+                st.error(f"❌ Error processing file: {e}")
+            return
+        
         try:
             # Read the uploaded file
             content = uploaded_file.read().decode('utf-8')
             
-            # Show file info
-            st.write(f"**File name:** {uploaded_file.name}")
-            st.write(f"**File size:** {len(content)} characters")
-            
             # Parse the content
             clean_content = parse_markdown_json(content)
             data = json.loads(clean_content)
@@ -1376,15 +1675,7 @@ def upload_and_view_report():
             
             # Display the report sections
             st.markdown("---")
-            display_executive_summary(data)
-            display_developer_profile(data)
-            display_technical_skills(data)
-            display_repository_analysis(data)
-            display_activity_engagement(data)
-            display_strengths_development(data)
-            display_hiring_recommendations(data)
-            display_risk_analysis(data)
-            display_action_steps(data)
+            display_report_sections(data, key="uploaded_report_section")
             
         except json.JSONDecodeError as e:
             st.error(f"❌ Error parsing JSON: {e}")
@@ -1449,13 +1740,16 @@ def main():
     st.sidebar.title("📋 Navigation")
     
     # Check for existing reports
-    report_files = list(Path(".").glob("**/github_analysis_report_*.json"))
+    report_index = get_report_index()
+    if st.sidebar.button("🔄 Rescan Reports"):
+        report_index.refresh(force=True)
+    report_files = report_index.refresh()
     
     if report_files:
         st.sidebar.subheader("📁 Existing Reports")
         selected_report = st.sidebar.selectbox(
             "Select a report to view:",
-            ["None"] + [f.name for f in report_files]
+            ["None"] + list(report_files)
         )
     else:
         selected_report = "None"
@@ -1467,19 +1761,11 @@ def main():
     
     if page == "📊 View Analysis Report":
         if selected_report != "None":
-            report_path = next(f for f in report_files if f.name == selected_report)
+            report_path = report_files[selected_report]
             report_data = load_analysis_report(report_path)
             if report_data:
                     # Display sections
-                    display_executive_summary(report_data)
-                    display_developer_profile(report_data)
-                    display_technical_skills(report_data)
-                    display_repository_analysis(report_data)
-                    display_activity_engagement(report_data)
-                    display_strengths_development(report_data)
-                    display_hiring_recommendations(report_data)
-                    display_risk_analysis(report_data)
-                    display_action_steps(report_data)
+                    display_report_sections(report_data, key="report_section")
                     
                     # Export options
                     st.markdown("---")
@@ -1505,8 +1791,8 @@ def main():
                                 summary_text = f"GitHub Analysis Summary for {name}"
                                 st.text_area("Summary (copy this text):", summary_text, height=100)
                     
-                    # Raw data in expander
-                    with st.expander("🔍 View Raw Data"):
+                    # Raw data is only serialized to the page when requested
+                    if st.checkbox("🔍 View Raw Data", key="show_raw_report"):
                         # Safe access to raw data
                         report, report_type = get_report_data(report_data)
                         if report:
@@ -1543,6 +1829,7 @@ def main():
     with st.expander("🔧 System Status"):
         st.write(f"**GitCrew Available:** {'✅ Yes' if GITCREW_AVAILABLE else '❌ No'}")
         st.write(f"**Plotly Available:** {'✅ Yes' if PLOTLY_AVAILABLE else '❌ No'}")
+        st.write(f"**Streaming Uploads (ijson):** {'✅ Yes' if IJSON_AVAILABLE else '❌ No'}")
         st.write(f"**Reports Found:** {len(report_files) if report_files else 0}")
 
 if __name__ == "__main__":
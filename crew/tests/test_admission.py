@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from src.crew.admission import AdmissionController, AdmissionRejected
+
+
+def controller(**options):
+    admission = AdmissionController(**dict(dict(max_concurrent=1, max_queued=16, max_queued_per_key=4,
+                                                queue_timeout=5), **options))
+    # Short runs, so the expected wait never turns requests away unless a test says so
+    admission.run_seconds = 0.01
+    return admission
+
+
+def test_freed_slots_go_round_robin_across_keys():
+    async def scenario():
+        admission = controller()
+        order = []
+
+        async def search(key, name):
+            async with admission.slot(key):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await admission.acquire("holder")
+        # A burst from one key, then one request from another
+        tasks = [asyncio.create_task(search("a", f"a{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(search("b", "b0")))
+        await asyncio.sleep(0)
+        admission.release()
+        await asyncio.gather(*tasks)
+        return order, admission
+
+    order, admission = asyncio.run(scenario())
+    assert order == ["a0", "b0", "a1", "a2"]
+    assert (admission.running, admission.queued, dict(admission.queues)) == (0, 0, {})
+
+
+def test_waiting_past_the_timeout_is_rejected_and_dequeued():
+    async def scenario():
+        admission = controller(queue_timeout=0.05, max_queued=4)
+        await admission.acquire("holder")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire("a")
+        return rejected.value, admission
+
+    rejected, admission = asyncio.run(scenario())
+    assert (rejected.status_code, rejected.reason) == (503, "timeout")
+    assert "Retry-After" in rejected.headers
+    assert (admission.running, admission.queued, dict(admission.queues)) == (1, 0, {})
+
+
+def test_full_queue_turns_requests_away():
+    async def scenario():
+        admission = controller(max_queued=3, max_queued_per_key=2)
+        await admission.acquire("holder")
+        waiting = [asyncio.create_task(admission.acquire(key)) for key in ("a", "a", "b")]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as full:
+            await admission.acquire("c")
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        return full.value, admission
+
+    full, admission = asyncio.run(scenario())
+    assert (full.status_code, full.reason) == (503, "queue_full")
+    assert (admission.queued, dict(admission.queues)) == (0, {})
+
+
+def test_key_limit_applies_before_the_queue_is_full():
+    async def scenario():
+        admission = controller(max_queued=8, max_queued_per_key=2)
+        await admission.acquire("holder")
+        waiting = [asyncio.create_task(admission.acquire("a")) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire("a")
+        other = asyncio.create_task(admission.acquire("b"))
+        await asyncio.sleep(0)
+        queued = admission.queued
+        for task in [*waiting, other]:
+            task.cancel()
+        await asyncio.gather(*waiting, other, return_exceptions=True)
+        return rejected.value, queued, admission
+
+    rejected, queued, admission = asyncio.run(scenario())
+    assert (rejected.status_code, rejected.reason) == (429, "key_limit")
+    assert queued == 3
+    assert (admission.queued, dict(admission.queues)) == (0, {})
+
+
+def test_a_cancelled_waiter_does_not_lose_the_slot():
+    async def scenario():
+        admission = controller()
+        await admission.acquire("holder")
+        gone = asyncio.create_task(admission.acquire("a"))
+        waiting = asyncio.create_task(admission.acquire("b"))
+        await asyncio.sleep(0)
+        gone.cancel()
+        await asyncio.gather(gone, return_exceptions=True)
+        admission.release()
+        await asyncio.wait_for(waiting, 1)
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert (admission.running, admission.queued) == (1, 0)
+
+
+def test_long_expected_wait_fails_fast():
+    async def scenario():
+        admission = controller(queue_timeout=1)
+        admission.run_seconds = 30
+        await admission.acquire("holder")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire("a")
+        return rejected.value
+
+    assert asyncio.run(scenario()).reason == "wait_too_long"
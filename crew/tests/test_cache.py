@@ -0,0 +1,59 @@
+import asyncio
+
+from src.crew.cache import Revalidator
+
+
+def test_requests_for_a_key_being_refreshed_join_the_refresh():
+    async def scenario():
+        revalidator = Revalidator()
+        release = asyncio.Event()
+        runs = []
+
+        async def refresh():
+            runs.append("a")
+            await release.wait()
+
+        assert revalidator.schedule("a", refresh)
+        assert not revalidator.schedule("a", refresh)
+        assert not revalidator.schedule("a", refresh)
+        # Other keys refresh independently
+        assert revalidator.schedule("b", release.wait)
+        assert revalidator.inflight == {"a", "b"}
+        release.set()
+        await asyncio.gather(*revalidator.tasks)
+        return runs, revalidator
+
+    runs, revalidator = asyncio.run(scenario())
+    assert runs == ["a"]
+    assert not revalidator.inflight and not revalidator.tasks
+
+
+def test_a_finished_refresh_can_be_scheduled_again():
+    async def scenario():
+        revalidator = Revalidator()
+        runs = []
+
+        async def refresh():
+            runs.append(len(runs))
+
+        for _ in range(2):
+            assert revalidator.schedule("a", refresh)
+            await asyncio.gather(*revalidator.tasks)
+        return runs
+
+    assert asyncio.run(scenario()) == [0, 1]
+
+
+def test_a_failed_refresh_frees_the_key():
+    async def scenario():
+        revalidator = Revalidator()
+
+        async def refresh():
+            raise RuntimeError("provider down")
+
+        revalidator.schedule("a", refresh)
+        await asyncio.gather(*revalidator.tasks)
+        return revalidator
+
+    revalidator = asyncio.run(scenario())
+    assert "a" not in revalidator.inflight
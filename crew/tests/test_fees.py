@@ -0,0 +1,42 @@
+import pytest
+
+from src.crew.fees import parse_fee
+
+
+@pytest.mark.parametrize("text, low, high, period", [
+    ("1.2 - 1.5 L", 120000, 150000, "annual"),
+    ("1-1.5 lakh per annum", 100000, 150000, "annual"),
+    ("₹80,000 - ₹1.2 L per year", 80000, 120000, "annual"),
+    ("1200 - 1.5 L", 1200, 150000, "annual"),
+    ("INR 8,000/month", 96000, 96000, "monthly"),
+    ("Monthly fee: Rs 8,000", 96000, 96000, "monthly"),
+    ("Rs 40,000 per term", 120000, 120000, "termly"),
+    ("Fees: 1,20,000 (annual), transport extra 2000/month", 120000, 120000, "annual"),
+    ("Rs 5,000 per month (annual charges extra)", 60000, 60000, "monthly"),
+])
+def test_parse_fee(text, low, high, period):
+    fee = parse_fee(text)
+    assert (fee.min, fee.max, fee.period) == (low, high, period)
+
+
+def test_parse_fee_without_amount():
+    assert parse_fee("Not available") is None
+
+
+@pytest.mark.parametrize("text, low, high, period", [
+    ("2024-25: Rs 1,20,000 per annum", 120000, 120000, "annual"),
+    ("Fees (2024-25) INR 1.5 L", 150000, 150000, "annual"),
+    ("Fees 2024/2025: 1.2 - 1.5 L per year", 120000, 150000, "annual"),
+    ("Fees for 2025: Rs 90,000", 90000, 90000, "annual"),
+    ("Updated 2024. Annual fee 85000", 85000, 85000, "annual"),
+    ("Fees: 1,20,000 (2024-25), transport 2000/month", 120000, 120000, "annual"),
+    ("Rs 2000/month", 24000, 24000, "monthly"),
+    ("2000 per month", 24000, 24000, "monthly"),
+])
+def test_parse_fee_skips_years(text, low, high, period):
+    fee = parse_fee(text)
+    assert (fee.min, fee.max, fee.period) == (low, high, period)
+
+
+def test_parse_fee_year_only():
+    assert parse_fee("Fees for 2024-25 not published") is None
@@ -0,0 +1,42 @@
+import multiprocessing
+
+import pytest
+
+from src.crew.ratelimit import SQLiteTokenBucket, TokenBucket
+
+
+def reserve_many(path, count):
+    limiter = SQLiteTokenBucket(path, "serper", 6, 3)
+    return [limiter.reserve() for _ in range(count)]
+
+
+def test_token_bucket_queues_callers_past_the_burst():
+    limiter = TokenBucket(6, 2)
+    waits = [limiter.reserve() for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]
+    # 6 per minute is one token every 10 seconds, and each caller queues behind the last
+    assert 9.9 < waits[2] <= 10
+    assert 19.9 < waits[3] <= 20
+
+
+def test_sqlite_bucket_state_outlives_the_instance(tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    assert reserve_many(path, 3) == [0.0, 0.0, 0.0]
+    assert 9.9 < SQLiteTokenBucket(path, "serper", 6, 3).reserve() <= 10
+    # Buckets are per provider
+    assert SQLiteTokenBucket(path, "gemini", 6, 3).reserve() == 0.0
+
+
+# Forked like gunicorn's workers; the children only touch SQLite
+@pytest.mark.filterwarnings("ignore:This process .* is multi-threaded:DeprecationWarning")
+def test_processes_sharing_the_file_never_spend_the_same_token(tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    SQLiteTokenBucket(path, "serper", 6, 3)
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        results = pool.starmap(reserve_many, [(path, 3)] * 4)
+    waits = sorted(wait for waits in results for wait in waits)
+    assert len(waits) == 12
+    # Only the burst is free; everyone else gets their own 10 second turn
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    for turn, wait in enumerate(waits[3:], start=1):
+        assert turn * 10 - 5 < wait <= turn * 10
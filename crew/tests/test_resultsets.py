@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from src.crew import resultsets
+from src.crew.resultsets import ResultSet, ResultSetStore, pack, school_columns, unpack
+from src.crew.shm_cache import SharedCache
+
+INPUTS = {"location": "Indiranagar, Bangalore", "grade": "5", "curriculum": "CBSE"}
+SCHOOLS = [
+    {"schoolName": "Alpha Public School", "Curriculum": "CBSE", "Location": "1 Main Road, Indiranagar, Bangalore",
+     "City": "Bangalore", "Fees": "INR 80,000 per year", "Rating": "4.6"},
+    {"schoolName": "Beta International", "Curriculum": "IB / Cambridge", "Location": "80 Feet Road, Koramangala, Bangalore",
+     "City": "Bangalore", "Fees": "INR 3,00,000 per year", "Rating": "4.2"},
+    {"schoolName": "Gamma Vidyalaya", "Curriculum": "CBSE", "Location": "ITPL Road, Whitefield, Bangalore",
+     "City": "Bangalore", "Fees": "INR 40,000 per year", "Rating": "3.9"},
+    {"schoolName": "Delta High", "Curriculum": "State Board", "Location": "5 Park Street, Indiranagar, Bangalore",
+     "City": "Bangalore", "Fees": "N/A", "Rating": "N/A"},
+]
+
+
+def result_set(schools=SCHOOLS, inputs=INPUTS):
+    return ResultSet("test", school_columns(json.dumps(schools), inputs), inputs)
+
+
+def counts(page, facet):
+    return {item["value"]: item["count"] for item in page["facets"][facet]}
+
+
+def names(page):
+    return [school["schoolName"] for school in page["schools"]]
+
+
+def test_pages_follow_the_cursor_to_the_end():
+    results = result_set()
+    seen, cursor = [], None
+    for _ in range(3):
+        page = results.page(sort="name", limit=2, cursor=cursor)
+        seen += names(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["Alpha Public School", "Beta International", "Delta High", "Gamma Vidyalaya"]
+
+
+def test_cursor_only_works_for_the_view_it_came_from():
+    results = result_set()
+    cursor = results.page(sort="name", limit=1)["next_cursor"]
+    with pytest.raises(ValueError, match="different filter or sort"):
+        results.page(sort="-name", limit=1, cursor=cursor)
+    with pytest.raises(ValueError, match="different filter or sort"):
+        results.page(filters={"curriculum": ["CBSE"]}, sort="name", limit=1, cursor=cursor)
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        results.page(sort="name", cursor="not a cursor")
+    # Filter values in another order are the same view
+    cursor = results.page(filters={"curriculum": ["IB", "CBSE"]}, sort="name", limit=1)["next_cursor"]
+    assert names(results.page(filters={"curriculum": ["CBSE", "IB"]}, sort="name", limit=1, cursor=cursor)) == [
+        "Beta International"]
+
+
+def test_facet_counts_ignore_their_own_filter():
+    results = result_set()
+    page = results.page(filters={"curriculum": ["cbse"], "locality": ["Indiranagar"]})
+    assert names(page) == ["Alpha Public School"]
+    # Curriculum counts apply only the locality filter, and the other way round
+    assert counts(page, "curriculum") == {"CBSE": 1, "State Board": 1, "IB": 0, "Cambridge": 0}
+    assert counts(page, "locality") == {"Indiranagar": 1, "Whitefield": 1, "Koramangala": 0}
+    assert {item["value"] for item in page["facets"]["curriculum"] if item["selected"]} == {"CBSE"}
+
+
+def test_fee_filter_and_unknown_fees():
+    results = result_set()
+    assert names(results.page(max_fee=100_000, sort="fee")) == ["Gamma Vidyalaya", "Alpha Public School"]
+    page = results.page(max_fee=100_000, sort="fee", include_unknown_fees=True)
+    assert names(page) == ["Gamma Vidyalaya", "Alpha Public School", "Delta High"]
+    assert counts(page, "fee_band")["unknown"] == 1
+
+
+def test_output_columns_limit_the_stored_columns():
+    inputs = dict(INPUTS, output_columns="schoolName,Fees,City")
+    schools = school_columns(json.dumps(SCHOOLS), inputs)
+    assert set(schools.columns) == {"schoolName", "Fees", "City"}
+    assert "Rating" not in schools[0]
+
+
+def test_pack_round_trips_schools_and_inputs():
+    schools = school_columns(json.dumps(SCHOOLS), INPUTS)
+    unpacked, inputs = unpack(pack(schools, INPUTS))
+    assert inputs == INPUTS
+    assert list(unpacked) == list(schools)
+
+
+def test_store_shares_result_sets_between_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(resultsets, "shared_cache", SharedCache(str(tmp_path / "cache"), size_mb=1, slot_kb=16))
+    text = json.dumps(SCHOOLS)
+    id = ResultSetStore().add(text, INPUTS)
+    # Same result, same ID, in any worker
+    other = ResultSetStore()
+    assert other.add(text, INPUTS) == id
+    assert names(ResultSetStore().get(id).page(sort="name", limit=1)) == ["Alpha Public School"]
+    assert ResultSetStore().get("unknown") is None
+
+
+def test_store_drops_expired_result_sets(monkeypatch):
+    monkeypatch.setattr(resultsets, "shared_cache", None)
+    store = ResultSetStore(ttl=60)
+    old = store.add(json.dumps(SCHOOLS), INPUTS, age=120)
+    assert store.get(old) is None
+    assert store.get(store.add(json.dumps(SCHOOLS[:1]), INPUTS)).page()["total"] == 1
@@ -0,0 +1,28 @@
+import pytest
+
+from src.crew.semantic_cache import HashingEmbedder, SemanticCache, normalize_location
+
+INPUTS = {"grade": "5th Grade", "curriculum": "CBSE", "max_results": 20, "output_columns": "schoolName,Fees"}
+
+
+@pytest.mark.parametrize("location, normalized", [
+    ("Sector 5, Noida", "sector 5 noida"),
+    ("schools near Koramangala for grade 5", "koramangala"),
+    ("Class V schools Whitefield", "whitefield"),
+    ("CBSE schools in 5th Block Jayanagar", "5 block jayanagar"),
+])
+def test_normalize_location_keeps_place_numbers(location, normalized):
+    assert normalize_location(location, INPUTS["grade"], INPUTS["curriculum"]) == normalized
+
+
+@pytest.mark.parametrize("location, hit", [
+    ("sector-5 noida", True),
+    ("Sector 5 Noida for grade 5", True),
+    ("Sector Noida", False),
+    ("Noida Sector", False),
+    ("Sector 6, Noida", False),
+])
+def test_lookup_matches_numbered_places_only(location, hit):
+    cache = SemanticCache(HashingEmbedder(), threshold=0.7)
+    cache.put(dict(INPUTS, location="Sector 5, Noida"), "cached")
+    assert (cache.lookup(dict(INPUTS, location=location)) is not None) == hit
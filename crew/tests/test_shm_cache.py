@@ -0,0 +1,89 @@
+import multiprocessing
+import time
+
+import pytest
+
+from src.crew.shm_cache import WAYS, SharedCache
+
+
+def one_set(path):
+    """A table with a single set, so every key competes for the same WAYS slots"""
+    return SharedCache(str(path), size_mb=1, slot_kb=1024 // WAYS)
+
+
+def payload(i):
+    """Distinct bytes for every write, starting with the write's number"""
+    return i.to_bytes(4, "little") + bytes([i % 256]) * (100 + i % 1000)
+
+
+def write_forever(path, stop):
+    cache = SharedCache(path, size_mb=1, slot_kb=16)
+    i = 0
+    while not stop.is_set():
+        cache.put("hot", payload(i))
+        i += 1
+
+
+def test_values_are_shared_between_mappings(tmp_path):
+    writer, reader = SharedCache(str(tmp_path / "cache"), 1, 16), SharedCache(str(tmp_path / "cache"), 1, 16)
+    assert writer.put("key", b"value", created=time.time() - 30)
+    value, created = reader.get("key")
+    assert value == b"value"
+    assert reader.get("key", max_age=10) is None
+    assert reader.get("other") is None
+    assert writer.put_text("text", "über") and reader.get_text("text")[0] == "über"
+
+
+def test_payloads_larger_than_a_slot_are_not_stored(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache"), 1, 16)
+    assert not cache.put("big", b"x" * 16 * 1024)
+    assert cache.get("big") is None
+
+
+def test_a_new_layout_starts_a_new_file(tmp_path):
+    SharedCache(str(tmp_path / "cache"), 1, 16).put("key", b"value")
+    cache = SharedCache(str(tmp_path / "cache"), 1, 32)
+    assert cache.slot_size == 32 * 1024
+    assert cache.get("key") is None
+
+
+def test_a_full_set_evicts_the_entry_not_read_since_the_last_sweep(tmp_path):
+    cache = one_set(tmp_path / "cache")
+    assert cache.sets == 1
+    for i in range(WAYS):
+        cache.put(f"key{i}", payload(i))
+    # Rewriting a key reuses its slot
+    cache.put("key0", payload(0))
+    for i in range(WAYS):
+        if i != 3:
+            assert cache.get(f"key{i}")[0] == payload(i)
+    cache.put("new", b"new")
+    assert cache.get("key3") is None
+    assert cache.get("new")[0] == b"new"
+    assert all(cache.get(f"key{i}") is not None for i in range(WAYS) if i != 3)
+
+
+# Forked like gunicorn's workers; the writer only touches the mapped file
+@pytest.mark.filterwarnings("ignore:This process .* is multi-threaded:DeprecationWarning")
+def test_readers_never_see_a_half_written_slot(tmp_path):
+    path = str(tmp_path / "cache")
+    cache = SharedCache(path, size_mb=1, slot_kb=16)
+    cache.put("hot", payload(0))
+    context = multiprocessing.get_context("fork")
+    stop = context.Event()
+    writer = context.Process(target=write_forever, args=(path, stop))
+    writer.start()
+    try:
+        reads, deadline = 0, time.monotonic() + 1
+        while time.monotonic() < deadline:
+            found = cache.get("hot")
+            if found is None:
+                # A writer kept the slot busy through every retry
+                continue
+            # A slot mixing two writes has a number that does not match the rest
+            assert found[0] == payload(int.from_bytes(found[0][:4], "little"))
+            reads += 1
+    finally:
+        stop.set()
+        writer.join()
+    assert reads > 100